@@ -1,17 +1,28 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import hmac
+import os
+import secrets
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 # local imports
+import metrics
 import models
+import timing
 from database import SessionLocal
 
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+# Refresh tokens are random, so a keyed SHA-256 is enough to store them;
+# bcrypt is only needed for low-entropy secrets like passwords.
+REFRESH_TOKEN_SECRET = os.getenv("REFRESH_TOKEN_SECRET", SECRET_KEY)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -24,10 +35,12 @@ def get_db():
         db.close()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.track_bcrypt():
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with metrics.track_bcrypt():
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -39,20 +52,82 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(REFRESH_TOKEN_SECRET.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def create_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> str:
+    """Issue a new refresh token, starting a new family unless one is given.
+
+    Only the keyed hash is stored; the raw token is returned to the caller once.
+    """
+    token = secrets.token_urlsafe(32)
+    db_token = models.RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(db_token)
+    db.commit()
+    return token
+
+def revoke_token_family(db: Session, family_id: str):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == family_id,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({models.RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def rotate_refresh_token(db: Session, token: str):
+    """Exchange a refresh token for a new one in the same family.
+
+    Presenting a token that was already rotated means it leaked, so the whole
+    family is revoked. Returns ``(user, new_refresh_token)``; no password
+    hashing happens on this path.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    db_token = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_refresh_token(token)
+    ).first()
+    if db_token is None:
+        raise credentials_exception
+    if db_token.revoked_at is not None:
+        revoke_token_family(db, db_token.family_id)
+        raise credentials_exception
+    now = datetime.utcnow()
+    if db_token.expires_at < now:
+        raise credentials_exception
+    # Claim the token with a conditional update: of two concurrent refreshes
+    # only one matches, and the other is treated as reuse
+    claimed = db.query(models.RefreshToken).filter(
+        models.RefreshToken.id == db_token.id,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({models.RefreshToken.revoked_at: now}, synchronize_session=False)
+    if claimed == 0:
+        revoke_token_family(db, db_token.family_id)
+        raise credentials_exception
+    new_token = create_refresh_token(db, db_token.user_id, family_id=db_token.family_id)
+    return db_token.user, new_token
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    with timing.span("auth"):
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
+        user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
         raise credentials_exception
     return user
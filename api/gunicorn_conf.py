@@ -0,0 +1,27 @@
+"""Gunicorn settings for running the api with several workers:
+
+    gunicorn -c gunicorn_conf.py -k uvicorn.workers.UvicornWorker main:app
+
+Workers share ``PROMETHEUS_MULTIPROC_DIR``, which is emptied when the master
+starts, and a dead worker's live gauges are dropped when it exits.
+"""
+
+import os
+import shutil
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+
+def on_starting(server):
+    # Files left by the previous run's workers would be merged into /metrics
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    import metrics
+
+    metrics.mark_process_dead(worker.pid)
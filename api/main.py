@@ -10,12 +10,16 @@ import shutil
 from pathlib import Path
 
 # local imports
-import models, schemas, auth
+import models, schemas, auth, metrics, sentiment, slow_query, timing
 from database import SessionLocal, engine
 from payments import PaymentGateway
 models.Base.metadata.create_all(bind=engine)
+timing.instrument_engine(engine)
+metrics.instrument_pool(engine)
+slow_query.instrument_engine(engine)
 
 app = FastAPI()
+app.router.route_class = timing.TimedRoute
 payment_gateway = PaymentGateway()
 
 UPLOAD_DIR = Path("uploads")
@@ -30,6 +34,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(timing.ServerTimingMiddleware)
+app.add_middleware(metrics.PrometheusMiddleware)
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
 
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(auth.get_db)):
@@ -44,7 +51,26 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         data={"sub": user.username},
         expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = auth.create_refresh_token(db, user.id)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@app.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.RefreshTokenRequest, db: Session = Depends(auth.get_db)):
+    user, refresh_token = auth.rotate_refresh_token(db, body.refresh_token)
+    access_token = auth.create_access_token(
+        data={"sub": user.username},
+        expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@app.post("/token/revoke")
+async def revoke_refresh_token(body: schemas.RefreshTokenRequest, db: Session = Depends(auth.get_db)):
+    db_token = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == auth.hash_refresh_token(body.refresh_token)
+    ).first()
+    if db_token is not None:
+        auth.revoke_token_family(db, db_token.family_id)
+    return {"message": "Refresh token revoked"}
 
 @app.post("/users/", response_model=schemas.User)
 async def create_user(user: schemas.UserCreate, db: Session = Depends(auth.get_db)):
@@ -119,6 +145,7 @@ async def create_story(
         )
         db.add(db_media)
     
+    sentiment.annotate(db, [db_story])
     db.commit()
     db.refresh(db_story)
     return db_story
@@ -133,6 +160,7 @@ async def read_stories(
     stories = db.query(models.Story).filter(
         models.Story.author_id == current_user.id
     ).offset(skip).limit(limit).all()
+    sentiment.annotate(db, stories, store=False)
     return stories
 
 @app.get("/stories/{story_id}", response_model=schemas.Story)
@@ -147,6 +175,7 @@ async def read_story(
     ).first()
     if story is None:
         raise HTTPException(status_code=404, detail="Story not found")
+    sentiment.annotate(db, [story], store=False)
     return story
 
 @app.put("/stories/{story_id}", response_model=schemas.Story)
@@ -175,6 +204,7 @@ async def update_story(
         )
         db.add(db_media)
     
+    sentiment.annotate(db, [db_story])
     db.commit()
     db.refresh(db_story)
     return db_story
@@ -0,0 +1,111 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from starlette.responses import Response
+
+# With PROMETHEUS_MULTIPROC_DIR set, each worker writes to its own mmap files
+# and /metrics merges them, so workers never contend on a shared counter.
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being served", ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections checked out of the SQLAlchemy pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections", "Connections opened beyond the pool size",
+    multiprocess_mode="livesum",
+)
+BCRYPT_IN_PROGRESS = Gauge(
+    "bcrypt_operations_in_progress", "Password hash/verify calls in flight",
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def track_bcrypt():
+    BCRYPT_IN_PROGRESS.inc()
+    try:
+        yield
+    finally:
+        BCRYPT_IN_PROGRESS.dec()
+
+
+def instrument_pool(engine):
+    pool = engine.pool
+
+    def on_checkout(*args):
+        DB_POOL_CHECKED_OUT.inc()
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    def on_checkin(*args):
+        DB_POOL_CHECKED_OUT.dec()
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(method=method, route=route, status=str(status_code)).observe(
+                time.perf_counter() - start
+            )
+
+
+def metrics_endpoint(request):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges; called by ``child_exit`` in gunicorn_conf.py."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
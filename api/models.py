@@ -13,6 +13,7 @@ class User(Base):
     is_premium = Column(Boolean, default=False)
     stories = relationship("Story", back_populates="author")
     subscriptions = relationship("Subscription", back_populates="user")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
 
 class Story(Base):
     __tablename__ = "stories"
@@ -54,3 +55,20 @@ class Payment(Base):
     order_id = Column(String, unique=True)
     status = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    family_id = Column(String, index=True)
+    token_hash = Column(String, unique=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True)
+    user = relationship("User", back_populates="refresh_tokens")
+
+class SentimentScore(Base):
+    __tablename__ = "sentiment_scores"
+    content_hash = Column(String(64), primary_key=True)
+    score = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -25,10 +25,18 @@ class StoryBase(BaseModel):
 class StoryCreate(StoryBase):
     media_links: List[MediaLinkCreate] = []
 
+class StorySentiment(BaseModel):
+    takeoff: float
+    turbulence: float
+    touchdown: float
+    overall: float
+    emotional_impact: str
+
 class Story(StoryBase):
     id: int
     author_id: int
     media_links: List[MediaLink] = []
+    sentiment: Optional[StorySentiment] = None
 
     class Config:
         from_attributes = True
@@ -50,6 +58,10 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -0,0 +1,242 @@
+"""Offline, lexicon-based sentiment of the takeoff, turbulence and touchdown of
+a story.
+
+Each segment scores in (-1, 1): the valences of its lexicon words, flipped
+and damped after a negation and scaled by a preceding intensifier, summed and
+squashed with s / sqrt(s**2 + ALPHA). Scores are cached in ``sentiment_scores``
+under a hash of the lexicon version and the segment text, so a segment is
+scored once however many times its story is saved, and an edit only
+re-scores the segments whose text changed. Reads never write: a segment not
+cached yet is scored for the response and left to the backfill.
+
+The mean of the three segments maps to one of the backend's emotional impact
+labels, as a suggestion to prefill. Run
+
+    python sentiment.py
+
+to score every story not cached yet, in chunks spread over a process pool.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+from database import SessionLocal, engine
+
+logger = logging.getLogger("pmot.sentiment")
+
+SEGMENTS = ("takeoff", "turbulence", "touchdown")
+
+# Bump whenever the lexicon or the scoring changes, so cached scores of the
+# old version are no longer looked up
+LEXICON_VERSION = "1"
+
+BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "500"))
+WORKERS = int(os.getenv("SENTIMENT_WORKERS", "0")) or os.cpu_count() or 1
+
+ALPHA = 15
+NEGATION_SCALE = -0.75
+NEGATION_WINDOW = 3
+
+LEXICON = {
+    # Positive
+    "accomplished": 2, "adore": 3, "amazing": 3, "awesome": 3, "beautiful": 3,
+    "best": 3, "better": 2, "blessed": 3, "brave": 2, "bright": 1, "calm": 2,
+    "celebrate": 3, "celebrated": 3, "cheerful": 2, "comfort": 2,
+    "comfortable": 2, "confident": 2, "courage": 2, "delight": 3,
+    "delighted": 3, "easy": 1, "enjoy": 2, "enjoyed": 2, "excited": 3,
+    "exciting": 3, "fantastic": 3, "fine": 1, "free": 1, "fun": 2, "glad": 2,
+    "good": 2, "grateful": 3, "great": 3, "happy": 3, "healed": 2, "helped": 2,
+    "hope": 2, "hopeful": 2, "joy": 3, "laugh": 2, "laughed": 2,
+    "love": 3, "loved": 3, "lovely": 3, "lucky": 2, "nice": 2, "overcame": 2,
+    "peace": 2, "peaceful": 2, "perfect": 3, "pleased": 2,
+    "proud": 2, "recovered": 2, "relief": 2, "relieved": 2, "safe": 1,
+    "smile": 2, "smiled": 2, "strong": 2, "success": 3, "successful": 3,
+    "support": 2, "survived": 2, "thankful": 3, "thrilled": 3, "triumph": 3,
+    "warm": 1, "welcome": 2, "win": 2, "won": 2, "wonderful": 3,
+    # Negative
+    "abandoned": -3, "afraid": -2, "alone": -2, "angry": -3, "anxiety": -2,
+    "anxious": -2, "ashamed": -2, "awful": -3, "bad": -2, "betrayed": -3,
+    "broke": -2, "broken": -2, "collapsed": -2, "crash": -2, "crashed": -2,
+    "cried": -2, "cry": -2, "crying": -2, "dead": -3, "death": -3,
+    "depressed": -3, "despair": -3, "died": -3, "disappointed": -2,
+    "disaster": -3, "dread": -2, "embarrassed": -2, "exhausted": -2,
+    "fail": -2, "failed": -2, "failure": -2, "fear": -2, "fired": -2,
+    "frustrated": -2, "grief": -3, "guilty": -2, "hard": -1, "hate": -3,
+    "hated": -3, "heartbroken": -3, "helpless": -2, "horrible": -3, "hurt": -2,
+    "ill": -2, "injured": -2, "lonely": -2, "lose": -2, "lost": -2, "miss": -1,
+    "missed": -1, "nervous": -1, "pain": -2, "painful": -2, "panic": -2,
+    "rejected": -2, "sad": -2, "scared": -2, "shock": -2, "sick": -2,
+    "sorry": -1, "stress": -2, "stressed": -2, "struggle": -2,
+    "struggled": -2, "suffer": -2, "suffered": -2, "terrible": -3,
+    "terrified": -3, "tired": -1, "unhappy": -2, "upset": -2, "worried": -2,
+    "worry": -2, "worse": -2, "worst": -3, "wrong": -2,
+}
+
+NEGATIONS = {
+    "no", "not", "never", "none", "nobody", "nothing", "neither", "nor",
+    "without", "hardly", "barely", "cannot",
+}
+
+INTENSIFIERS = {
+    "absolutely": 1.5, "completely": 1.5, "deeply": 1.5, "extremely": 1.5,
+    "incredibly": 1.5, "really": 1.3, "so": 1.3, "terribly": 1.5,
+    "totally": 1.5, "truly": 1.3, "very": 1.3, "quite": 1.1,
+    "fairly": 0.8, "slightly": 0.6, "somewhat": 0.7, "little": 0.7,
+}
+
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# (upper bound of the mean score, label), from the saddest
+IMPACTS = (
+    (-0.6, "Extremely Sad"),
+    (-0.2, "Sad"),
+    (0.2, "Ambivalent"),
+    (0.6, "Happy"),
+    (math.inf, "Extremely Happy"),
+)
+
+
+def score(text):
+    words = _WORD.findall((text or "").lower())
+    total = 0.0
+    for i, word in enumerate(words):
+        valence = LEXICON.get(word)
+        if valence is None:
+            continue
+        if i and words[i - 1] in INTENSIFIERS:
+            valence *= INTENSIFIERS[words[i - 1]]
+        window = words[max(0, i - NEGATION_WINDOW):i]
+        if any(w in NEGATIONS or w.endswith("n't") for w in window):
+            valence *= NEGATION_SCALE
+        total += valence
+    return total / math.sqrt(total * total + ALPHA)
+
+
+def score_chunk(texts):
+    """``(content hash, score)`` of each text, in a worker process."""
+    return [(content_hash(text), score(text)) for text in texts]
+
+
+def content_hash(text):
+    return hashlib.sha256(f"{LEXICON_VERSION}\0{text or ''}".encode()).hexdigest()
+
+
+def impact(value):
+    return next(label for bound, label in IMPACTS if value < bound)
+
+
+def _store(db, scored):
+    """Insert scores without committing, skipping hashes already cached."""
+    if not scored:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialect.insert(models.SentimentScore.__table__)
+        .values([{"content_hash": h, "score": s} for h, s in scored])
+        .on_conflict_do_nothing()
+    )
+
+
+def _cached(db, hashes):
+    rows = db.execute(
+        select(models.SentimentScore.content_hash, models.SentimentScore.score).where(
+            models.SentimentScore.content_hash.in_(set(hashes))
+        )
+    )
+    return dict(rows.all())
+
+
+def annotate(db, stories, store=True):
+    """
+    Set ``story.sentiment`` on each story from the cache, scoring the segments
+    missing from it. With ``store`` those scores are added to the cache
+    without committing; reads pass ``store=False`` and leave caching to the
+    write paths and the backfill. Returns how many segments were scored.
+    """
+    hashes = [[content_hash(getattr(story, name)) for name in SEGMENTS] for story in stories]
+    texts = {
+        h: getattr(story, name)
+        for story, row in zip(stories, hashes)
+        for name, h in zip(SEGMENTS, row)
+    }
+    scores = _cached(db, texts) if texts else {}
+    missing = [(h, score(text)) for h, text in texts.items() if h not in scores]
+    if store:
+        _store(db, missing)
+    scores.update(missing)
+    for story, row in zip(stories, hashes):
+        segments = {name: scores[h] for name, h in zip(SEGMENTS, row)}
+        overall = sum(segments.values()) / len(SEGMENTS)
+        story.sentiment = {**segments, "overall": overall, "emotional_impact": impact(overall)}
+    return len(missing)
+
+
+def backfill(workers=WORKERS, batch_size=BATCH_SIZE):
+    """
+    Score the segments of every story missing from the cache with a process
+    pool. Stories are read a page at a time and at most two chunks per
+    worker are in flight, so memory stays bounded. Returns
+    ``(stories read, segments scored)``.
+    """
+    columns = [getattr(models.Story, name) for name in SEGMENTS]
+    start = time.perf_counter()
+    stories = scored = 0
+    last_id = 0
+    with SessionLocal() as db, ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        # Hashes submitted but not stored yet, which the cache lookup of a
+        # later page cannot see; a text repeated there is skipped rather than
+        # scored and counted again
+        pending = set()
+
+        def store_next():
+            chunk = in_flight.popleft().result()
+            _store(db, chunk)
+            db.commit()
+            pending.difference_update(h for h, _ in chunk)
+            return len(chunk)
+
+        # Paged by id rather than through a server-side cursor, since SQLite
+        # cannot commit the scores while another connection is reading
+        while chunk := db.execute(
+            select(models.Story.id, *columns)
+            .where(models.Story.id > last_id)
+            .order_by(models.Story.id)
+            .limit(batch_size)
+        ).all():
+            last_id = chunk[-1].id
+            stories += len(chunk)
+            texts = {content_hash(text): text for _, *segments in chunk for text in segments}
+            cached = _cached(db, texts)
+            missing = {
+                h: text for h, text in texts.items() if h not in cached and h not in pending
+            }
+            if missing:
+                pending.update(missing)
+                in_flight.append(pool.submit(score_chunk, list(missing.values())))
+            if len(in_flight) >= 2 * workers:
+                scored += store_next()
+        while in_flight:
+            scored += store_next()
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Scored {scored} segments of {stories} stories with {workers} processes "
+        f"in {elapsed:.1f}s ({stories / max(elapsed, 1e-9):.0f} stories/s)"
+    )
+    return stories, scored
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    models.Base.metadata.create_all(bind=engine)
+    backfill()
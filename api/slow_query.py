@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import event
+
+import timing
+
+logger = logging.getLogger("pmot.slow_query")
+
+THRESHOLD_SECONDS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")) / 1000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|:\w+|\$\d+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Fingerprints whose plan has already been logged by this process
+_explained = set()
+
+
+def normalize(statement):
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def param_shape(parameters, executemany):
+    if executemany and parameters:
+        return f"{len(parameters)} x {param_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return (
+            "{"
+            + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+            + "}"
+        )
+    if isinstance(parameters, list | tuple):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+def explain(dialect, cursor, statement, parameters):
+    if statement.lstrip()[:6].upper().rstrip() not in ("SELECT", "WITH"):
+        return None
+    raw = None
+    try:
+        raw = cursor.connection.cursor()
+        if dialect == "sqlite":
+            raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return "\n".join(str(row[-1]) for row in raw.fetchall())
+        if dialect == "postgresql":
+            raw.execute("SAVEPOINT slow_query_explain")
+            try:
+                raw.execute(f"EXPLAIN {statement}", parameters)
+                plan = "\n".join(str(row[0]) for row in raw.fetchall())
+            except Exception:
+                raw.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            raw.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        return None
+    except Exception as e:
+        logger.info(f"could not explain slow query: {e}")
+        return None
+    finally:
+        if raw is not None:
+            raw.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, start = conn.info["slow_query_start"].pop()
+    elapsed = time.perf_counter() - start
+    if elapsed < THRESHOLD_SECONDS:
+        return
+    normalized = normalize(statement)
+    fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+    record = {
+        "fingerprint": fingerprint,
+        "duration_ms": round(elapsed * 1000, 2),
+        "route": timing.current_route() or "-",
+        "statement": normalized,
+        "param_shape": param_shape(parameters, executemany),
+    }
+    if fingerprint not in _explained and not executemany:
+        _explained.add(fingerprint)
+        record["plan"] = explain(conn.dialect.name, cursor, statement, parameters)
+    logger.warning(json.dumps(record))
+
+
+def _handle_error(exception_context):
+    timing.pop_failed_start(exception_context, "slow_query_start")
+
+
+def instrument_engine(engine):
+    """Log statements slower than SLOW_QUERY_THRESHOLD_MS, with their plan the
+    first time each normalized statement is seen."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import models
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(email="pilot@example.com", username="pilot", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_rotate_refresh_token_issues_a_new_token_in_the_family(db, user):
+    token = auth.create_refresh_token(db, user.id)
+
+    rotated_user, new_token = auth.rotate_refresh_token(db, token)
+
+    assert rotated_user.id == user.id
+    assert new_token != token
+    old = db.query(models.RefreshToken).filter_by(token_hash=auth.hash_refresh_token(token)).one()
+    new = db.query(models.RefreshToken).filter_by(token_hash=auth.hash_refresh_token(new_token)).one()
+    assert old.revoked_at is not None
+    assert new.revoked_at is None
+    assert new.family_id == old.family_id
+
+
+def test_reusing_a_rotated_token_revokes_the_family(db, user):
+    token = auth.create_refresh_token(db, user.id)
+    _, new_token = auth.rotate_refresh_token(db, token)
+
+    with pytest.raises(HTTPException) as exc_info:
+        auth.rotate_refresh_token(db, token)
+    assert exc_info.value.status_code == 401
+
+    with pytest.raises(HTTPException):
+        auth.rotate_refresh_token(db, new_token)
+
+
+def test_concurrent_refreshes_do_not_fork_the_family(session_factory, db, user):
+    token = auth.create_refresh_token(db, user.id)
+    token_hash = auth.hash_refresh_token(token)
+
+    with session_factory() as racing:
+        # The racing request read the token before the first one rotated it
+        stale = racing.query(models.RefreshToken).filter_by(token_hash=token_hash).one()
+        assert stale.revoked_at is None
+        family_id = stale.family_id
+        _, new_token = auth.rotate_refresh_token(db, token)
+
+        with pytest.raises(HTTPException):
+            auth.rotate_refresh_token(racing, token)
+
+    db.expire_all()
+    family = db.query(models.RefreshToken).filter_by(family_id=family_id).all()
+    assert len(family) == 2
+    assert all(t.revoked_at is not None for t in family)
+    with pytest.raises(HTTPException):
+        auth.rotate_refresh_token(db, new_token)
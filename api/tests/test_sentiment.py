@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+import sentiment
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+def story(takeoff, turbulence, touchdown):
+    return models.Story(
+        title="Flight", takeoff=takeoff, turbulence=turbulence, touchdown=touchdown
+    )
+
+
+def cached_count(db):
+    return db.scalar(select(func.count()).select_from(models.SentimentScore))
+
+
+def test_score_follows_the_lexicon():
+    assert sentiment.score("We were so happy and proud") > 0.5
+    assert sentiment.score("It was a terrible, painful year") < -0.5
+    assert sentiment.score("The bus left at noon") == 0
+    assert sentiment.score(None) == 0
+
+
+def test_intensifier_scales_the_next_word():
+    assert sentiment.score("very happy") > sentiment.score("happy")
+    assert sentiment.score("slightly happy") < sentiment.score("happy")
+
+
+def test_negation_flips_and_damps_the_words_after_it():
+    assert sentiment.score("I was not happy") < 0
+    assert sentiment.score("I wasn't happy") < 0
+    assert abs(sentiment.score("I was not happy")) < sentiment.score("I was happy")
+    # Only the few words right after a negation are affected
+    assert sentiment.score("not that it mattered much in the end, I was happy") > 0
+
+
+def test_impact_maps_the_mean_to_a_label():
+    assert sentiment.impact(-0.9) == "Extremely Sad"
+    assert sentiment.impact(0.0) == "Ambivalent"
+    assert sentiment.impact(0.9) == "Extremely Happy"
+
+
+def test_annotate_scores_each_segment_once(db):
+    first = story("We were happy", "Then we lost everything", "We were happy")
+    assert sentiment.annotate(db, [first]) == 2
+    db.commit()
+    assert cached_count(db) == 2
+    assert first.sentiment["takeoff"] == first.sentiment["touchdown"] > 0
+    assert first.sentiment["turbulence"] < 0
+
+    second = story("We were happy", "Then we lost everything", "Calm again")
+    assert sentiment.annotate(db, [second]) == 1
+    assert second.sentiment["turbulence"] == first.sentiment["turbulence"]
+
+
+def test_annotate_without_store_leaves_the_cache_alone(db):
+    read = story("We were happy", "Then we lost everything", "Calm again")
+    assert sentiment.annotate(db, [read], store=False) == 3
+    db.commit()
+    assert cached_count(db) == 0
+    labels = {label for _, label in sentiment.IMPACTS}
+    assert read.sentiment["emotional_impact"] in labels
+
+
+def test_backfill_scores_repeated_texts_once(session_factory, db, monkeypatch):
+    # Every story repeats the same three texts, one story per page, so later
+    # pages see them while their first chunk is still in flight
+    for _ in range(4):
+        db.add(story("We were happy", "Then we lost everything", "Calm again"))
+    db.commit()
+    monkeypatch.setattr(sentiment, "SessionLocal", session_factory)
+
+    assert sentiment.backfill(workers=1, batch_size=1) == (4, 3)
+    assert cached_count(db) == 3
+    assert sentiment.backfill(workers=1, batch_size=1) == (4, 0)
@@ -0,0 +1,193 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+logger = logging.getLogger("pmot.timing")
+
+SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", "1.0"))
+
+_timings = ContextVar("request_timings", default=None)
+_scope = ContextVar("request_scope", default=None)
+
+
+class RequestTimings:
+    __slots__ = (
+        "start",
+        "handler_start",
+        "handler_end",
+        "spans",
+        "sql_count",
+        "sql_time",
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.handler_start = None
+        self.handler_end = None
+        self.spans = {}
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def phases(self, now):
+        phases = {"total": now - self.start}
+        if self.handler_start is not None:
+            handler_end = self.handler_end or now
+            phases["deps"] = self.handler_start - self.start
+            phases["handler"] = handler_end - self.handler_start
+            phases["serialize"] = now - handler_end
+        phases.update(self.spans)
+        phases["db"] = self.sql_time
+        return phases
+
+
+def current_route():
+    scope = _scope.get()
+    if scope is None:
+        return None
+    return getattr(scope.get("route"), "path", None)
+
+
+@contextmanager
+def span(name):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] = timings.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, start = conn.info["query_start_time"].pop()
+    timings = _timings.get()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_time += time.perf_counter() - start
+
+
+def pop_failed_start(exception_context, key):
+    # after_cursor_execute does not run when the statement raises; drop its
+    # start so it isn't paired with the connection's next statement
+    conn = exception_context.connection
+    starts = conn.info.get(key) if conn is not None else None
+    if starts and starts[-1][0] is exception_context.execution_context:
+        starts.pop()
+
+
+def _handle_error(exception_context):
+    pop_failed_start(exception_context, "query_start_time")
+
+
+def instrument_engine(engine):
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _timed_endpoint(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            timings.handler_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.handler_end = time.perf_counter()
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return endpoint(*args, **kwargs)
+        timings.handler_start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            timings.handler_end = time.perf_counter()
+
+    return sync_wrapper
+
+
+class TimedRoute(APIRoute):
+    """Marks when the endpoint body starts and returns, so the time before it
+    counts as dependency resolution and the time after it as serialization."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header and a JSON log line to a sample of requests."""
+
+    def __init__(self, app, sample_rate=SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        scope_token = _scope.set(scope)
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _scope.reset(scope_token)
+            return
+
+        timings = RequestTimings()
+        timings_token = _timings.set(timings)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                entries = [
+                    f"{name};dur={duration * 1000:.2f}"
+                    for name, duration in timings.phases(time.perf_counter()).items()
+                ]
+                entries[-1] += f';desc="{timings.sql_count} queries"'
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(timings_token)
+            _scope.reset(scope_token)
+            record = {
+                "method": scope["method"],
+                "route": getattr(scope.get("route"), "path", scope["path"]),
+                "status": status_code,
+                "sql_count": timings.sql_count,
+            }
+            for name, duration in timings.phases(time.perf_counter()).items():
+                record[f"{name}_ms"] = round(duration * 1000, 2)
+            logger.info(json.dumps(record))
@@ -0,0 +1,35 @@
+"""Add keyset pagination indexes
+
+Revision ID: 5a9e3b7c1f26
+Revises: c4d1e8f27a90
+Create Date: 2026-10-19 16:11:47.502316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9e3b7c1f26'
+down_revision = 'c4d1e8f27a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing moments get the migration time as their creation time
+    op.add_column('pmot', sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    op.create_index('ix_pmot_owner_id_created_at_id', 'pmot', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_pmot_owner_id_label_id', 'pmot', ['owner_id', 'label', 'id'], unique=False)
+    op.create_index('ix_pmot_created_at_id', 'pmot', ['created_at', 'id'], unique=False)
+    op.create_index('ix_pmot_label_id', 'pmot', ['label', 'id'], unique=False)
+    op.create_index('ix_user_email_id', 'user', ['email', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_id', table_name='user')
+    op.drop_index('ix_pmot_label_id', table_name='pmot')
+    op.drop_index('ix_pmot_created_at_id', table_name='pmot')
+    op.drop_index('ix_pmot_owner_id_label_id', table_name='pmot')
+    op.drop_index('ix_pmot_owner_id_created_at_id', table_name='pmot')
+    op.drop_column('pmot', 'created_at')
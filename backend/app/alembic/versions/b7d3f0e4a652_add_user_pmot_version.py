@@ -0,0 +1,24 @@
+"""Add user pmot version
+
+Revision ID: b7d3f0e4a652
+Revises: e6f2a9c3b810
+Create Date: 2026-10-19 17:25:40.118092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f0e4a652'
+down_revision = 'e6f2a9c3b810'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('pmot_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('user', 'pmot_version')
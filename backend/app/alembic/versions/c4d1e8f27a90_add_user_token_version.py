@@ -0,0 +1,24 @@
+"""Add user token version
+
+Revision ID: c4d1e8f27a90
+Revises: 7b5e0a2c4d18
+Create Date: 2026-10-19 15:02:18.230741
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d1e8f27a90'
+down_revision = '7b5e0a2c4d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('user', 'token_version')
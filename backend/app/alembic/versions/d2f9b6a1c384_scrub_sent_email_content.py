@@ -0,0 +1,31 @@
+"""Scrub the content of sent emails
+
+Revision ID: d2f9b6a1c384
+Revises: c4a8e1f7d935
+Create Date: 2026-10-19 21:14:37.902615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f9b6a1c384'
+down_revision = 'c4a8e1f7d935'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('emailoutbox', 'html_content',
+               existing_type=sqlmodel.sql.sqltypes.AutoString(),
+               nullable=True)
+    op.execute("UPDATE emailoutbox SET html_content = NULL WHERE status IN ('sent', 'failed')")
+
+
+def downgrade():
+    op.execute("UPDATE emailoutbox SET html_content = '' WHERE html_content IS NULL")
+    op.alter_column('emailoutbox', 'html_content',
+               existing_type=sqlmodel.sql.sqltypes.AutoString(),
+               nullable=False)
@@ -0,0 +1,26 @@
+"""Add user deleted_at
+
+Revision ID: e6f2a9c3b810
+Revises: 5a9e3b7c1f26
+Create Date: 2026-10-19 16:40:12.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f2a9c3b810'
+down_revision = '5a9e3b7c1f26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_user_deleted_at'), 'user', ['deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_deleted_at'), table_name='user')
+    op.drop_column('user', 'deleted_at')
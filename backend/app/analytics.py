@@ -0,0 +1,285 @@
+"""Per-user distributions of emotional impact over months and years.
+
+``EmotionRollup`` holds one count per (user, bucket, period, impact). The
+ORM listeners installed by ``track_rollups`` keep it current: before each
+flush they turn the PMOTs being added, changed or deleted into count deltas,
+and after the flush they upsert those deltas in the same transaction, so the
+rollup commits or rolls back with the PMOTs themselves. The same flush bumps
+``User.pmot_version`` for every owner whose series changed, which keys the
+trajectory cache in ``app.trajectory``.
+
+Writes that bypass the ORM unit of work (bulk ``update()``/``delete()``
+statements, raw SQL, restores) are not tracked. Run
+
+    python -m app.analytics
+
+to recompute every rollup from the ``pmot`` table in one grouped statement.
+The rebuild holds an ``EXCLUSIVE`` lock on ``emotionrollup`` until it
+commits, so every PMOT write, whose flush upserts into the rollup, waits for
+it; run it when writes are quiet.
+"""
+
+import logging
+from collections import Counter
+from collections.abc import Sequence
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import Connection, Date, case, cast, event, inspect, literal
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, func, select, text
+
+from app.core.db import engine
+from app.core.upsert import upsert_insert
+from app.models import (
+    PMOT,
+    EmotionalImpactBucket,
+    EmotionImpact,
+    EmotionRollup,
+    User,
+)
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("month", "year")
+
+# (owner_id, bucket, period_start, emotional_impact) -> change in count
+RollupKey = tuple[Any, str, date, EmotionImpact]
+
+_PENDING = "emotion_rollup_deltas"
+
+_SERIES = ("owner_id", "event_date", "emotional_impact")
+
+
+def period_start(bucket: str, value: date | datetime) -> date:
+    day = value.date() if isinstance(value, datetime) else value
+    if bucket == "month":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def _keys(owner_id: Any, event_date: Any, impact: Any) -> list[RollupKey]:
+    if owner_id is None or event_date is None or impact is None:
+        return []
+    return [
+        (owner_id, bucket, period_start(bucket, event_date), EmotionImpact(impact))
+        for bucket in BUCKETS
+    ]
+
+
+def _previous(pmot: PMOT, name: str) -> Any:
+    history = inspect(pmot).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(pmot, name)
+
+
+def _keep_value(_target: Any, value: Any, _oldvalue: Any, _initiator: Any) -> Any:
+    return value
+
+
+def _series_changed(pmot: PMOT) -> bool:
+    state = inspect(pmot)
+    return any(state.attrs[name].history.has_changes() for name in _SERIES)
+
+
+def _collect_deltas(session: OrmSession, _flush_context: Any, _instances: Any) -> None:
+    deltas: Counter[RollupKey]
+    owners: set[Any]
+    deltas, owners = session.info.setdefault(_PENDING, (Counter(), set()))
+    for obj in session.new:
+        if isinstance(obj, PMOT):
+            deltas.update(_keys(obj.owner_id, obj.event_date, obj.emotional_impact))
+            owners.add(obj.owner_id)
+    for obj in session.deleted:
+        if isinstance(obj, PMOT):
+            deltas.subtract(
+                _keys(
+                    _previous(obj, "owner_id"),
+                    _previous(obj, "event_date"),
+                    _previous(obj, "emotional_impact"),
+                )
+            )
+            owners.add(_previous(obj, "owner_id"))
+    for obj in session.dirty:
+        if isinstance(obj, PMOT) and _series_changed(obj):
+            deltas.subtract(
+                _keys(
+                    _previous(obj, "owner_id"),
+                    _previous(obj, "event_date"),
+                    _previous(obj, "emotional_impact"),
+                )
+            )
+            deltas.update(_keys(obj.owner_id, obj.event_date, obj.emotional_impact))
+            owners.update((_previous(obj, "owner_id"), obj.owner_id))
+
+
+def _apply_deltas(session: OrmSession, _flush_context: Any) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending is None:
+        return
+    deltas, owners = pending
+    owners.discard(None)
+    changes = {key: delta for key, delta in deltas.items() if delta}
+    if changes:
+        apply_deltas(session.connection(), changes)
+    if owners:
+        bump_pmot_versions(session.connection(), owners)
+
+
+def bump_pmot_versions(connection: Connection, owners: set[Any]) -> None:
+    """Invalidate everything cached on these users' PMOT series."""
+    table = User.__table__  # type: ignore[attr-defined]
+    connection.execute(
+        table.update()
+        .where(table.c.id.in_(sorted(owners, key=str)))
+        .values(pmot_version=table.c.pmot_version + 1)
+    )
+
+
+def apply_deltas(connection: Connection, changes: dict[RollupKey, int]) -> None:
+    """Add ``changes`` to the rollup counts, creating and dropping rows as needed."""
+    insert = upsert_insert(connection)
+    table = EmotionRollup.__table__  # type: ignore[attr-defined]
+    # Sorted keys take row locks in the same order in every transaction
+    rows = [
+        {
+            "owner_id": owner_id,
+            "bucket": bucket,
+            "period_start": start,
+            "emotional_impact": impact,
+            "count": delta,
+        }
+        for (owner_id, bucket, start, impact), delta in sorted(
+            changes.items(), key=lambda item: tuple(map(str, item[0]))
+        )
+    ]
+    statement = insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key],
+        set_={"count": table.c.count + statement.excluded.count},
+    )
+    connection.execute(statement)
+    owners = {row["owner_id"] for row in rows}
+    connection.execute(
+        table.delete().where(table.c.owner_id.in_(owners), table.c.count <= 0)
+    )
+
+
+def track_rollups() -> None:
+    """
+    Maintain ``EmotionRollup`` and ``User.pmot_version`` from every ORM flush
+    that touches a PMOT.
+    """
+    if event.contains(OrmSession, "before_flush", _collect_deltas):
+        return
+    for name in _SERIES:
+        # A commit expires the PMOT, and setting an expired attribute records
+        # no old value unless the set loads it first; _previous needs it
+        event.listen(getattr(PMOT, name), "set", _keep_value, active_history=True)
+    event.listen(OrmSession, "before_flush", _collect_deltas)
+    event.listen(OrmSession, "after_flush", _apply_deltas)
+    event.listen(
+        OrmSession, "after_rollback", lambda session: session.info.pop(_PENDING, None)
+    )
+
+
+def distribution(
+    session: Session,
+    owner_id: Any,
+    bucket: str,
+    start: date | None = None,
+    end: date | None = None,
+) -> list[EmotionalImpactBucket]:
+    """Counts per impact for each ``bucket`` period between ``start`` and ``end``."""
+    statement = select(EmotionRollup).where(
+        col(EmotionRollup.owner_id) == owner_id,
+        col(EmotionRollup.bucket) == bucket,
+        col(EmotionRollup.count) > 0,
+    )
+    if start is not None:
+        statement = statement.where(
+            col(EmotionRollup.period_start) >= period_start(bucket, start)
+        )
+    if end is not None:
+        statement = statement.where(col(EmotionRollup.period_start) <= end)
+    statement = statement.order_by(col(EmotionRollup.period_start))
+    return _buckets(session.exec(statement).all())
+
+
+def _buckets(rows: Sequence[EmotionRollup]) -> list[EmotionalImpactBucket]:
+    buckets: list[EmotionalImpactBucket] = []
+    for row in rows:
+        if not buckets or buckets[-1].period_start != row.period_start:
+            counts = dict.fromkeys(EmotionImpact, 0)
+            buckets.append(
+                EmotionalImpactBucket(
+                    period_start=row.period_start, total=0, counts=counts
+                )
+            )
+        buckets[-1].counts[row.emotional_impact] += row.count
+        buckets[-1].total += row.count
+    return buckets
+
+
+def rebuild(session: Session) -> int:
+    """
+    Recompute every rollup from ``pmot`` with a single grouped scan, using
+    ``GROUPING SETS`` for the month and year buckets. Returns the row count.
+    PMOT writes block on the rollup lock until the rebuild commits.
+    """
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        raise NotImplementedError("Rollups are rebuilt with PostgreSQL GROUPING SETS")
+    table = EmotionRollup.__table__  # type: ignore[attr-defined]
+    # The whole-table scan runs far past DB_STATEMENT_TIMEOUT_MS, which is
+    # meant for request queries; lift it for this transaction only
+    connection.execute(text("SET LOCAL statement_timeout = 0"))
+    # Writers that already touched the rollup finish first; later ones wait
+    # and add their deltas on top of the rebuilt counts
+    connection.execute(text(f'LOCK TABLE "{table.name}" IN EXCLUSIVE MODE'))
+    connection.execute(table.delete())
+
+    month = cast(func.date_trunc("month", PMOT.event_date), Date)
+    year = cast(func.date_trunc("year", PMOT.event_date), Date)
+    grouped = (
+        select(
+            col(PMOT.owner_id).label("owner_id"),
+            col(PMOT.emotional_impact).label("emotional_impact"),
+            month.label("month"),
+            year.label("year"),
+            func.count().label("count"),
+        )
+        .where(col(PMOT.emotional_impact).is_not(None))
+        .group_by(
+            col(PMOT.owner_id),
+            col(PMOT.emotional_impact),
+            func.grouping_sets(month, year),
+        )
+        .subquery()
+    )
+    rows = select(
+        grouped.c.owner_id,
+        case((grouped.c.month.is_(None), literal("year")), else_=literal("month")),
+        func.coalesce(grouped.c.month, grouped.c.year),
+        grouped.c.emotional_impact,
+        grouped.c.count,
+    )
+    result = connection.execute(
+        table.insert().from_select(
+            ["owner_id", "bucket", "period_start", "emotional_impact", "count"], rows
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    with Session(engine) as session:
+        rows = rebuild(session)
+    logger.info(f"Rebuilt {rows} emotion rollup rows")
+
+
+if __name__ == "__main__":
+    main()
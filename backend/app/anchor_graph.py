@@ -0,0 +1,361 @@
+"""Graph of a user's moments connected through the anchors they share.
+
+The graph is bipartite (moments on one side, anchors on the other) and is
+kept per owner in ``AnchorGraph`` as compressed sparse rows in both
+directions: ``moment_indptr``/``moment_anchors`` list the anchors of each
+moment, ``anchor_indptr``/``anchor_moments`` the moments of each anchor.
+Node ids are sorted 16-byte UUIDs, so looking a node up is a binary search,
+and every array is stored as its raw buffer and read back as a view.
+
+``set_moment_anchors`` patches the stored graph in the transaction that
+changes a moment's anchors, so a traversal reads one row and walks it in
+memory instead of running recursive SQL. An owner without a stored graph
+gets one built from ``PMOTAnchor`` the first time it is needed. The
+listeners installed by ``track_graph`` drop deleted PMOTs from the graph in
+the flush that deletes them, since their ``PMOTAnchor`` rows go through
+``ON DELETE CASCADE`` without passing through ``set_moment_anchors``.
+"""
+
+import uuid
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from sqlalchemy import Connection, event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, select
+
+from app.core.upsert import upsert_insert
+from app.models import PMOT, AnchorGraph, PMOTAnchor
+
+ID = np.dtype("S16")
+INDEX = np.dtype("<i4")
+
+_PENDING = "anchor_graph_deleted"
+
+
+def _ids(values: Iterable[uuid.UUID]) -> np.ndarray:
+    return np.frombuffer(b"".join(value.bytes for value in values), dtype=ID)
+
+
+def to_uuids(ids: np.ndarray) -> list[uuid.UUID]:
+    # Elements of an S16 array drop trailing NUL bytes; the buffer keeps them
+    raw = np.ascontiguousarray(ids).tobytes()
+    return [uuid.UUID(bytes=raw[i : i + 16]) for i in range(0, len(raw), 16)]
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenation of the CSR rows ``rows``, without a Python loop."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(total)]
+
+
+def _csr(
+    rows: np.ndarray, columns: np.ndarray, size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(size + 1, dtype=INDEX)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, columns[order].astype(INDEX)
+
+
+@dataclass
+class Adjacency:
+    moments: np.ndarray
+    anchors: np.ndarray
+    moment_indptr: np.ndarray
+    moment_anchors: np.ndarray
+    anchor_indptr: np.ndarray
+    anchor_moments: np.ndarray
+
+    @classmethod
+    def from_edges(cls, moment_ids: np.ndarray, anchor_ids: np.ndarray) -> "Adjacency":
+        moments, moment_index = np.unique(moment_ids, return_inverse=True)
+        anchors, anchor_index = np.unique(anchor_ids, return_inverse=True)
+        moment_indptr, moment_anchors = _csr(moment_index, anchor_index, moments.size)
+        anchor_indptr, anchor_moments = _csr(anchor_index, moment_index, anchors.size)
+        return cls(
+            moments=moments,
+            anchors=anchors,
+            moment_indptr=moment_indptr,
+            moment_anchors=moment_anchors,
+            anchor_indptr=anchor_indptr,
+            anchor_moments=anchor_moments,
+        )
+
+    def edges(self) -> tuple[np.ndarray, np.ndarray]:
+        """``(moment id, anchor id)`` of every edge."""
+        degrees = np.diff(self.moment_indptr)
+        rows = np.repeat(np.arange(self.moments.size), degrees)
+        return self.moments[rows], self.anchors[self.moment_anchors]
+
+    def with_moment(
+        self, pmot_id: uuid.UUID, anchor_ids: Sequence[uuid.UUID]
+    ) -> "Adjacency":
+        """
+        The graph with the anchors of ``pmot_id`` replaced by ``anchor_ids``.
+        Only the moment's row and the rows of its old and new anchors are
+        rewritten; new nodes are inserted in place and the indices after them
+        shifted, so no edge is sorted again. A moment left without anchors is
+        dropped, as a rebuild from the edges would.
+        """
+        node = _ids([pmot_id])
+        added = np.unique(_ids(anchor_ids))
+
+        # Insert the anchors not in the graph yet, with empty rows
+        anchors, moment_anchors, anchor_indptr = (
+            self.anchors,
+            self.moment_anchors,
+            self.anchor_indptr,
+        )
+        positions = np.searchsorted(anchors, added)
+        known = positions < anchors.size
+        known[known] = anchors[positions[known]] == added[known]
+        new = positions[~known]
+        if new.size:
+            shift = np.searchsorted(new, np.arange(anchors.size), side="right")
+            moment_anchors = (np.arange(anchors.size) + shift).astype(INDEX)[
+                moment_anchors
+            ]
+            anchors = np.insert(anchors, new, added[~known])
+            anchor_indptr = np.insert(anchor_indptr, new, anchor_indptr[new])
+
+        # Insert the moment if it is new, with an empty row
+        moments, moment_indptr, anchor_moments = (
+            self.moments,
+            self.moment_indptr,
+            self.anchor_moments,
+        )
+        m = int(np.searchsorted(moments, node)[0])
+        if m == moments.size or moments[m] != node[0]:
+            moments = np.insert(moments, m, node)
+            moment_indptr = np.insert(moment_indptr, m, moment_indptr[m])
+            anchor_moments = anchor_moments + (anchor_moments >= m).astype(INDEX)
+
+        # Replace the moment's row
+        start, end = int(moment_indptr[m]), int(moment_indptr[m + 1])
+        old = moment_anchors[start:end]
+        row = np.searchsorted(anchors, added).astype(INDEX)
+        moment_anchors = np.concatenate(
+            [moment_anchors[:start], row, moment_anchors[end:]]
+        )
+        moment_indptr = moment_indptr.copy()
+        moment_indptr[m + 1 :] += row.size - old.size
+
+        # Take the moment out of its old anchors' rows and into its new ones'
+        anchor_moments = anchor_moments[anchor_moments != m]
+        anchor_indptr = anchor_indptr.copy()
+        anchor_indptr[1:] -= np.cumsum(np.bincount(old, minlength=anchors.size)).astype(
+            INDEX
+        )
+        inserts = [
+            anchor_indptr[a]
+            + np.searchsorted(
+                anchor_moments[anchor_indptr[a] : anchor_indptr[a + 1]], m
+            )
+            for a in row
+        ]
+        anchor_moments = np.insert(anchor_moments, inserts, m).astype(INDEX)
+        anchor_indptr[1:] += np.cumsum(np.bincount(row, minlength=anchors.size)).astype(
+            INDEX
+        )
+
+        if row.size == 0:
+            moments = np.delete(moments, m)
+            moment_indptr = np.delete(moment_indptr, m)
+            anchor_moments = anchor_moments - (anchor_moments > m).astype(INDEX)
+        return Adjacency(
+            moments=moments,
+            anchors=anchors,
+            moment_indptr=moment_indptr,
+            moment_anchors=moment_anchors.astype(INDEX),
+            anchor_indptr=anchor_indptr,
+            anchor_moments=anchor_moments,
+        )
+
+    def without_moments(self, pmot_ids: Iterable[uuid.UUID]) -> "Adjacency":
+        adjacency = self
+        for pmot_id in pmot_ids:
+            adjacency = adjacency.with_moment(pmot_id, [])
+        return adjacency
+
+    def _find(self, nodes: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        positions = np.searchsorted(nodes, ids)
+        found = positions < nodes.size
+        found[found] = nodes[positions[found]] == ids[found]
+        return positions[found]
+
+    def neighbourhood(
+        self,
+        *,
+        pmot_id: uuid.UUID | None = None,
+        anchor_id: uuid.UUID | None = None,
+        hops: int,
+        max_moments: int,
+    ) -> tuple[list[tuple[uuid.UUID, int]], list[uuid.UUID]]:
+        """
+        Moments within ``hops`` of a moment or an anchor, nearest first and
+        each with its distance, plus the anchors of those moments. One hop
+        goes from a moment through any of its anchors to the other moments
+        of that anchor; the moments of a starting anchor are one hop away.
+        """
+        distance = np.full(self.moments.size, -1, dtype=INDEX)
+        if pmot_id is not None:
+            frontier = self._find(self.moments, _ids([pmot_id]))
+            start = 0
+        else:
+            assert anchor_id is not None
+            anchors = self._find(self.anchors, _ids([anchor_id]))
+            frontier = np.unique(
+                _gather(self.anchor_indptr, self.anchor_moments, anchors)
+            )
+            start = 1
+        frontier = frontier[:max_moments]
+        distance[frontier] = start
+        visited = frontier.size
+        for level in range(start + 1, hops + 1):
+            if frontier.size == 0 or visited >= max_moments:
+                break
+            anchors = np.unique(
+                _gather(self.moment_indptr, self.moment_anchors, frontier)
+            )
+            reached = np.unique(
+                _gather(self.anchor_indptr, self.anchor_moments, anchors)
+            )
+            frontier = reached[distance[reached] < 0][: max_moments - visited]
+            distance[frontier] = level
+            visited += frontier.size
+        (inside,) = np.nonzero(distance >= 0)
+        inside = inside[np.argsort(distance[inside], kind="stable")]
+        shared = np.unique(_gather(self.moment_indptr, self.moment_anchors, inside))
+        moments = to_uuids(self.moments[inside])
+        return (
+            list(zip(moments, distance[inside].tolist(), strict=True)),
+            to_uuids(self.anchors[shared]),
+        )
+
+    def columns(self) -> dict[str, bytes]:
+        return {name: getattr(self, name).tobytes() for name in _COLUMNS}
+
+    @classmethod
+    def from_row(cls, row: AnchorGraph) -> "Adjacency":
+        return cls(
+            **{
+                name: np.frombuffer(
+                    getattr(row, name), dtype=ID if name in _NODES else INDEX
+                )
+                for name in _COLUMNS
+            }
+        )
+
+
+_NODES = ("moments", "anchors")
+_COLUMNS = (
+    "moments",
+    "anchors",
+    "moment_indptr",
+    "moment_anchors",
+    "anchor_indptr",
+    "anchor_moments",
+)
+
+
+def build(session: Session, owner_id: uuid.UUID) -> Adjacency:
+    """The owner's graph from their ``PMOTAnchor`` posting rows."""
+    statement = select(PMOTAnchor.pmot_id, PMOTAnchor.anchor_id).where(
+        col(PMOTAnchor.owner_id) == owner_id
+    )
+    rows = session.connection().execute(statement).all()
+    return Adjacency.from_edges(
+        _ids(row[0] for row in rows), _ids(row[1] for row in rows)
+    )
+
+
+def load(session: Session, owner_id: uuid.UUID) -> Adjacency:
+    row = session.get(AnchorGraph, owner_id)
+    if row is None:
+        return build(session, owner_id)
+    return Adjacency.from_row(row)
+
+
+def set_moment_anchors(
+    session: Session,
+    owner_id: uuid.UUID,
+    pmot_id: uuid.UUID,
+    anchor_ids: Sequence[uuid.UUID],
+) -> None:
+    """
+    Record the new anchors of a moment in the stored graph, without
+    committing. ``PMOTAnchor`` must already hold them.
+    """
+    # Updates of the same owner's graph are serialized on its row
+    statement = (
+        select(AnchorGraph)
+        .where(col(AnchorGraph.owner_id) == owner_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    row = session.exec(statement).first()
+    if row is None:
+        connection = session.connection()
+        table = AnchorGraph.__table__  # type: ignore[attr-defined]
+        insert = upsert_insert(connection)
+        adjacency = build(session, owner_id)
+        created = connection.execute(
+            insert(table)
+            .values(owner_id=owner_id, **adjacency.columns())
+            .on_conflict_do_nothing()
+        )
+        if created.rowcount:
+            return
+        # Another transaction stored the graph first; patch that one
+        row = session.exec(statement).one()
+    adjacency = Adjacency.from_row(row).with_moment(pmot_id, anchor_ids)
+    row.sqlmodel_update(adjacency.columns())
+    session.add(row)
+
+
+def remove_moments(
+    connection: Connection, owner_id: uuid.UUID, pmot_ids: Iterable[uuid.UUID]
+) -> None:
+    """Drop moments from the owner's stored graph, if there is one."""
+    table = AnchorGraph.__table__  # type: ignore[attr-defined]
+    row = connection.execute(
+        select(table).where(table.c.owner_id == owner_id).with_for_update()
+    ).first()
+    if row is None:
+        return
+    adjacency = Adjacency.from_row(row).without_moments(pmot_ids)  # type: ignore[arg-type]
+    connection.execute(
+        table.update().where(table.c.owner_id == owner_id).values(**adjacency.columns())
+    )
+
+
+def _collect_deleted(session: OrmSession, _flush_context: Any, _instances: Any) -> None:
+    pending: dict[Any, set[Any]] = session.info.setdefault(_PENDING, {})
+    for obj in session.deleted:
+        if isinstance(obj, PMOT):
+            pending.setdefault(obj.owner_id, set()).add(obj.id)
+
+
+def _remove_pending(session: OrmSession, _flush_context: Any) -> None:
+    pending = session.info.pop(_PENDING, None)
+    for owner_id, pmot_ids in (pending or {}).items():
+        remove_moments(session.connection(), owner_id, pmot_ids)
+
+
+def track_graph() -> None:
+    """Drop PMOTs from the stored graph in every ORM flush that deletes one."""
+    if event.contains(OrmSession, "before_flush", _collect_deleted):
+        return
+    event.listen(OrmSession, "before_flush", _collect_deleted)
+    event.listen(OrmSession, "after_flush", _remove_pending)
+    event.listen(
+        OrmSession, "after_rollback", lambda session: session.info.pop(_PENDING, None)
+    )
@@ -1,4 +1,5 @@
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 import jwt
@@ -6,11 +7,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core import security
+from app.core import security, timing
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, engine
+from app.core.user_cache import user_cache
 from app.models import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -23,22 +27,61 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Nothing is expired on commit, since reloading an attribute lazily
+    # would need IO outside of an await
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+async def _load_user(session: AsyncSession, token_data: TokenPayload) -> User | None:
+    """
+    Return the token's user, from the user cache when the cached token version
+    matches. A cached user is attached to the session without a query, so it
+    can be updated or compared with other loaded users like a fresh one.
+    """
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-    except (InvalidTokenError, ValidationError):
+        user_id = uuid.UUID(token_data.sub)
+    except (TypeError, ValueError):
+        return None
+    values = user_cache.get(user_id)
+    if values is not None and values["token_version"] == token_data.ver:
+        # Not model_validate: it would read the items relationship off the
+        # dict and find dict.items
+        cached = User(**values)
+        make_transient_to_detached(cached)
+        session.add(cached)
+        return cached
+    user = await session.get(User, user_id)
+    if user is None:
+        return None
+    if user.token_version != token_data.ver:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+    user_cache.set(user)
+    return user
+
+
+async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
+    with timing.span("auth"):
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+            )
+            token_data = TokenPayload(**payload)
+        except (InvalidTokenError, ValidationError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        user = await _load_user(session, token_data)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -49,7 +92,7 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+async def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
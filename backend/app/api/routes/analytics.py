@@ -0,0 +1,104 @@
+from datetime import date
+from typing import Any, Literal
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from app.analytics import distribution
+from app.api.deps import AsyncSessionDep, CurrentUser
+from app.core.db import run_sync
+from app.core.timing import TimedRoute
+from app.empathy import user_empathy_summary
+from app.models import (
+    ChangePointPublic,
+    EmotionalImpactPublic,
+    EmpathySummaryPublic,
+    TrajectoryPublic,
+)
+from app.trajectory import Trajectory, to_date, user_trajectory
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/emotional-impact", response_model=EmotionalImpactPublic)
+async def read_emotional_impact(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    bucket: Literal["month", "year"] = "month",
+    from_date: date | None = Query(default=None, alias="from"),
+    to_date: date | None = Query(default=None, alias="to"),
+) -> Any:
+    """
+    Distribution of the current user's PMOTs over emotional impact, per
+    month or year of their event date. Periods without PMOTs are omitted.
+    """
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    data = await run_sync(
+        session,
+        lambda sync_session: distribution(
+            sync_session, current_user.id, bucket, from_date, to_date
+        ),
+    )
+    return EmotionalImpactPublic(bucket=bucket, data=data)
+
+
+@router.get("/trajectory", response_model=TrajectoryPublic)
+async def read_trajectory(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    window: int = Query(default=30, ge=1, le=10000),
+    alpha: float = Query(default=0.1, gt=0, le=1),
+    max_points: int = Query(default=1000, ge=2, le=10000),
+) -> Any:
+    """
+    Emotional trajectory of the current user's PMOTs in event date order:
+    each PMOT's score (-2 for Extremely Sad to 2 for Extremely Happy), the
+    mean of the last window scores, an exponentially weighted average with
+    smoothing factor alpha, and the points where the mean score shifts.
+
+    Longer histories are sampled down to max_points evenly spaced PMOTs;
+    the smoothing and change points are still computed over all of them.
+    """
+    trajectory = await user_trajectory(
+        session, current_user.id, window=window, alpha=alpha
+    )
+    return await run_in_threadpool(_trajectory_public, trajectory, max_points)
+
+
+def _trajectory_public(trajectory: Trajectory, max_points: int) -> TrajectoryPublic:
+    count = trajectory.scores.size
+    sample: slice | np.ndarray = slice(None)
+    if count > max_points:
+        sample = np.unique(np.linspace(0, count - 1, max_points).round().astype(int))
+    days = trajectory.days[sample]
+    return TrajectoryPublic(
+        count=count,
+        dates=[to_date(day) for day in days.tolist()],
+        scores=trajectory.scores[sample].tolist(),
+        rolling_mean=trajectory.rolling_mean[sample].tolist(),
+        ewma=trajectory.ewma[sample].tolist(),
+        change_points=[
+            ChangePointPublic(
+                event_date=to_date(trajectory.days[point.index]),
+                before=point.before,
+                after=point.after,
+            )
+            for point in trajectory.change_points
+        ],
+    )
+
+
+@router.get("/empathy", response_model=EmpathySummaryPublic)
+async def read_empathy_summary(
+    session: AsyncSessionDep, current_user: CurrentUser
+) -> Any:
+    """
+    Cell-wise mean, variance and drift per year of the empathy matrices on
+    the current user's PMOTs. Fields are null when no PMOT has a matrix.
+    """
+    return await run_sync(
+        session,
+        lambda sync_session: user_empathy_summary(sync_session, current_user.id),
+    )
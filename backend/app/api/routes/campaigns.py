@@ -0,0 +1,86 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlmodel import col, func, select
+
+from app.api.deps import AsyncSessionDep, get_current_active_superuser
+from app.core.config import settings
+from app.core.timing import TimedRoute
+from app.email_campaigns import run_campaign
+from app.models import (
+    EmailCampaign,
+    EmailCampaignCreate,
+    EmailCampaignPublic,
+    EmailCampaignsPublic,
+)
+
+router = APIRouter(
+    route_class=TimedRoute, dependencies=[Depends(get_current_active_superuser)]
+)
+
+
+@router.get("/", response_model=EmailCampaignsPublic)
+async def read_campaigns(
+    session: AsyncSessionDep, skip: int = 0, limit: int = 100
+) -> Any:
+    """
+    Retrieve email campaigns, newest first.
+    """
+    count_statement = select(func.count()).select_from(EmailCampaign)
+    count = (await session.exec(count_statement)).one()
+    statement = (
+        select(EmailCampaign)
+        .order_by(col(EmailCampaign.created_at).desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    campaigns = (await session.exec(statement)).all()
+    return EmailCampaignsPublic(data=campaigns, count=count)
+
+
+@router.get("/{id}", response_model=EmailCampaignPublic)
+async def read_campaign(session: AsyncSessionDep, id: uuid.UUID) -> Any:
+    """
+    Get an email campaign and its progress.
+    """
+    campaign = await session.get(EmailCampaign, id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+
+@router.post("/", response_model=EmailCampaignPublic, status_code=201)
+async def create_campaign(
+    *,
+    session: AsyncSessionDep,
+    campaign_in: EmailCampaignCreate,
+    background_tasks: BackgroundTasks,
+) -> Any:
+    """
+    Send an email to every active user in the background.
+    """
+    if not settings.emails_enabled:
+        raise HTTPException(status_code=400, detail="Emails are not enabled")
+    campaign = EmailCampaign.model_validate(campaign_in)
+    session.add(campaign)
+    await session.commit()
+    await session.refresh(campaign)
+    background_tasks.add_task(run_campaign, campaign.id)
+    return campaign
+
+
+@router.post("/{id}/resume", response_model=EmailCampaignPublic)
+async def resume_campaign(
+    session: AsyncSessionDep, id: uuid.UUID, background_tasks: BackgroundTasks
+) -> Any:
+    """
+    Resume an interrupted campaign from its last checkpoint.
+    """
+    campaign = await session.get(EmailCampaign, id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if campaign.status == "finished":
+        raise HTTPException(status_code=400, detail="Campaign already finished")
+    background_tasks.add_task(run_campaign, campaign.id)
+    return campaign
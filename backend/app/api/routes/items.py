@@ -1,52 +1,74 @@
 import uuid
-from typing import Any
+from typing import Any, Literal
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import col
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app.api.deps import AsyncSessionDep, CurrentUser
+from app.core.db import run_sync
+from app.core.pagination import InvalidCursorError, Sort, paginate
+from app.core.timing import TimedRoute
+from app.models import PMOT, Message, PMOTCreate, PMOTPublic, PMOTsPublic, PMOTUpdate
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
+ITEM_SORT_COLUMNS = {"created_at": PMOT.created_at, "label": PMOT.label}
 
-@router.get("/", response_model=ItemsPublic)
-def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+
+@router.get("/", response_model=PMOTsPublic)
+async def read_items(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    sort: Literal["created_at", "-created_at", "label", "-label"] = "-created_at",
+    cursor: str | None = None,
+    approximate_count: bool = False,
 ) -> Any:
     """
     Retrieve items.
-    """
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
+    Pass next_cursor or prev_cursor from a previous page as cursor to page
+    forward or backward; skip is ignored when a cursor is given, and count is
+    the total of the first page. With approximate_count, large totals come
+    from planner statistics and count_is_estimate is set.
+    """
+    criteria = []
+    if not current_user.is_superuser:
+        criteria.append(col(PMOT.owner_id) == current_user.id)
+    try:
+        page = await run_sync(
+            session,
+            lambda sync_session: paginate(
+                sync_session,
+                PMOT,
+                *criteria,
+                sort=Sort.parse(sort, ITEM_SORT_COLUMNS),
+                skip=skip,
+                limit=limit,
+                cursor=cursor,
+                approximate=approximate_count,
+            ),
         )
-        items = session.exec(statement).all()
-
-    return ItemsPublic(data=items, count=count)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PMOTsPublic(
+        data=page.data,
+        count=page.count,
+        count_is_estimate=page.count_is_estimate,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
 
 
-@router.get("/{id}", response_model=ItemPublic)
-def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+@router.get("/{id}", response_model=PMOTPublic)
+async def read_item(
+    session: AsyncSessionDep, current_user: CurrentUser, id: uuid.UUID
+) -> Any:
     """
     Get item by ID.
     """
-    item = session.get(Item, id)
+    item = await session.get(PMOT, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
@@ -54,32 +76,32 @@ def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) ->
     return item
 
 
-@router.post("/", response_model=ItemPublic)
-def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+@router.post("/", response_model=PMOTPublic)
+async def create_item(
+    *, session: AsyncSessionDep, current_user: CurrentUser, item_in: PMOTCreate
 ) -> Any:
     """
     Create new item.
     """
-    item = Item.model_validate(item_in, update={"owner_id": current_user.id})
+    item = PMOT.model_validate(item_in, update={"owner_id": current_user.id})
     session.add(item)
-    session.commit()
-    session.refresh(item)
+    await session.commit()
+    await session.refresh(item)
     return item
 
 
-@router.put("/{id}", response_model=ItemPublic)
-def update_item(
+@router.put("/{id}", response_model=PMOTPublic)
+async def update_item(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     current_user: CurrentUser,
     id: uuid.UUID,
-    item_in: ItemUpdate,
+    item_in: PMOTUpdate,
 ) -> Any:
     """
     Update an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(PMOT, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
@@ -87,23 +109,23 @@ def update_item(
     update_dict = item_in.model_dump(exclude_unset=True)
     item.sqlmodel_update(update_dict)
     session.add(item)
-    session.commit()
-    session.refresh(item)
+    await session.commit()
+    await session.refresh(item)
     return item
 
 
 @router.delete("/{id}")
-def delete_item(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+async def delete_item(
+    session: AsyncSessionDep, current_user: CurrentUser, id: uuid.UUID
 ) -> Message:
     """
     Delete an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(PMOT, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.commit()
     return Message(message="Item deleted successfully")
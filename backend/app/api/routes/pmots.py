@@ -0,0 +1,284 @@
+import uuid
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import anchor_graph
+from app.api.deps import AsyncSessionDep, CurrentUser
+from app.core.config import settings
+from app.core.db import async_engine, run_sync
+from app.core.timing import TimedRoute
+from app.duplicates import possible_duplicates
+from app.models import (
+    PMOT,
+    Anchor,
+    AnchorGraphPublic,
+    DuplicateGroupPublic,
+    DuplicateGroupsPublic,
+    GraphMomentPublic,
+    PMOTPublic,
+    PMOTSearchPublic,
+    RelatedPMOTPublic,
+    RelatedPMOTsPublic,
+    normalize_tag,
+)
+from app.related import related_pmots
+from app.tags import ANCHORS, Mode, search, tag_ids
+
+router = APIRouter(route_class=TimedRoute)
+
+_TIMELINE_COLUMNS = [getattr(PMOT, name) for name in PMOTPublic.model_fields]
+
+
+@router.get("/search", response_model=PMOTSearchPublic)
+async def search_pmots(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    strength: list[str] = Query(default=[], max_length=20),
+    strength_mode: Mode = "all",
+    anchor: list[str] = Query(default=[], max_length=20),
+    anchor_mode: Mode = "all",
+    skip: int = 0,
+    limit: int = Query(default=100, le=1000),
+) -> Any:
+    """
+    Search the current user's PMOTs by strength and anchor, newest first.
+
+    Repeat strength or anchor to filter on several; the mode says whether a
+    PMOT needs all of them or any one. Strength and anchor filters are
+    combined with AND. The facets count the strengths and anchors of every
+    matching PMOT, not only those on this page.
+    """
+    data, count, strength_facets, anchor_facets = await run_sync(
+        session,
+        lambda sync_session: search(
+            sync_session,
+            current_user.id,
+            strengths=sorted({normalize_tag(name) for name in strength} - {""}),
+            strength_mode=strength_mode,
+            anchors=sorted({normalize_tag(name) for name in anchor} - {""}),
+            anchor_mode=anchor_mode,
+            skip=skip,
+            limit=limit,
+        ),
+    )
+    return PMOTSearchPublic(
+        data=data,
+        count=count,
+        strength_facets=strength_facets,
+        anchor_facets=anchor_facets,
+    )
+
+
+def _graph(
+    session: Session,
+    owner_id: uuid.UUID,
+    pmot_id: uuid.UUID | None,
+    anchor: str | None,
+    hops: int,
+    max_moments: int,
+) -> AnchorGraphPublic | None:
+    anchor_id = None
+    if anchor is not None:
+        name = normalize_tag(anchor)
+        anchor_id = tag_ids(session, ANCHORS, owner_id, [name]).get(name)
+        if anchor_id is None:
+            return None
+    elif (
+        session.exec(
+            select(PMOT.id).where(
+                col(PMOT.id) == pmot_id, col(PMOT.owner_id) == owner_id
+            )
+        ).first()
+        is None
+    ):
+        return None
+    graph = anchor_graph.load(session, owner_id)
+    reached, anchor_ids = graph.neighbourhood(
+        pmot_id=pmot_id, anchor_id=anchor_id, hops=hops, max_moments=max_moments
+    )
+    hop = dict(reached)
+    # The graph may still list moments deleted outside the ORM, like a purge
+    rows = session.exec(
+        select(col(PMOT.id), col(PMOT.label), col(PMOT.event_date)).where(
+            col(PMOT.owner_id) == owner_id, col(PMOT.id).in_(list(hop))
+        )
+    ).all()
+    moments = sorted(
+        (
+            GraphMomentPublic(id=id, label=label, event_date=event_date, hop=hop[id])
+            for id, label, event_date in rows
+        ),
+        key=lambda moment: (moment.hop, moment.event_date, moment.id),
+    )
+    names = session.exec(
+        select(Anchor.name)
+        .where(col(Anchor.owner_id) == owner_id, col(Anchor.id).in_(anchor_ids))
+        .order_by(col(Anchor.name))
+    ).all()
+    return AnchorGraphPublic(moments=moments, anchors=list(names))
+
+
+@router.get("/graph", response_model=AnchorGraphPublic)
+async def read_pmot_graph(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    pmot_id: uuid.UUID | None = None,
+    anchor: str | None = Query(default=None, max_length=64),
+    hops: int = Query(default=2, ge=1, le=5),
+    max_moments: int = Query(default=200, ge=1, le=5000),
+) -> Any:
+    """
+    PMOTs connected to a PMOT or an anchor through shared anchors.
+
+    Give exactly one of pmot_id or anchor. Each hop goes from a PMOT to the
+    other PMOTs sharing one of its anchors; the PMOTs of the starting anchor
+    are one hop away. Moments come back nearest first, at most max_moments.
+    """
+    if (pmot_id is None) == (anchor is None):
+        raise HTTPException(
+            status_code=400, detail="Give exactly one of pmot_id or anchor"
+        )
+    graph = await run_sync(
+        session,
+        lambda sync_session: _graph(
+            sync_session, current_user.id, pmot_id, anchor, hops, max_moments
+        ),
+    )
+    if graph is None:
+        raise HTTPException(status_code=404, detail="PMOT or anchor not found")
+    return graph
+
+
+async def _timeline_lines(
+    owner_id: uuid.UUID, from_date: date | None, to_date: date | None
+) -> AsyncIterator[bytes]:
+    statement = (
+        select(*_TIMELINE_COLUMNS)
+        .where(col(PMOT.owner_id) == owner_id)
+        .order_by(col(PMOT.event_date), col(PMOT.id))
+        .execution_options(yield_per=settings.TIMELINE_FETCH_SIZE)
+    )
+    if from_date is not None:
+        statement = statement.where(col(PMOT.event_date) >= from_date)
+    if to_date is not None:
+        statement = statement.where(col(PMOT.event_date) <= to_date)
+    # The request's session is closed when the handler returns, before the
+    # body is sent, so the stream holds its own connection
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(statement)
+        async for rows in result.mappings().partitions():
+            yield b"".join(
+                PMOTPublic.model_validate(row).model_dump_json().encode() + b"\n"
+                for row in rows
+            )
+
+
+@router.get(
+    "/timeline",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def read_timeline(
+    current_user: CurrentUser,
+    from_date: date | None = Query(default=None, alias="from"),
+    to_date: date | None = Query(default=None, alias="to"),
+) -> Any:
+    """
+    The current user's PMOTs with an event date from ``from`` to ``to``
+    (both inclusive, either optional), oldest first, as newline-delimited
+    JSON: one PMOT per line, sent as it is read from the database.
+    """
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    return StreamingResponse(
+        _timeline_lines(current_user.id, from_date, to_date),
+        media_type="application/x-ndjson",
+    )
+
+
+def _related(
+    session: Session, owner_id: uuid.UUID, pmot_id: uuid.UUID, k: int
+) -> RelatedPMOTsPublic | None:
+    pmot = session.get(PMOT, pmot_id)
+    if pmot is None or pmot.owner_id != owner_id:
+        return None
+    scores = dict(related_pmots(session, pmot, k))
+    # The index may still list moments deleted by writes it did not see
+    rows = session.exec(
+        select(PMOT).where(
+            col(PMOT.owner_id) == owner_id, col(PMOT.id).in_(list(scores))
+        )
+    ).all()
+    data = [
+        RelatedPMOTPublic.model_validate(row, update={"score": scores[row.id]})
+        for row in rows
+    ]
+    data.sort(key=lambda related: related.score, reverse=True)
+    return RelatedPMOTsPublic(data=data)
+
+
+@router.get("/{pmot_id}/related", response_model=RelatedPMOTsPublic)
+async def read_related_pmots(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    pmot_id: uuid.UUID,
+    k: int = Query(default=10, ge=1, le=100),
+) -> Any:
+    """
+    The current user's PMOTs whose stories are most similar to this one,
+    by cosine similarity of TF-IDF vectors over label and short story.
+    """
+    related = await run_sync(
+        session,
+        lambda sync_session: _related(sync_session, current_user.id, pmot_id, k),
+    )
+    if related is None:
+        raise HTTPException(status_code=404, detail="PMOT not found")
+    return related
+
+
+def _duplicates(
+    session: Session, owner_id: uuid.UUID, threshold: float
+) -> DuplicateGroupsPublic:
+    groups = possible_duplicates(session, owner_id, threshold)
+    ids = [pmot_id for members, _ in groups for pmot_id in members]
+    pmots = {
+        pmot.id: pmot
+        for pmot in session.exec(select(PMOT).where(col(PMOT.id).in_(ids))).all()
+    }
+    return DuplicateGroupsPublic(
+        data=[
+            DuplicateGroupPublic(
+                data=sorted(
+                    (pmots[pmot_id] for pmot_id in members if pmot_id in pmots),
+                    key=lambda pmot: (pmot.created_at, pmot.id),
+                ),
+                similarity=similarity,
+            )
+            for members, similarity in groups
+        ]
+    )
+
+
+@router.get("/duplicates", response_model=DuplicateGroupsPublic)
+async def read_duplicate_pmots(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    threshold: float = Query(default=0.8, ge=0.5, le=1),
+) -> Any:
+    """
+    Groups of the current user's PMOTs whose short stories look like copies
+    of each other: each PMOT in a group has an estimated Jaccard similarity
+    of at least threshold with another one in it, over 5-character shingles.
+    Oldest first within a group.
+    """
+    return await run_sync(
+        session,
+        lambda sync_session: _duplicates(sync_session, current_user.id, threshold),
+    )
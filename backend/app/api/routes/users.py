@@ -1,19 +1,24 @@
 import uuid
-from typing import Any
+from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlmodel import col
+from starlette.concurrency import run_in_threadpool
 
-from app import crud
+from app import async_crud
 from app.api.deps import (
+    AsyncSessionDep,
     CurrentUser,
-    SessionDep,
     get_current_active_superuser,
 )
 from app.core.config import settings
+from app.core.db import run_sync
+from app.core.pagination import InvalidCursorError, Sort, paginate
 from app.core.security import get_password_hash, verify_password
+from app.core.timing import TimedRoute
+from app.core.user_cache import user_cache
+from app.email_outbox import outbox_sender
 from app.models import (
-    Item,
     Message,
     UpdatePassword,
     User,
@@ -24,9 +29,10 @@ from app.models import (
     UserUpdate,
     UserUpdateMe,
 )
-from app.utils import generate_new_account_email, send_email
+from app.user_purge import mark_deleted, purge_user
+from app.utils import generate_new_account_email
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get(
@@ -34,57 +40,89 @@ router = APIRouter()
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+async def read_users(
+    session: AsyncSessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    sort: Literal["email", "-email"] = "email",
+    cursor: str | None = None,
+    approximate_count: bool = False,
+) -> Any:
     """
     Retrieve users.
-    """
-
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
-
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
 
-    return UsersPublic(data=users, count=count)
+    Pass next_cursor or prev_cursor from a previous page as cursor to page
+    forward or backward; skip is ignored when a cursor is given, and count is
+    the total of the first page. With approximate_count, large totals come
+    from planner statistics and count_is_estimate is set.
+    """
+    try:
+        page = await run_sync(
+            session,
+            lambda sync_session: paginate(
+                sync_session,
+                User,
+                col(User.deleted_at).is_(None),
+                sort=Sort.parse(sort, {"email": User.email}),
+                skip=skip,
+                limit=limit,
+                cursor=cursor,
+                approximate=approximate_count,
+            ),
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return UsersPublic(
+        data=page.data,
+        count=page.count,
+        count_is_estimate=page.count_is_estimate,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
 
 
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: AsyncSessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await async_crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
         )
-        send_email(
+        # Committed together with the user by async_crud.create_user
+        async_crud.enqueue_email(
+            session=session,
             email_to=user_in.email,
             subject=email_data.subject,
             html_content=email_data.html_content,
         )
+    user = await async_crud.create_user(session=session, user_create=user_in)
+    outbox_sender.notify()
     return user
 
 
 @router.patch("/me", response_model=UserPublic)
-def update_user_me(
-    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
+async def update_user_me(
+    *, session: AsyncSessionDep, user_in: UserUpdateMe, current_user: CurrentUser
 ) -> Any:
     """
     Update own user.
     """
 
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await async_crud.get_user_by_email(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
@@ -92,33 +130,43 @@ def update_user_me(
     user_data = user_in.model_dump(exclude_unset=True)
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    await session.commit()
+    await session.refresh(current_user)
+    user_cache.invalidate(current_user.id)
     return current_user
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
-    *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
+async def update_password_me(
+    *, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentUser
 ) -> Any:
     """
     Update own password.
+
+    Every token issued before is revoked, including the one used here.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    # The cached user may hold a hash changed through another worker
+    await session.refresh(current_user)
+    if not await run_in_threadpool(
+        verify_password, body.current_password, current_user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await run_in_threadpool(get_password_hash, body.new_password)
     current_user.hashed_password = hashed_password
+    # Other workers' cached copies of the user no longer match new tokens
+    current_user.token_version += 1
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    user_cache.invalidate(current_user.id)
     return Message(message="Password updated successfully")
 
 
 @router.get("/me", response_model=UserPublic)
-def read_user_me(current_user: CurrentUser) -> Any:
+async def read_user_me(current_user: CurrentUser) -> Any:
     """
     Get current user.
     """
@@ -126,45 +174,52 @@ def read_user_me(current_user: CurrentUser) -> Any:
 
 
 @router.delete("/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+async def delete_user_me(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    background_tasks: BackgroundTasks,
+) -> Any:
     """
     Delete own user.
+
+    The account is deactivated at once; its data is removed in the background.
     """
     if current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == current_user.id)
-    session.exec(statement)  # type: ignore
-    session.delete(current_user)
-    session.commit()
+    mark_deleted(current_user)
+    session.add(current_user)
+    await session.commit()
+    user_cache.invalidate(current_user.id)
+    background_tasks.add_task(purge_user, current_user.id)
     return Message(message="User deleted successfully")
 
 
 @router.post("/signup", response_model=UserPublic)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await async_crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    user = await async_crud.create_user(session=session, user_create=user_create)
     return user
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-def read_user_by_id(
-    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+async def read_user_by_id(
+    user_id: uuid.UUID, session: AsyncSessionDep, current_user: CurrentUser
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if user == current_user:
         return user
     if not current_user.is_superuser:
@@ -180,9 +235,9 @@ def read_user_by_id(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     user_id: uuid.UUID,
     user_in: UserUpdate,
 ) -> Any:
@@ -190,39 +245,49 @@ def update_user(
     Update a user.
     """
 
-    db_user = session.get(User, user_id)
-    if not db_user:
+    db_user = await session.get(User, user_id)
+    if not db_user or db_user.deleted_at is not None:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await async_crud.get_user_by_email(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    db_user = await async_crud.update_user(
+        session=session, db_user=db_user, user_in=user_in
+    )
     return db_user
 
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
-def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+async def delete_user(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    user_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
 ) -> Message:
     """
     Delete a user.
+
+    The user is deactivated at once; their data is removed in the background.
     """
-    user = session.get(User, user_id)
-    if not user:
+    user = await session.get(User, user_id)
+    if not user or user.deleted_at is not None:
         raise HTTPException(status_code=404, detail="User not found")
     if user == current_user:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    mark_deleted(user)
+    session.add(user)
+    await session.commit()
+    user_cache.invalidate(user_id)
+    background_tasks.add_task(purge_user, user_id)
     return Message(message="User deleted successfully")
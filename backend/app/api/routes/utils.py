@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends
+from typing import Any, Literal
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from pydantic.networks import EmailStr
 
-from app.api.deps import get_current_active_superuser
-from app.models import Message
-from app.utils import generate_test_email, send_email
+from app import async_crud
+from app.api.deps import AsyncSessionDep, get_current_active_superuser
+from app.core.profiler import CpuSampler, MemoryTracer, ProfilerBusyError
+from app.core.slow_query import slow_query_log
+from app.core.timing import TimedRoute
+from app.email_outbox import outbox_sender
+from app.models import Message, SlowQueryPublic
+from app.utils import generate_test_email
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post(
@@ -13,14 +22,93 @@ router = APIRouter()
     dependencies=[Depends(get_current_active_superuser)],
     status_code=201,
 )
-def test_email(email_to: EmailStr) -> Message:
+async def test_email(session: AsyncSessionDep, email_to: EmailStr) -> Message:
     """
     Test emails.
     """
     email_data = generate_test_email(email_to=email_to)
-    send_email(
+    async_crud.enqueue_email(
+        session=session,
         email_to=email_to,
         subject=email_data.subject,
         html_content=email_data.html_content,
     )
+    await session.commit()
+    outbox_sender.notify()
     return Message(message="Test email sent")
+
+
+@router.get(
+    "/slow-queries/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[SlowQueryPublic],
+)
+async def read_slow_queries(limit: int = 20) -> Any:
+    """
+    Slowest queries seen by this worker, by total time.
+    """
+    return [
+        SlowQueryPublic(
+            fingerprint=stats.fingerprint,
+            statement=stats.statement,
+            param_shape=stats.param_shape,
+            calls=stats.calls,
+            total_ms=stats.total_time * 1000,
+            max_ms=stats.max_time * 1000,
+            mean_ms=stats.total_time * 1000 / stats.calls,
+            routes=dict(stats.routes),
+            plan=stats.plan,
+        )
+        for stats in slow_query_log.top(limit)
+    ]
+
+
+@router.delete(
+    "/slow-queries/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def reset_slow_queries() -> Message:
+    """
+    Clear the slow query statistics of this worker.
+    """
+    slow_query_log.reset()
+    return Message(message="Slow query statistics cleared")
+
+
+@router.post(
+    "/profile/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def profile_worker(
+    seconds: float = Query(default=10, gt=0, le=60),
+    mode: Literal["cpu", "memory"] = "cpu",
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+    interval_ms: float = Query(default=5, ge=1, le=100),
+) -> Any:
+    """
+    Profile the worker serving this request for the given number of seconds.
+
+    CPU mode samples every thread's stack and returns collapsed stacks (for
+    flamegraph.pl) or speedscope JSON, attributed to the route being served.
+    Memory mode returns the tracemalloc allocations that grew the most.
+    """
+    try:
+        if mode == "memory":
+            tracer = MemoryTracer()
+            tracer.start()
+            try:
+                await anyio.sleep(seconds)
+            finally:
+                allocations = tracer.stop()
+            return allocations
+        sampler = CpuSampler(interval=interval_ms / 1000)
+        sampler.start()
+        try:
+            await anyio.sleep(seconds)
+        finally:
+            cpu_profile = sampler.stop()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "speedscope":
+        return cpu_profile.speedscope()
+    return PlainTextResponse(cpu_profile.collapsed())
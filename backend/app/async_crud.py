@@ -0,0 +1,148 @@
+"""
+Async counterparts of the functions in ``crud.py`` for request handlers.
+
+Password hashing stays on a worker thread so a bcrypt round never blocks the
+event loop. Scripts and background threads keep using ``crud.py``.
+"""
+
+import uuid
+from typing import Any
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.db import run_sync
+from app.core.security import get_password_hash, verify_password
+from app.core.user_cache import user_cache
+from app.crud import empathy_columns, set_pmot_tags, user_by_email_statement
+from app.models import (
+    PMOT,
+    EmailOutbox,
+    PMOTCreate,
+    PMOTDetails,
+    PMOTDetailsCreate,
+    PMOTDetailsUpdate,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
+    hashed_password = await run_in_threadpool(get_password_hash, user_create.password)
+    db_obj = User.model_validate(
+        user_create, update={"hashed_password": hashed_password}
+    )
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+async def update_user(
+    *, session: AsyncSession, db_user: User, user_in: UserUpdate
+) -> Any:
+    user_data = user_in.model_dump(exclude_unset=True)
+    extra_data: dict[str, Any] = {}
+    if "password" in user_data:
+        password = user_data["password"]
+        hashed_password = await run_in_threadpool(get_password_hash, password)
+        extra_data["hashed_password"] = hashed_password
+    if "password" in user_data or user_data.get("is_active") is False:
+        # Revoke the user's existing access tokens
+        extra_data["token_version"] = db_user.token_version + 1
+    db_user.sqlmodel_update(user_data, update=extra_data)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    user_cache.invalidate(db_user.id)
+    return db_user
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    result = await session.exec(user_by_email_statement, params={"email": email})
+    return result.first()
+
+
+async def authenticate(
+    *, session: AsyncSession, email: str, password: str
+) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
+    if not db_user:
+        return None
+    if not await run_in_threadpool(verify_password, password, db_user.hashed_password):
+        return None
+    return db_user
+
+
+def enqueue_email(
+    *, session: AsyncSession, email_to: str, subject: str, html_content: str
+) -> EmailOutbox:
+    """
+    Add an email to the outbox without committing, so it is sent only if the
+    caller's transaction commits.
+    """
+    db_email = EmailOutbox(
+        email_to=email_to, subject=subject, html_content=html_content
+    )
+    session.add(db_email)
+    return db_email
+
+
+async def create_pmot(
+    *, session: AsyncSession, pmot_in: PMOTCreate, owner_id: uuid.UUID
+) -> PMOT:
+    db_pmot = PMOT.model_validate(pmot_in, update={"owner_id": owner_id})
+    session.add(db_pmot)
+    await session.commit()
+    await session.refresh(db_pmot)
+    return db_pmot
+
+
+async def create_pmot_details(
+    *, session: AsyncSession, details_in: PMOTDetailsCreate, pmot_id: uuid.UUID
+) -> PMOTDetails:
+    db_pmot_details = PMOTDetails.model_validate(
+        details_in,
+        update={"pmot_id": pmot_id, **empathy_columns(details_in.empathy_matrix)},
+    )
+    session.add(db_pmot_details)
+    await run_sync(
+        session,
+        lambda sync_session: set_pmot_tags(
+            session=sync_session,
+            pmot_id=pmot_id,
+            strengths=details_in.strengths,
+            anchors=details_in.anchors,
+        ),
+    )
+    await session.commit()
+    await session.refresh(db_pmot_details)
+    return db_pmot_details
+
+
+async def update_pmot_details(
+    *,
+    session: AsyncSession,
+    db_pmot_details: PMOTDetails,
+    pmot_details_in: PMOTDetailsUpdate,
+) -> PMOTDetails:
+    update_data = pmot_details_in.model_dump(exclude_unset=True)
+    if "empathy_matrix" in update_data:
+        update_data.update(empathy_columns(update_data.pop("empathy_matrix")))
+    strengths = update_data.pop("strengths", None)
+    anchors = update_data.pop("anchors", None)
+    await run_sync(
+        session,
+        lambda sync_session: set_pmot_tags(
+            session=sync_session,
+            pmot_id=db_pmot_details.pmot_id,
+            strengths=strengths,
+            anchors=anchors,
+        ),
+    )
+    db_pmot_details.sqlmodel_update(update_data)
+    session.add(db_pmot_details)
+    await session.commit()
+    await session.refresh(db_pmot_details)
+    return db_pmot_details
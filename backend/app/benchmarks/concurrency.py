@@ -0,0 +1,99 @@
+"""
+Throughput and latency of read_items and login under many concurrent clients.
+
+Run against a live server, e.g. one uvicorn worker so the numbers compare
+the handlers rather than the process count:
+
+    uvicorn app.main:app --workers 1 --port 8000
+    python -m app.benchmarks.concurrency --base-url http://localhost:8000
+
+Each level runs ``--duration`` seconds of closed-loop clients that send the
+next request as soon as the previous one returns. Comparing a build with
+sync handlers to one with async handlers shows where the 40-thread pool caps
+concurrency.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from app.core.config import settings
+
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+async def run_level(
+    base_url: str, request: Request, concurrency: int, duration: float
+) -> tuple[float, float, float, int]:
+    """Return requests/s, p50 and p99 latency in ms, and the error count."""
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await request(client)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    if not latencies:
+        return 0.0, 0.0, 0.0, errors
+    quantiles = statistics.quantiles(latencies, n=100)
+    return len(latencies) / elapsed, quantiles[49] * 1000, quantiles[98] * 1000, errors
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    credentials = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    login_url = f"{settings.API_V1_STR}/login/access-token"
+    async with httpx.AsyncClient(base_url=args.base_url) as client:
+        response = await client.post(login_url, data=credentials)
+        response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    requests: dict[str, Request] = {
+        "read_items": lambda client: client.get(
+            f"{settings.API_V1_STR}/items/?limit=20", headers=headers
+        ),
+        "login": lambda client: client.post(login_url, data=credentials),
+    }
+    for name, request in requests.items():
+        for concurrency in args.concurrency:
+            rate, p50, p99, errors = await run_level(
+                args.base_url, request, concurrency, args.duration
+            )
+            print(
+                f"{name:>10} x{concurrency:<5} {rate:8.1f} req/s  "
+                f"p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  errors {errors}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Per-render cost of the password reset email, before and after caching.
+
+    python -m app.benchmarks.email_templates
+"""
+
+import timeit
+from typing import Any
+
+from jinja2 import Template
+
+from app.utils import (
+    EMAIL_TEMPLATES_DIR,
+    preload_email_templates,
+    render_email_template,
+)
+
+CONTEXT: dict[str, Any] = {
+    "project_name": "PMOT",
+    "username": "someone@example.com",
+    "email": "someone@example.com",
+    "valid_hours": 48,
+    "link": "https://example.com/reset-password?token=abc",
+}
+
+
+def render_uncached() -> str:
+    # What render_email_template did before: read the file and compile it
+    template_str = (EMAIL_TEMPLATES_DIR / "reset_password.html").read_text()
+    return Template(template_str).render(CONTEXT)
+
+
+def render_cached() -> str:
+    return render_email_template(template_name="reset_password.html", context=CONTEXT)
+
+
+def main(number: int = 2000) -> None:
+    preload_email_templates()
+    assert render_uncached() == render_cached()
+    for name, fn in (("uncached", render_uncached), ("cached", render_cached)):
+        best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        print(f"{name:>9}: {best * 1e6:8.1f} us/render")
+
+
+if __name__ == "__main__":
+    main()
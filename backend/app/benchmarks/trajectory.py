@@ -0,0 +1,75 @@
+"""
+Time to compute an emotional trajectory for long PMOT histories.
+
+Times each stage of ``app.trajectory.compute`` on synthetic series (scores
+drawn around a mean that shifts a few times), and with ``--email`` also the
+columnar load of that user's series from the configured database:
+
+    python -m app.benchmarks.trajectory --events 100000 --email me@example.com
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.models import User
+from app.trajectory import change_points, ewma, load_series, rolling_mean
+
+
+def best_ms(function: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def synthetic_scores(events: int, shifts: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    means = rng.uniform(-1.5, 1.5, shifts + 1)
+    segment = np.sort(rng.integers(0, events, shifts))
+    mean = means[np.searchsorted(segment, np.arange(events), side="right")]
+    return np.clip(np.round(mean + rng.normal(0, 0.8, events)), -2, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--events", type=int, nargs="+", default=[1000, 10_000, 100_000]
+    )
+    parser.add_argument("--shifts", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--email", help="also time loading this user's series")
+    args = parser.parse_args()
+
+    for events in args.events:
+        scores = synthetic_scores(events, args.shifts, seed=events)
+        stages = {
+            "rolling": lambda scores=scores: rolling_mean(scores, 30),
+            "ewma": lambda scores=scores: ewma(scores, 0.1),
+            "changes": lambda scores=scores: change_points(scores, 10, 3.0, 10),
+        }
+        timings = {name: best_ms(stage, args.repeat) for name, stage in stages.items()}
+        found = len(change_points(scores, 10, 3.0, 10))
+        print(
+            f"{events:>8,} events: "
+            + "  ".join(f"{name} {ms:7.2f} ms" for name, ms in timings.items())
+            + f"  total {sum(timings.values()):7.2f} ms, {found} change points"
+        )
+
+    if args.email:
+        with Session(engine) as session:
+            user = session.exec(select(User).where(User.email == args.email)).one()
+            days, _ = load_series(session, user.id)
+            ms = best_ms(lambda: load_series(session, user.id), args.repeat)
+        print(f"load {days.size:,} events for {args.email}: {ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
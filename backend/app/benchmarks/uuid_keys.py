@@ -0,0 +1,114 @@
+"""
+Random (uuid4) versus time-ordered (uuid7) primary keys on PostgreSQL.
+
+Loads the same number of rows into two scratch tables that differ only in
+how their keys are generated, then reports insert throughput (overall and
+for the last tenth of the load, once the index has outgrown the cache),
+primary key index size, and point lookup latency for random and recent keys.
+
+    python -m app.benchmarks.uuid_keys --rows 5000000
+
+The scratch tables are created in the configured database and dropped at
+the end unless --keep is passed.
+"""
+
+import argparse
+import random
+import time
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy import Connection, text
+
+from app.core.db import engine
+from app.core.ids import uuid7
+
+PAYLOAD = "x" * 64
+
+
+def load(
+    conn: Connection,
+    table: str,
+    new_id: Callable[[], uuid.UUID],
+    rows: int,
+    batch_size: int,
+    samples: int,
+) -> tuple[float, float, list[uuid.UUID], list[uuid.UUID]]:
+    """Insert ``rows`` rows; return overall and tail rows/s plus sampled ids."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    conn.execute(
+        text(f"CREATE TABLE {table} (id uuid PRIMARY KEY, payload text NOT NULL)")
+    )
+    conn.commit()
+    statement = f"INSERT INTO {table} (id, payload) VALUES (%s, %s)"
+    tail_start = rows - rows // 10
+    # Reservoir sample over all ids, and the most recent ids
+    sampled: list[uuid.UUID] = []
+    recent: list[uuid.UUID] = []
+    started = time.perf_counter()
+    tail_started = started
+    inserted = 0
+    while inserted < rows:
+        ids = [new_id() for _ in range(min(batch_size, rows - inserted))]
+        if inserted <= tail_start < inserted + len(ids):
+            tail_started = time.perf_counter()
+        conn.exec_driver_sql(statement, [(i, PAYLOAD) for i in ids])
+        conn.commit()
+        for i in ids:
+            inserted += 1
+            if len(sampled) < samples:
+                sampled.append(i)
+            elif (j := random.randrange(inserted)) < samples:
+                sampled[j] = i
+        recent = (recent + ids)[-samples:]
+    finished = time.perf_counter()
+    tail_rows = rows - tail_start
+    return (
+        rows / (finished - started),
+        tail_rows / max(finished - tail_started, 1e-9),
+        sampled,
+        recent,
+    )
+
+
+def lookup_us(conn: Connection, table: str, ids: list[uuid.UUID]) -> float:
+    statement = f"SELECT payload FROM {table} WHERE id = %s"
+    started = time.perf_counter()
+    for i in ids:
+        conn.exec_driver_sql(statement, (i,)).one()
+    return (time.perf_counter() - started) / len(ids) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        for name, new_id in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+            table = f"bench_keys_{name}"
+            overall, tail, sampled, recent = load(
+                conn, table, new_id, args.rows, args.batch_size, args.lookups
+            )
+            conn.execute(text(f"ANALYZE {table}"))
+            index_size = conn.execute(
+                text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+                {"index": f"{table}_pkey"},
+            ).scalar_one()
+            random.shuffle(sampled)
+            print(
+                f"{name}: {overall:>9,.0f} rows/s overall, {tail:>9,.0f} rows/s "
+                f"last 10%, pkey {index_size / 2**20:8.1f} MiB, lookup "
+                f"{lookup_us(conn, table, sampled):6.1f} us random / "
+                f"{lookup_us(conn, table, recent):6.1f} us recent"
+            )
+            if not args.keep:
+                conn.execute(text(f"DROP TABLE {table}"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
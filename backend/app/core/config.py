@@ -31,6 +31,20 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # How stale an authenticated user may be in another worker after an update
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 10000
+    # Arrays of cached trajectories per worker; 100k events take about 3 MB
+    TRAJECTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Segment files of the related moments index (see app.related); defaults
+    # to a directory under the system temp dir, rebuilt when missing
+    RELATED_INDEX_DIR: str | None = None
+    # Stories per task of the batch near-duplicate pass, and its processes
+    # (defaults to the CPU count)
+    DUPLICATES_BATCH_SIZE: int = 500
+    DUPLICATES_WORKERS: int | None = None
+    # Rows fetched per round trip while streaming a timeline
+    TIMELINE_FETCH_SIZE: int = 500
     DOMAIN: str = "localhost"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -48,11 +62,31 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str
     SENTRY_DSN: HttpUrl | None = None
+    # Fraction of requests that get a Server-Timing header and timing log line
+    SERVER_TIMING_SAMPLE_RATE: float = 1.0
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 500
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Per worker process; size + overflow across all workers must stay
+    # below the server's max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    # Recycle before proxies or the server drop idle connections
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # psycopg prepares a query server-side once it has run this many times on
+    # a connection; None disables it (required behind pgbouncer in
+    # transaction mode)
+    DB_PREPARE_THRESHOLD: int | None = 2
+    # 0 disables the timeout
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    DB_QUERY_CACHE_SIZE: int = 500
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -83,6 +117,26 @@ class Settings(BaseSettings):
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
+    # Recompile email templates when their files change, for development
+    EMAIL_TEMPLATES_AUTO_RELOAD: bool = False
+    # Defaults to a per-user directory under the system temp dir
+    EMAIL_TEMPLATES_CACHE_DIR: str | None = None
+    SMTP_TIMEOUT_SECONDS: float = 30
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 6
+    # Retry n waits EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (n - 1)
+    EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS: int = 30
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5
+    EMAIL_CAMPAIGN_BATCH_SIZE: int = 200
+    EMAIL_CAMPAIGN_CONNECTIONS: int = 4
+    EMAIL_CAMPAIGN_RATE_PER_SECOND: float = 10
+    # A running campaign without a checkpoint for this long may be resumed
+    EMAIL_CAMPAIGN_STALE_SECONDS: int = 300
+    # Users whose "on this day" emails are queued per transaction
+    ON_THIS_DAY_BATCH_SIZE: int = 500
+    # Rows removed per transaction when purging a deleted user's data
+    USER_PURGE_CHUNK_SIZE: int = 1000
+    USER_PURGE_PAUSE_SECONDS: float = 0.05
 
     @computed_field  # type: ignore[prop-decorator]
     @property
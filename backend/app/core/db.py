@@ -1,10 +1,50 @@
+from collections.abc import Callable
+from typing import Any, TypeVar, cast
+
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
 from app.core.config import settings
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+def connect_args() -> dict[str, Any]:
+    args: dict[str, Any] = {"prepare_threshold": settings.DB_PREPARE_THRESHOLD}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    return args
+
+
+def engine_options() -> dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+        "connect_args": connect_args(),
+    }
+
+
+# Scripts, tests and background threads
+engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), **engine_options())
+# Request handlers; the same URL gives psycopg's async connection
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI), **engine_options()
+)
+
+_T = TypeVar("_T")
+
+
+async def run_sync(session: AsyncSession, fn: Callable[[Session], _T]) -> _T:
+    """
+    ``session.run_sync(fn)``. The sync session behind SQLModel's AsyncSession
+    is SQLModel's Session, but run_sync is typed with SQLAlchemy's.
+    """
+    return await session.run_sync(lambda sync_session: fn(cast(Session, sync_session)))
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -0,0 +1,40 @@
+"""Binary encoding of PMOT empathy matrices.
+
+Every matrix has the same shape, ``SHAPE``: rows are the people in the
+moment (the user, the others involved, bystanders) and columns the kind of
+empathy (cognitive, emotional, compassionate). A matrix is stored as a NumPy
+dtype string and its raw C-order buffer, so ``decode`` is a view over the
+bytes read from the database rather than a parse.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+SHAPE = (3, 3)
+DTYPE = np.dtype("<f4")
+
+
+def encode(matrix: Sequence[Sequence[float]] | np.ndarray) -> tuple[str, bytes]:
+    """Return ``(dtype, buffer)`` for a ``SHAPE`` matrix of finite numbers."""
+    array = np.asarray(matrix, dtype=DTYPE)
+    if array.shape != SHAPE:
+        raise ValueError(f"Empathy matrix must have shape {SHAPE}, not {array.shape}")
+    if not np.isfinite(array).all():
+        raise ValueError("Empathy matrix values must be finite")
+    return DTYPE.str, np.ascontiguousarray(array).tobytes()
+
+
+def decode(dtype: str, buffer: bytes | memoryview) -> np.ndarray:
+    """A read-only ``SHAPE`` view over ``buffer``; nothing is copied."""
+    return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(SHAPE)
+
+
+def decode_many(dtype: str, buffers: Sequence[bytes | memoryview]) -> np.ndarray:
+    """
+    Stack matrices sharing ``dtype`` into an ``(n, *SHAPE)`` array. The
+    buffers are joined once and viewed as a whole, so no per-row arrays are
+    built.
+    """
+    joined = b"".join(buffers)
+    return np.frombuffer(joined, dtype=np.dtype(dtype)).reshape((len(buffers), *SHAPE))
@@ -0,0 +1,56 @@
+"""Time-ordered primary keys.
+
+``uuid7`` returns RFC 9562 version 7 UUIDs: a 48-bit Unix timestamp in
+milliseconds followed by random bits. Keys generated later sort after keys
+generated earlier, so inserts land on the right-hand edge of the primary key
+B-tree instead of on random pages, which keeps the index compact and its hot
+pages in cache. They are ordinary UUIDs, so they mix freely with existing
+``uuid4`` keys in the same column.
+"""
+
+import secrets
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_COUNTER_MAX = 0xFFF
+
+
+def uuid7() -> uuid.UUID:
+    """
+    A version 7 UUID. Within one process the 12-bit ``rand_a`` field is used as
+    a counter seeded randomly each millisecond (RFC 9562 method 1), so ids are
+    strictly increasing even when many are generated in the same millisecond
+    or the wall clock steps back.
+    """
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Seed low so the counter has room to grow within the millisecond
+            _counter = secrets.randbits(10)
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                # Counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+        timestamp, counter = _last_ms, _counter
+    value = (
+        (timestamp & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | secrets.randbits(62)
+    )
+    return uuid.UUID(int=value)
+
+
+def uuid7_timestamp(value: uuid.UUID) -> float:
+    """Creation time of a version 7 UUID, in seconds since the epoch."""
+    return (value.int >> 80) / 1000
@@ -0,0 +1,154 @@
+"""Prometheus metrics for the backend.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set (one directory shared by all gunicorn
+workers), every worker writes its samples to its own memory-mapped files and
+``/metrics`` merges them at scrape time. Workers never share a counter, so
+recording a sample does not contend across processes.
+"""
+
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import Engine, event
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections opened beyond the pool size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections",
+    "Most connections the pools will open (pool size plus max overflow)",
+    multiprocess_mode="livesum",
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Requests that gave up waiting for a pooled connection",
+)
+BCRYPT_IN_PROGRESS = Gauge(
+    "bcrypt_operations_in_progress",
+    "Password hash/verify calls running or waiting for a thread",
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process cache lookups; hit ratio is hits / (hits + misses)",
+    ["cache", "result"],
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def track_bcrypt() -> Iterator[None]:
+    BCRYPT_IN_PROGRESS.inc()
+    try:
+        yield
+    finally:
+        BCRYPT_IN_PROGRESS.dec()
+
+
+def instrument_pool(engine: Engine) -> None:
+    """
+    Keep the pool gauges in step with checkouts and checkins. Checked out
+    connections over capacity is how close the workers are to exhaustion.
+    """
+    pool: Any = engine.pool
+    if hasattr(pool, "size") and getattr(pool, "_max_overflow", -1) >= 0:
+        DB_POOL_CAPACITY.inc(pool.size() + pool._max_overflow)
+
+    def on_checkout(*_args: Any) -> None:
+        DB_POOL_CHECKED_OUT.inc()
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    def on_checkin(*_args: Any) -> None:
+        DB_POOL_CHECKED_OUT.dec()
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+class PrometheusMiddleware:
+    """Record latency per route template rather than per raw path."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(
+                method=method, route=route, status=str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+def metrics_endpoint(_request: Request) -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges; called by ``child_exit`` in gunicorn_conf.py."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)  # type: ignore[no-untyped-call]
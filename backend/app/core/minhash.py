@@ -0,0 +1,88 @@
+"""MinHash signatures of story text and their LSH bands.
+
+A story is reduced to the set of its ``SHINGLE``-character shingles (after
+lowercasing and collapsing whitespace), and that set to ``PERMUTATIONS``
+minimum hash values, one per hash function ``(a * x + b) mod P``. The share
+of equal values in two signatures estimates the Jaccard similarity of the
+shingle sets. A signature is stored as its raw ``<u4`` buffer.
+
+For candidate search the signature is cut into ``BANDS`` bands of
+``ROWS`` values and each band hashed to a 64-bit bucket: two stories share a
+bucket in some band with probability ``1 - (1 - s**ROWS)**BANDS`` for
+similarity ``s``, which is about 0.7 at the steepest point.
+"""
+
+import hashlib
+import zlib
+
+import numpy as np
+
+SHINGLE = 5
+PERMUTATIONS = 128
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+DTYPE = np.dtype("<u4")
+
+# Mersenne prime 2**31 - 1, so a * x stays within 64 bits
+P = (1 << 31) - 1
+
+
+def _coefficients(name: bytes) -> np.ndarray:
+    # Derived from a fixed hash rather than a random generator, so stored
+    # signatures stay comparable across NumPy versions
+    digests = (
+        hashlib.blake2b(b"%s%d" % (name, i), digest_size=8).digest()
+        for i in range(PERMUTATIONS)
+    )
+    return np.array(
+        [int.from_bytes(digest, "little") % (P - 1) + 1 for digest in digests],
+        dtype=np.uint64,
+    )
+
+
+_A = _coefficients(b"a")[:, None]
+_B = _coefficients(b"b")[:, None]
+
+
+def shingles(text: str) -> np.ndarray:
+    """Distinct hashed shingles of ``text``, reduced modulo ``P``."""
+    normalized = " ".join(text.lower().split())
+    if len(normalized) < SHINGLE:
+        normalized = normalized.ljust(SHINGLE)
+    encoded = {
+        zlib.crc32(normalized[i : i + SHINGLE].encode())
+        for i in range(len(normalized) - SHINGLE + 1)
+    }
+    return np.fromiter(encoded, dtype=np.uint64, count=len(encoded)) % P
+
+
+def signature(text: str) -> np.ndarray:
+    """The ``PERMUTATIONS`` MinHash values of ``text``."""
+    values = shingles(text)[None, :]
+    return ((_A * values + _B) % P).min(axis=1).astype(DTYPE)
+
+
+def encode(values: np.ndarray) -> bytes:
+    return np.ascontiguousarray(values, dtype=DTYPE).tobytes()
+
+
+def decode(buffer: bytes | memoryview) -> np.ndarray:
+    """A read-only view over a stored signature."""
+    return np.frombuffer(buffer, dtype=DTYPE)
+
+
+def buckets(values: np.ndarray) -> list[int]:
+    """Signed 64-bit bucket of each band of a signature, ``BANDS`` in all."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.tobytes(), digest_size=8).digest(),
+            "little",
+            signed=True,
+        )
+        for band in np.asarray(values, dtype=DTYPE).reshape(BANDS, ROWS)
+    ]
+
+
+def similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of signatures, row by row for 2-D inputs."""
+    return (left == right).mean(axis=-1)
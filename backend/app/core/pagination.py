@@ -0,0 +1,288 @@
+"""Page queries that return their total without a second round trip.
+
+``fetch_page`` adds ``count(*) OVER ()`` to the page query, so the total is
+computed by the same statement. With ``approximate=True`` the total comes
+from the PostgreSQL planner instead (``pg_class.reltuples`` for a whole
+table, the row estimate of ``EXPLAIN`` for a filtered one), which costs the
+same no matter how large the table is.
+
+``paginate`` orders by an explicit sort key with the primary key as a
+tie-breaker and hands out opaque cursors for the rows on either side of the
+page. Following a cursor is a keyset query (``WHERE (key, id) > (...)``)
+that an index on ``(key, id)`` answers without scanning the skipped rows.
+The total is counted once, on the first page, and carried in the cursors,
+so cursor pages never count again.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import ColumnElement, literal, text, tuple_
+from sqlmodel import Session, SQLModel, col, func, select
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+
+def fetch_page(
+    session: Session,
+    model: type[ModelT],
+    *criteria: ColumnElement[bool],
+    order_by: Sequence[Any] = (),
+    skip: int = 0,
+    limit: int = 100,
+    approximate: bool = False,
+) -> tuple[Sequence[ModelT], int, bool]:
+    """
+    Return one page of ``model`` rows matching ``criteria``, the total number
+    of matching rows, and whether that total is an estimate.
+    """
+    if approximate:
+        statement = (
+            select(model).where(*criteria).order_by(*order_by).offset(skip).limit(limit)
+        )
+        data = session.exec(statement).all()
+        if len(data) < limit and (data or skip == 0):
+            # This is the last page, so the exact total is known for free
+            return data, skip + len(data), False
+        estimate = estimate_count(session, model, *criteria)
+        if estimate is not None:
+            # The planner can lag behind; never report fewer rows than were seen
+            return data, max(estimate, skip + len(data)), True
+        return data, count_rows(session, model, *criteria), False
+
+    windowed = (
+        select(model, func.count().over())
+        .where(*criteria)
+        .order_by(*order_by)
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = session.exec(windowed).all()
+    if rows:
+        return [row[0] for row in rows], rows[0][1], False
+    if skip == 0:
+        return [], 0, False
+    # Past the last page there is no row to carry the window total
+    return [], count_rows(session, model, *criteria), False
+
+
+def count_rows(
+    session: Session, model: type[SQLModel], *criteria: ColumnElement[bool]
+) -> int:
+    statement = select(func.count()).select_from(model).where(*criteria)
+    return session.exec(statement).one()
+
+
+def estimate_count(
+    session: Session, model: type[SQLModel], *criteria: ColumnElement[bool]
+) -> int | None:
+    """
+    Planner row estimate on PostgreSQL, or None when there is none to use
+    (other databases, or a table that has never been analyzed).
+    """
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return None
+    table = model.__table__  # type: ignore[attr-defined]
+    if not criteria:
+        reltuples = connection.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+            {"name": f'"{table.name}"'},
+        ).scalar()
+        if reltuples is None or reltuples < 0:
+            return None
+        return int(reltuples)
+    compiled = (
+        select(table.c[next(iter(table.primary_key)).name])
+        .where(*criteria)
+        .compile(dialect=connection.dialect)
+    )
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+@dataclass
+class Sort:
+    name: str
+    column: Any
+    descending: bool = False
+
+    @classmethod
+    def parse(cls, value: str, columns: dict[str, Any]) -> "Sort":
+        """Parse ``"label"`` or ``"-label"`` against the allowed sort columns."""
+        name = value.removeprefix("-")
+        return cls(name=value, column=columns[name], descending=value.startswith("-"))
+
+
+@dataclass
+class Page(Generic[ModelT]):
+    data: Sequence[ModelT]
+    count: int
+    count_is_estimate: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _python_value(column: Any, value: Any) -> Any:
+    column_type = col(column).type
+    # TypeDecorators report the python type of the type they wrap
+    python_type = getattr(column_type, "impl", column_type).python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(
+    sort: Sort, row: SQLModel, pk: str, backward: bool, count: int, estimate: bool
+) -> str:
+    position = {
+        "s": sort.name,
+        "k": _json_value(getattr(row, sort.column.key)),
+        "id": _json_value(getattr(row, pk)),
+        "b": backward,
+        "c": count,
+        "e": estimate,
+    }
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(
+    cursor: str, sort: Sort, pk_column: Any
+) -> tuple[Any, Any, bool, int, bool]:
+    """
+    Return the ``(key, id, backward)`` position encoded in ``cursor``, with
+    the total of the first page and whether it was an estimate.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        if position["s"] != sort.name:
+            raise InvalidCursorError("Cursor was issued for another sort order")
+        return (
+            _python_value(sort.column, position["k"]),
+            _python_value(pk_column, position["id"]),
+            bool(position["b"]),
+            int(position["c"]),
+            bool(position["e"]),
+        )
+    except InvalidCursorError:
+        raise
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def paginate(
+    session: Session,
+    model: type[ModelT],
+    *criteria: ColumnElement[bool],
+    sort: Sort,
+    limit: int = 100,
+    skip: int = 0,
+    cursor: str | None = None,
+    approximate: bool = False,
+) -> Page[ModelT]:
+    """
+    One page of ``model`` rows in ``sort`` order, either ``skip`` rows in or
+    on the side of ``cursor`` it points to. Cursor pages ignore ``skip`` and
+    ``approximate`` and report the total of the page the walk started on.
+    """
+    pk = model.__table__.primary_key.columns.values()[0].key  # type: ignore[attr-defined]
+    pk_column = getattr(model, pk)
+    key = tuple_(col(sort.column), col(pk_column))
+
+    if cursor is None:
+        order_by = _order_by(sort, pk_column, reverse=False)
+        data, count, count_is_estimate = fetch_page(
+            session,
+            model,
+            *criteria,
+            order_by=order_by,
+            skip=skip,
+            limit=limit + 1,
+            approximate=approximate,
+        )
+        has_more = len(data) > limit
+        data = data[:limit]
+        return _page(
+            sort,
+            pk,
+            Page(data=data, count=count, count_is_estimate=count_is_estimate),
+            has_next=has_more,
+            has_prev=skip > 0,
+        )
+
+    key_value, pk_value, backward, count, count_is_estimate = decode_cursor(
+        cursor, sort, pk_column
+    )
+    # Going backward walks the sort order in reverse and flips the page after
+    after = sort.descending == backward
+    # Bind with the columns' own types so values compare as they are stored
+    bound = tuple_(
+        literal(key_value, col(sort.column).type),
+        literal(pk_value, col(pk_column).type),
+    )
+    position = key > bound if after else key < bound
+    statement = (
+        select(model)
+        .where(*criteria, position)
+        .order_by(*_order_by(sort, pk_column, reverse=backward))
+        .limit(limit + 1)
+    )
+    data = list(session.exec(statement).all())
+    has_more = len(data) > limit
+    data = data[:limit]
+    if backward:
+        data.reverse()
+    # The cursor filter hides the rows before the page; rather than count
+    # the unfiltered criteria on every page, keep the first page's total
+    page = Page(data=data, count=count, count_is_estimate=count_is_estimate)
+    # The cursor came from a neighbouring page, so that side always has rows
+    return _page(
+        sort,
+        pk,
+        page,
+        has_next=has_more if not backward else True,
+        has_prev=has_more if backward else True,
+    )
+
+
+def _order_by(sort: Sort, pk_column: Any, reverse: bool) -> list[Any]:
+    descending = sort.descending != reverse
+    columns = [col(sort.column), col(pk_column)]
+    return [c.desc() if descending else c.asc() for c in columns]
+
+
+def _page(
+    sort: Sort, pk: str, page: Page[ModelT], *, has_next: bool, has_prev: bool
+) -> Page[ModelT]:
+    total = (page.count, page.count_is_estimate)
+    if page.data and has_next:
+        page.next_cursor = encode_cursor(sort, page.data[-1], pk, False, *total)
+    if page.data and has_prev:
+        page.prev_cursor = encode_cursor(sort, page.data[0], pk, True, *total)
+    return page
@@ -0,0 +1,175 @@
+"""In-process statistical profiler for a live worker.
+
+A daemon thread snapshots every thread's Python stack with
+``sys._current_frames()`` at a fixed interval. Sampling never touches the
+threads being observed, so the cost is one stack walk per thread per tick
+and is bounded by the interval no matter how loaded the worker is.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import CodeType
+from typing import Any
+
+from app.core.timing import endpoint_routes
+
+# Stdlib files whose leaf frames mean a thread is parked, not working
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_busy = threading.Lock()
+
+Stack = tuple[CodeType, ...]
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+def _frame_name(code: CodeType) -> str:
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class CpuProfile:
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        # (route, stack from root to leaf) -> number of samples
+        self.samples: Counter[tuple[str, Stack]] = Counter()
+        self.duration = 0.0
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one ``a;b;c count`` line per stack."""
+        lines = []
+        for (route, stack), count in self.samples.most_common():
+            frames = ";".join(_frame_name(code) for code in stack)
+            lines.append(f"{route};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict[str, Any]:
+        """Speedscope sampled profiles, one per route."""
+        frame_index: dict[CodeType, int] = {}
+        frames: list[dict[str, Any]] = []
+        profiles: dict[str, dict[str, Any]] = {}
+        interval_ms = self.interval * 1000
+        for (route, stack), count in self.samples.items():
+            indexes = []
+            for code in stack:
+                if code not in frame_index:
+                    frame_index[code] = len(frames)
+                    frames.append(
+                        {
+                            "name": code.co_name,
+                            "file": code.co_filename,
+                            "line": code.co_firstlineno,
+                        }
+                    )
+                indexes.append(frame_index[code])
+            profile = profiles.setdefault(
+                route,
+                {
+                    "type": "sampled",
+                    "name": route,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": 0,
+                    "samples": [],
+                    "weights": [],
+                },
+            )
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * interval_ms)
+            profile["endValue"] += count * interval_ms
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+            "name": f"worker {os.getpid()}",
+            "activeProfileIndex": 0,
+            "exporter": "app.core.profiler",
+        }
+
+
+class CpuSampler:
+    """Samples stacks on a background thread between ``start()`` and ``stop()``."""
+
+    def __init__(self, interval: float, include_idle: bool = False) -> None:
+        self.profile = CpuProfile(interval)
+        self.include_idle = include_idle
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="cpu-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running in this worker")
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> CpuProfile:
+        self._stop.set()
+        self._thread.join()
+        self.profile.duration = time.perf_counter() - self._started
+        _busy.release()
+        return self.profile
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        samples = self.profile.samples
+        while not self._stop.wait(self.profile.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                leaf = frame.f_code
+                if not self.include_idle and leaf.co_filename.endswith(_IDLE_FILES):
+                    continue
+                codes = []
+                route = None
+                current: Any = frame
+                while current is not None:
+                    code = current.f_code
+                    codes.append(code)
+                    route = endpoint_routes.get(code, route)
+                    current = current.f_back
+                codes.reverse()
+                samples[(route or f"thread-{thread_id}", tuple(codes))] += 1
+
+
+class MemoryTracer:
+    """Diff two tracemalloc snapshots taken ``start()`` and ``stop()`` apart."""
+
+    def __init__(self, frames: int = 10) -> None:
+        self.frames = frames
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running in this worker")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self, limit: int = 50) -> list[dict[str, Any]]:
+        try:
+            after = tracemalloc.take_snapshot()
+            stats = after.compare_to(self._before, "traceback")[:limit]
+        finally:
+            if self._started_tracing:
+                tracemalloc.stop()
+            _busy.release()
+        return [
+            {
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+                "count": stat.count,
+                "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+            }
+            for stat in stats
+        ]
@@ -0,0 +1,212 @@
+"""Slow-query detection on the SQLAlchemy engine.
+
+Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are normalized (literals and
+bind values stripped), fingerprinted, and aggregated in-process so the worst
+offenders can be listed by total time. The first time a fingerprint is seen,
+and whenever it sets a new maximum, its plan is captured with ``EXPLAIN``
+(``EXPLAIN QUERY PLAN`` on SQLite) on the same connection and parameters.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import ExceptionContext
+
+from app.core.config import settings
+from app.core.timing import current_route, pop_failed_start
+
+logger = logging.getLogger("app.slow_query")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|:\w+|\$\d+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def param_shape(parameters: Any, executemany: bool) -> str:
+    if executemany and parameters:
+        return f"{len(parameters)} x {param_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return (
+            "{"
+            + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+            + "}"
+        )
+    if isinstance(parameters, list | tuple):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+@dataclass
+class QueryStats:
+    fingerprint: str
+    statement: str
+    param_shape: str
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    routes: Counter[str] = field(default_factory=Counter)
+    plan: str | None = None
+
+
+class SlowQueryLog:
+    def __init__(
+        self, threshold_ms: float, explain: bool, max_fingerprints: int
+    ) -> None:
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.max_fingerprints = max_fingerprints
+        self._stats: dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+
+    def _before_cursor_execute(
+        self,
+        conn: Any,
+        _cursor: Any,
+        _statement: Any,
+        _parameters: Any,
+        context: Any,
+        _executemany: Any,
+    ) -> None:
+        conn.info.setdefault("slow_query_start", []).append(
+            (context, time.perf_counter())
+        )
+
+    def _after_cursor_execute(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        _context: Any,
+        executemany: bool,
+    ) -> None:
+        _, start = conn.info["slow_query_start"].pop()
+        elapsed = time.perf_counter() - start
+        if elapsed >= self.threshold:
+            self.record(conn, cursor, statement, parameters, executemany, elapsed)
+
+    def _handle_error(self, exception_context: ExceptionContext) -> None:
+        pop_failed_start(exception_context, "slow_query_start")
+
+    def record(
+        self,
+        conn: Any,
+        _cursor: Any,
+        statement: str,
+        parameters: Any,
+        executemany: bool,
+        elapsed: float,
+    ) -> None:
+        normalized = normalize(statement)
+        fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        route = current_route() or "-"
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    cheapest = min(self._stats.values(), key=lambda s: s.total_time)
+                    del self._stats[cheapest.fingerprint]
+                stats = QueryStats(
+                    fingerprint=fingerprint,
+                    statement=normalized,
+                    param_shape=param_shape(parameters, executemany),
+                )
+                self._stats[fingerprint] = stats
+            needs_plan = stats.plan is None or elapsed > stats.max_time
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.routes[route] += 1
+        if needs_plan and self.explain and not executemany:
+            plan = explain(conn, statement, parameters)
+            if plan is not None:
+                stats.plan = plan
+        logger.warning(
+            json.dumps(
+                {
+                    "fingerprint": fingerprint,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "route": route,
+                    "statement": normalized,
+                    "param_shape": stats.param_shape,
+                }
+            )
+        )
+
+    def top(self, limit: int) -> list[QueryStats]:
+        with self._lock:
+            stats = sorted(
+                self._stats.values(), key=lambda s: s.total_time, reverse=True
+            )
+        return stats[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def instrument(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+
+def explain(conn: Any, statement: str, parameters: Any) -> str | None:
+    """Run EXPLAIN for a read statement on the connection's own DBAPI connection.
+
+    The cursor is opened on ``dbapi_connection`` rather than through the
+    statement's cursor, whose async adaptation has no ``.connection``; the
+    adapted connection runs it synchronously inside the async engine's
+    greenlet. On PostgreSQL the EXPLAIN runs inside a savepoint so a failure
+    can't abort the caller's transaction.
+    """
+    dialect = conn.dialect.name
+    if statement.lstrip()[:6].upper().rstrip() not in ("SELECT", "WITH"):
+        return None
+    raw = None
+    try:
+        raw = conn.connection.dbapi_connection.cursor()
+        if dialect == "sqlite":
+            raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return "\n".join(str(row[-1]) for row in raw.fetchall())
+        if dialect != "postgresql":
+            return None
+        raw.execute("SAVEPOINT slow_query_explain")
+        try:
+            raw.execute(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(str(row[0]) for row in raw.fetchall())
+        except Exception:
+            raw.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        raw.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as e:
+        logger.info(f"could not explain slow query: {e}")
+        return None
+    finally:
+        if raw is not None:
+            raw.close()
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    max_fingerprints=settings.SLOW_QUERY_MAX_FINGERPRINTS,
+)
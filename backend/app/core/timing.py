@@ -0,0 +1,268 @@
+import functools
+import inspect
+import json
+import logging
+import random
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import CodeType
+from typing import Any
+
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import ExceptionContext
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("app.timing")
+
+
+class RequestTimings:
+    """Durations collected while serving a single sampled request."""
+
+    __slots__ = (
+        "start",
+        "handler_start",
+        "handler_end",
+        "spans",
+        "sql_count",
+        "sql_time",
+    )
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.handler_start: float | None = None
+        self.handler_end: float | None = None
+        self.spans: dict[str, float] = {}
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def add(self, name: str, duration: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+
+_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+
+# Endpoint code object -> "METHOD /path", used to attribute profiler samples
+endpoint_routes: dict[CodeType, str] = {}
+
+
+def current_timings() -> RequestTimings | None:
+    return _timings.get()
+
+
+def current_route() -> str | None:
+    """Path template of the route serving the current request, if routed yet."""
+    scope = _scope.get()
+    if scope is None:
+        return None
+    return _route_path(scope)
+
+
+def _route_path(scope: Scope) -> str | None:
+    return getattr(scope.get("route"), "path", None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the named span of the current request."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def _before_cursor_execute(
+    conn: Any,
+    _cursor: Any,
+    _statement: Any,
+    _parameters: Any,
+    context: Any,
+    _executemany: Any,
+) -> None:
+    conn.info.setdefault("query_start_time", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(
+    conn: Any,
+    _cursor: Any,
+    _statement: Any,
+    _parameters: Any,
+    _context: Any,
+    _executemany: Any,
+) -> None:
+    _, start = conn.info["query_start_time"].pop()
+    timings = _timings.get()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_time += time.perf_counter() - start
+
+
+def pop_failed_start(exception_context: ExceptionContext, key: str) -> None:
+    """Drop the start time pushed for a statement that raised.
+
+    after_cursor_execute does not run when the statement raises, so the start
+    would stay on the connection's stack and pair with the next statement.
+    """
+    conn = exception_context.connection
+    starts = conn.info.get(key) if conn is not None else None
+    if starts and starts[-1][0] is exception_context.execution_context:
+        starts.pop()
+
+
+def _handle_error(exception_context: ExceptionContext) -> None:
+    pop_failed_start(exception_context, "query_start_time")
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count SQL statements and their time against the current request."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # include_router() rebuilds routes from already wrapped endpoints
+    if getattr(endpoint, "__timed__", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            timings = _timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            timings.handler_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.handler_end = time.perf_counter()
+
+        async_wrapper.__timed__ = True  # type: ignore[attr-defined]
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        timings = _timings.get()
+        if timings is None:
+            return endpoint(*args, **kwargs)
+        timings.handler_start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            timings.handler_end = time.perf_counter()
+
+    sync_wrapper.__timed__ = True  # type: ignore[attr-defined]
+    return sync_wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that marks when the endpoint body starts and returns.
+
+    Everything before the endpoint runs is dependency resolution and request
+    parsing, everything after it is response validation and serialization.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        code = getattr(inspect.unwrap(endpoint), "__code__", None)
+        if code is not None:
+            methods = ",".join(sorted(kwargs.get("methods") or ["GET"]))
+            endpoint_routes[code] = f"{methods} {path}"
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class ServerTimingMiddleware:
+    """Report where a request spent its time in a Server-Timing header and a log line.
+
+    Only a ``sample_rate`` fraction of requests is measured; the rest pay for a
+    single random draw and two context variable sets.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 1.0) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        scope_token = _scope.set(scope)
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _scope.reset(scope_token)
+            return
+
+        timings = RequestTimings()
+        timings_token = _timings.set(timings)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        self._header(timings, time.perf_counter()).encode(),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(timings_token)
+            _scope.reset(scope_token)
+            self._log(scope, status_code, timings, time.perf_counter())
+
+    @staticmethod
+    def _phases(timings: RequestTimings, now: float) -> dict[str, float]:
+        phases = {"total": now - timings.start}
+        if timings.handler_start is not None:
+            phases["deps"] = timings.handler_start - timings.start
+            handler_end = timings.handler_end or now
+            phases["handler"] = handler_end - timings.handler_start
+            phases["serialize"] = now - handler_end
+        phases.update(timings.spans)
+        phases["db"] = timings.sql_time
+        return phases
+
+    def _header(self, timings: RequestTimings, now: float) -> str:
+        entries = [
+            f"{name};dur={duration * 1000:.2f}"
+            for name, duration in self._phases(timings, now).items()
+        ]
+        entries[-1] += f';desc="{timings.sql_count} queries"'
+        return ", ".join(entries)
+
+    def _log(
+        self, scope: Scope, status_code: int, timings: RequestTimings, now: float
+    ) -> None:
+        record = {
+            "method": scope["method"],
+            "route": _route_path(scope) or scope["path"],
+            "status": status_code,
+            "sql_count": timings.sql_count,
+        }
+        record.update(
+            {
+                f"{name}_ms": round(duration * 1000, 2)
+                for name, duration in self._phases(timings, now).items()
+            }
+        )
+        logger.info(json.dumps(record))
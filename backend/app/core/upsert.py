@@ -0,0 +1,14 @@
+from typing import Any
+
+from sqlalchemy import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def upsert_insert(connection: Connection) -> Any:
+    """The dialect's ``insert``, which supports ``ON CONFLICT`` clauses."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"No upsert for {dialect}")
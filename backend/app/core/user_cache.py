@@ -0,0 +1,58 @@
+"""In-process cache of authenticated users.
+
+Each worker keeps the column values of recently authenticated users for
+``USER_CACHE_TTL_SECONDS``. Updates made through this worker invalidate the
+entry right away; other workers pick them up once the entry expires, which
+bounds how long a deactivated user can keep using an unexpired token.
+Password changes also bump ``token_version``, so tokens issued after one
+never match an entry cached before it.
+"""
+
+import threading
+import time
+import uuid
+from typing import Any
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.models import User
+
+
+class UserCache:
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        # user id -> (expiry on the monotonic clock, column values)
+        self._entries: dict[uuid.UUID, tuple[float, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: uuid.UUID) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                entry = None
+        record_cache("user", entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, user: User) -> None:
+        values = user.model_dump()
+        with self._lock:
+            self._entries.pop(user.id, None)
+            if len(self._entries) >= self.max_size:
+                # Entries are in insertion order, so this drops the oldest
+                del self._entries[next(iter(self._entries))]
+            self._entries[user.id] = (time.monotonic() + self.ttl, values)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS, max_size=settings.USER_CACHE_MAX_SIZE
+)
@@ -1,11 +1,29 @@
 import uuid
 from typing import Any
-from datetime import datetime
 
-from sqlmodel import Session, select
+from sqlalchemy import bindparam
+from sqlmodel import Session, col, select
 
+from app import anchor_graph, tags
+from app.core import empathy_matrix
 from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate, PMOT, PMOTDetailsCreate, PMOTDetails, PMOTDetailsUpdate
+from app.core.user_cache import user_cache
+from app.models import (
+    PMOT,
+    EmailOutbox,
+    PMOTCreate,
+    PMOTDetails,
+    PMOTDetailsCreate,
+    PMOTDetailsUpdate,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+# Hot statements are built once with bind parameters, so each call reuses
+# the same statement object and its entry in the compiled SQL cache; the
+# unchanged SQL text is what lets psycopg prepare it server-side.
+user_by_email_statement = select(User).where(col(User.email) == bindparam("email"))
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -20,21 +38,25 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
 
 def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     user_data = user_in.model_dump(exclude_unset=True)
-    extra_data = {}
+    extra_data: dict[str, Any] = {}
     if "password" in user_data:
         password = user_data["password"]
         hashed_password = get_password_hash(password)
         extra_data["hashed_password"] = hashed_password
+    if "password" in user_data or user_data.get("is_active") is False:
+        # Revoke the user's existing access tokens
+        extra_data["token_version"] = db_user.token_version + 1
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    user_cache.invalidate(db_user.id)
     return db_user
 
 
 def get_user_by_email(*, session: Session, email: str) -> User | None:
-    statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
+    statement = user_by_email_statement
+    session_user = session.exec(statement, params={"email": email}).first()
     return session_user
 
 
@@ -47,57 +69,93 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
     return db_user
 
 
-def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
-    db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
-    session.add(db_item)
-    session.commit()
-    session.refresh(db_item)
-    return db_item
+def enqueue_email(
+    *, session: Session, email_to: str, subject: str, html_content: str
+) -> EmailOutbox:
+    """
+    Add an email to the outbox without committing, so it is sent only if the
+    caller's transaction commits.
+    """
+    db_email = EmailOutbox(
+        email_to=email_to, subject=subject, html_content=html_content
+    )
+    session.add(db_email)
+    return db_email
 
-def create_pmot(*, session: Session, pmot_in: ItemCreate, owner_id: uuid.UUID) -> PMOT:
+
+def create_pmot(*, session: Session, pmot_in: PMOTCreate, owner_id: uuid.UUID) -> PMOT:
     db_pmot = PMOT.model_validate(pmot_in, update={"owner_id": owner_id})
     session.add(db_pmot)
     session.commit()
     session.refresh(db_pmot)
     return db_pmot
 
-def create_pmot_details(
+
+def empathy_columns(matrix: list[list[float]] | None) -> dict[str, Any]:
+    """The stored ``PMOTDetails`` columns for an empathy matrix given as lists."""
+    if matrix is None:
+        return {"empathy_dtype": None, "empathy_matrix": None}
+    dtype, buffer = empathy_matrix.encode(matrix)
+    return {"empathy_dtype": dtype, "empathy_matrix": buffer}
+
+
+def set_pmot_tags(
     *,
     session: Session,
     pmot_id: uuid.UUID,
-    owner_id: uuid.UUID,
-    title: str,
-    description: str,
-    start_date: datetime,
-    end_date: datetime,
-    status: str,
-    priority: str
+    strengths: list[str] | None,
+    anchors: list[str] | None,
+) -> None:
+    """Replace the strengths and anchors given (None leaves them), uncommitted."""
+    pmot = session.get(PMOT, pmot_id)
+    if pmot is None:
+        raise ValueError(f"PMOT {pmot_id} does not exist")
+    for kind, names in ((tags.STRENGTHS, strengths), (tags.ANCHORS, anchors)):
+        if names is None:
+            continue
+        ids = tags.replace_tags(session, kind, pmot.owner_id, pmot_id, names)
+        if kind is tags.ANCHORS:
+            anchor_graph.set_moment_anchors(
+                session, pmot.owner_id, pmot_id, list(ids.values())
+            )
+
+
+def create_pmot_details(
+    *, session: Session, details_in: PMOTDetailsCreate, pmot_id: uuid.UUID
 ) -> PMOTDetails:
-    db_pmot_details = PMOTDetails(
-        pmot_id=pmot_id,
-        owner_id=owner_id,
-        title=title,
-        description=description,
-        start_date=start_date,
-        end_date=end_date,
-        status=status,
-        priority=priority
+    db_pmot_details = PMOTDetails.model_validate(
+        details_in,
+        update={"pmot_id": pmot_id, **empathy_columns(details_in.empathy_matrix)},
     )
     session.add(db_pmot_details)
+    set_pmot_tags(
+        session=session,
+        pmot_id=pmot_id,
+        strengths=details_in.strengths,
+        anchors=details_in.anchors,
+    )
     session.commit()
     session.refresh(db_pmot_details)
     return db_pmot_details
 
+
 def update_pmot_details(
     *,
     session: Session,
     db_pmot_details: PMOTDetails,
-    pmot_details_in: PMOTDetailsUpdate
+    pmot_details_in: PMOTDetailsUpdate,
 ) -> PMOTDetails:
     update_data = pmot_details_in.model_dump(exclude_unset=True)
+    if "empathy_matrix" in update_data:
+        update_data.update(empathy_columns(update_data.pop("empathy_matrix")))
+    set_pmot_tags(
+        session=session,
+        pmot_id=db_pmot_details.pmot_id,
+        strengths=update_data.pop("strengths", None),
+        anchors=update_data.pop("anchors", None),
+    )
     db_pmot_details.sqlmodel_update(update_data)
     session.add(db_pmot_details)
     session.commit()
     session.refresh(db_pmot_details)
     return db_pmot_details
-
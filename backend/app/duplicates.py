@@ -0,0 +1,261 @@
+"""Near-duplicate PMOT stories, found through MinHash signatures and LSH.
+
+The listeners installed by ``track_signatures`` note every PMOT that is
+added or whose short story changes before each flush, and after the flush
+sign its story and replace its ``PMOTSignature`` and ``PMOTBand`` rows, in
+the same transaction. Deleted PMOTs lose theirs through ``ON DELETE CASCADE``.
+
+Candidate duplicates are an owner's moments sharing a bucket in any band,
+found by a self-join on the primary key of ``PMOTBand``, so the cost grows
+with the number of collisions rather than with the number of stories. Only
+the candidates' signatures are read to confirm them. Run
+
+    python -m app.duplicates
+
+to re-sign every PMOT, in chunks spread over a process pool, and report the
+near-duplicates found across the corpus.
+"""
+
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+from sqlalchemy import Connection, Engine, and_, event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, select
+
+from app.core import minhash
+from app.core.config import settings
+from app.core.db import engine
+from app.models import PMOT, PMOTBand, PMOTSignature
+
+logger = logging.getLogger(__name__)
+
+# (pmot_id, owner_id, signature, band buckets)
+Signed = tuple[uuid.UUID, uuid.UUID, bytes, list[int]]
+
+_PENDING = "pmot_signatures"
+
+
+def sign(pmot_id: uuid.UUID, owner_id: uuid.UUID, text: str) -> Signed:
+    values = minhash.signature(text)
+    return pmot_id, owner_id, minhash.encode(values), minhash.buckets(values)
+
+
+def sign_chunk(rows: Sequence[tuple[uuid.UUID, uuid.UUID, str]]) -> list[Signed]:
+    """``sign`` over ``(pmot_id, owner_id, short_story)`` rows, in a worker process."""
+    return [sign(*row) for row in rows]
+
+
+def store_signatures(connection: Connection, signed: Sequence[Signed]) -> None:
+    """Replace the signature and band rows of the signed PMOTs."""
+    if not signed:
+        return
+    signatures = PMOTSignature.__table__  # type: ignore[attr-defined]
+    bands = PMOTBand.__table__  # type: ignore[attr-defined]
+    ids = [pmot_id for pmot_id, *_ in signed]
+    connection.execute(bands.delete().where(bands.c.pmot_id.in_(ids)))
+    connection.execute(signatures.delete().where(signatures.c.pmot_id.in_(ids)))
+    connection.execute(
+        signatures.insert(),
+        [
+            {"pmot_id": pmot_id, "owner_id": owner_id, "signature": signature}
+            for pmot_id, owner_id, signature, _ in signed
+        ],
+    )
+    connection.execute(
+        bands.insert(),
+        [
+            {"owner_id": owner_id, "band": band, "bucket": bucket, "pmot_id": pmot_id}
+            for pmot_id, owner_id, _, buckets in signed
+            for band, bucket in enumerate(buckets)
+        ],
+    )
+
+
+def _collisions(owner_id: uuid.UUID | None = None) -> Any:
+    """Pairs of moments of one owner sharing a bucket, each pair once."""
+    bands = PMOTBand.__table__  # type: ignore[attr-defined]
+    left, right = bands.alias("left"), bands.alias("right")
+    statement = (
+        select(left.c.owner_id, left.c.pmot_id, right.c.pmot_id)
+        .distinct()
+        .select_from(
+            left.join(
+                right,
+                and_(
+                    right.c.owner_id == left.c.owner_id,
+                    right.c.band == left.c.band,
+                    right.c.bucket == left.c.bucket,
+                    right.c.pmot_id > left.c.pmot_id,
+                ),
+            )
+        )
+    )
+    if owner_id is not None:
+        statement = statement.where(left.c.owner_id == owner_id)
+    return statement
+
+
+def possible_duplicates(
+    session: Session, owner_id: uuid.UUID, threshold: float
+) -> list[tuple[list[uuid.UUID], float]]:
+    """
+    Groups of the owner's moments whose stories are at least ``threshold``
+    similar to another in the group, with the lowest such similarity in
+    each group, most similar groups first.
+    """
+    connection = session.connection()
+    pairs = [(a, b) for _, a, b in connection.execute(_collisions(owner_id)).all()]
+    if not pairs:
+        return []
+    ids = sorted({pmot_id for pair in pairs for pmot_id in pair})
+    rows = connection.execute(
+        select(PMOTSignature.pmot_id, PMOTSignature.signature).where(
+            col(PMOTSignature.pmot_id).in_(ids)
+        )
+    ).all()
+    index = {pmot_id: i for i, (pmot_id, _) in enumerate(rows)}
+    signatures = np.frombuffer(
+        b"".join(signature for _, signature in rows), dtype=minhash.DTYPE
+    ).reshape(len(rows), minhash.PERMUTATIONS)
+    pairs = [(a, b) for a, b in pairs if a in index and b in index]
+    scores = minhash.similarity(
+        signatures[[index[a] for a, _ in pairs]],
+        signatures[[index[b] for _, b in pairs]],
+    )
+
+    # Union-find over the confirmed pairs
+    parent = {pmot_id: pmot_id for pmot_id in index}
+
+    def root(pmot_id: uuid.UUID) -> uuid.UUID:
+        while parent[pmot_id] != pmot_id:
+            parent[pmot_id] = parent[parent[pmot_id]]
+            pmot_id = parent[pmot_id]
+        return pmot_id
+
+    confirmed = [
+        (a, b, float(score))
+        for (a, b), score in zip(pairs, scores, strict=True)
+        if score >= threshold
+    ]
+    for a, b, _ in confirmed:
+        parent[root(a)] = root(b)
+    groups: dict[uuid.UUID, tuple[set[uuid.UUID], float]] = {}
+    for a, b, score in confirmed:
+        members, lowest = groups.get(root(a), (set(), 1.0))
+        groups[root(a)] = (members | {a, b}, min(lowest, score))
+    return sorted(
+        ((sorted(members), lowest) for members, lowest in groups.values()),
+        key=lambda group: (-group[1], group[0]),
+    )
+
+
+def _story_changed(pmot: PMOT) -> bool:
+    state = inspect(pmot)
+    return any(
+        state.attrs[name].history.has_changes() for name in ("owner_id", "short_story")
+    )
+
+
+def _collect_stories(session: OrmSession, _flush_context: Any, _instances: Any) -> None:
+    pending: dict[Any, tuple[Any, str]] = session.info.setdefault(_PENDING, {})
+    for obj in session.new:
+        if isinstance(obj, PMOT):
+            pending[obj.id] = (obj.owner_id, obj.short_story)
+    for obj in session.dirty:
+        if isinstance(obj, PMOT) and _story_changed(obj):
+            pending[obj.id] = (obj.owner_id, obj.short_story)
+
+
+def _store_pending(session: OrmSession, _flush_context: Any) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    store_signatures(
+        session.connection(),
+        [
+            sign(pmot_id, owner_id, story)
+            for pmot_id, (owner_id, story) in pending.items()
+            if owner_id is not None and story is not None
+        ],
+    )
+
+
+def track_signatures() -> None:
+    """Sign the stories of PMOTs in every ORM flush that adds or changes one."""
+    if event.contains(OrmSession, "before_flush", _collect_stories):
+        return
+    event.listen(OrmSession, "before_flush", _collect_stories)
+    event.listen(OrmSession, "after_flush", _store_pending)
+    event.listen(
+        OrmSession, "after_rollback", lambda session: session.info.pop(_PENDING, None)
+    )
+
+
+def run(
+    threshold: float = 0.8, db_engine: Engine = engine, workers: int | None = None
+) -> tuple[int, int]:
+    """
+    Re-sign every PMOT with a process pool and count the groups of possible
+    duplicates. Stories are read through a server-side cursor and at most
+    two chunks per worker are in flight, so memory stays bounded. Returns
+    ``(PMOTs signed, duplicate groups)``.
+    """
+    workers = workers or settings.DUPLICATES_WORKERS or os.cpu_count() or 1
+    statement = (
+        select(PMOT.id, PMOT.owner_id, PMOT.short_story)
+        .order_by(col(PMOT.id))
+        .execution_options(yield_per=settings.DUPLICATES_BATCH_SIZE)
+    )
+    start = time.perf_counter()
+    signed = 0
+    with (
+        db_engine.connect() as reader,
+        Session(db_engine) as session,
+        ProcessPoolExecutor(max_workers=workers) as pool,
+    ):
+        in_flight: deque[Future[list[Signed]]] = deque()
+
+        def store_next() -> int:
+            chunk = in_flight.popleft().result()
+            store_signatures(session.connection(), chunk)
+            session.commit()
+            return len(chunk)
+
+        for rows in reader.execute(statement).partitions():
+            in_flight.append(pool.submit(sign_chunk, [tuple(row) for row in rows]))
+            if len(in_flight) >= 2 * workers:
+                signed += store_next()
+        while in_flight:
+            signed += store_next()
+        elapsed = time.perf_counter() - start
+
+        owners = {
+            owner_id for owner_id, *_ in session.connection().execute(_collisions())
+        }
+        groups = sum(
+            len(possible_duplicates(session, owner_id, threshold))
+            for owner_id in owners
+        )
+    logger.info(
+        f"Signed {signed} PMOTs with {workers} processes in {elapsed:.1f}s "
+        f"({signed / max(elapsed, 1e-9):.0f} stories/s); found {groups} groups "
+        f"of possible duplicates"
+    )
+    return signed, groups
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import html
+import logging
+import re
+import threading
+import time
+import uuid
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Engine
+from sqlmodel import Session, and_, col, or_, select, update
+
+from app.core.config import settings
+from app.core.db import engine
+from app.email_outbox import SMTPConnection, build_message
+from app.models import EmailCampaign, User
+from app.utils import render_email_template
+
+logger = logging.getLogger(__name__)
+
+_FIELD = "\x00"
+_FIELD_PATTERN = re.compile(f"{_FIELD}(\\w+){_FIELD}")
+
+
+class CampaignTemplate:
+    """
+    The campaign email rendered once through Jinja, with per-recipient fields
+    left as markers that ``render`` fills in by joining precomputed parts.
+    """
+
+    fields = ("recipient_name", "email")
+
+    def __init__(self, message: str) -> None:
+        rendered = render_email_template(
+            template_name="campaign.html",
+            context={
+                "project_name": settings.PROJECT_NAME,
+                "message": message,
+                **{name: f"{_FIELD}{name}{_FIELD}" for name in self.fields},
+            },
+        )
+        # Even indexes are literal HTML, odd indexes are field names
+        self._parts = _FIELD_PATTERN.split(rendered)
+
+    def render(self, **values: str) -> str:
+        parts = self._parts.copy()
+        for i in range(1, len(parts), 2):
+            parts[i] = html.escape(values[parts[i]])
+        return "".join(parts)
+
+
+class RateLimiter:
+    """Spaces calls to ``wait()`` at least ``1 / rate`` seconds apart across threads."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CampaignSender:
+    """A small pool of threads, each reusing its own SMTP connection."""
+
+    def __init__(self, connections: int, rate: float) -> None:
+        self.rate_limiter = RateLimiter(rate)
+        self._local = threading.local()
+        self._connections: list[SMTPConnection] = []
+        self._connections_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=connections, thread_name_prefix="email-campaign"
+        )
+
+    def _connection(self) -> SMTPConnection:
+        connection: SMTPConnection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = SMTPConnection()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _send(self, email_to: str, subject: str, html_content: str) -> bool:
+        self.rate_limiter.wait()
+        try:
+            self._connection().send(
+                build_message(
+                    email_to=email_to, subject=subject, html_content=html_content
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Campaign email to {email_to} failed: {e}")
+            self._connection().close()
+            return False
+        return True
+
+    def send_all(
+        self, subject: str, template: CampaignTemplate, recipients: Sequence[Any]
+    ) -> tuple[int, int]:
+        """Send to a batch of ``(id, email, full_name)`` rows. Returns (sent, failed)."""
+        results = self._executor.map(
+            lambda r: self._send(
+                r.email,
+                subject,
+                template.render(recipient_name=r.full_name or r.email, email=r.email),
+            ),
+            recipients,
+        )
+        sent = sum(results)
+        return sent, len(recipients) - sent
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for connection in self._connections:
+            connection.close()
+
+
+def _claim(session: Session, campaign_id: uuid.UUID) -> bool:
+    """Mark the campaign running unless another runner is alive on it."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.EMAIL_CAMPAIGN_STALE_SECONDS)
+    statement = (
+        update(EmailCampaign)
+        .where(col(EmailCampaign.id) == campaign_id)
+        .where(
+            or_(
+                col(EmailCampaign.status).in_(["pending", "interrupted"]),
+                and_(
+                    col(EmailCampaign.status) == "running",
+                    col(EmailCampaign.updated_at) < stale,
+                ),
+            )
+        )
+        .values(status="running", updated_at=now)
+    )
+    claimed = session.exec(statement).rowcount == 1  # type: ignore
+    session.commit()
+    return claimed
+
+
+def run_campaign(campaign_id: uuid.UUID, db_engine: Engine = engine) -> bool:
+    """
+    Send a campaign to every active user, in keyset order of ``User.id``.
+
+    The cursor is checkpointed before each batch is sent, so a run that
+    crashes resumes after the last claimed batch and never sends an email
+    twice; at worst the recipients of the one in-flight batch are skipped.
+    Returns False if the campaign was finished or is being run elsewhere.
+    """
+    with Session(db_engine) as session:
+        if not _claim(session, campaign_id):
+            return False
+        campaign = session.get(EmailCampaign, campaign_id)
+        assert campaign
+        template = CampaignTemplate(campaign.message)
+        sender = CampaignSender(
+            connections=settings.EMAIL_CAMPAIGN_CONNECTIONS,
+            rate=settings.EMAIL_CAMPAIGN_RATE_PER_SECOND,
+        )
+        try:
+            while True:
+                statement = (
+                    select(User.id, User.email, User.full_name)
+                    .where(col(User.is_active).is_(True))
+                    .order_by(col(User.id))
+                    .limit(settings.EMAIL_CAMPAIGN_BATCH_SIZE)
+                )
+                if campaign.cursor_user_id is not None:
+                    statement = statement.where(col(User.id) > campaign.cursor_user_id)
+                recipients = session.exec(statement).all()
+                if not recipients:
+                    break
+                campaign.cursor_user_id = recipients[-1].id
+                campaign.updated_at = datetime.utcnow()
+                session.add(campaign)
+                session.commit()
+
+                sent, failed = sender.send_all(campaign.subject, template, recipients)
+                campaign.sent_count += sent
+                campaign.failed_count += failed
+                campaign.updated_at = datetime.utcnow()
+                session.add(campaign)
+                session.commit()
+        except Exception:
+            session.rollback()
+            campaign.status = "interrupted"
+            session.add(campaign)
+            session.commit()
+            raise
+        finally:
+            sender.close()
+        campaign.status = "finished"
+        campaign.finished_at = datetime.utcnow()
+        session.add(campaign)
+        session.commit()
+        logger.info(
+            f"Campaign {campaign_id} finished: {campaign.sent_count} sent, "
+            f"{campaign.failed_count} failed"
+        )
+        return True
@@ -0,0 +1,192 @@
+import logging
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from sqlalchemy import Engine
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(*, email_to: str, subject: str, html_content: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr(
+        (settings.EMAILS_FROM_NAME or "", settings.EMAILS_FROM_EMAIL or "")
+    )
+    message["To"] = email_to
+    message["Subject"] = subject
+    message.set_content(html_content, subtype="html")
+    return message
+
+
+class SMTPConnection:
+    """
+    A long-lived SMTP connection, so the TCP, TLS and AUTH handshakes are paid
+    once per connection rather than once per message. Reconnects once when the
+    server has dropped an idle connection.
+    """
+
+    def __init__(self) -> None:
+        self._smtp: smtplib.SMTP | None = None
+
+    def _connect(self) -> smtplib.SMTP:
+        assert settings.SMTP_HOST, "no provided configuration for email variables"
+        smtp: smtplib.SMTP
+        if settings.SMTP_SSL:
+            smtp = smtplib.SMTP_SSL(
+                settings.SMTP_HOST,
+                settings.SMTP_PORT,
+                timeout=settings.SMTP_TIMEOUT_SECONDS,
+            )
+        else:
+            smtp = smtplib.SMTP(
+                settings.SMTP_HOST,
+                settings.SMTP_PORT,
+                timeout=settings.SMTP_TIMEOUT_SECONDS,
+            )
+            if settings.SMTP_TLS:
+                smtp.starttls()
+        if settings.SMTP_USER:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+        return smtp
+
+    def send(self, message: EmailMessage) -> None:
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self._smtp = self._connect()
+            self._smtp.send_message(message)
+
+    def close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except smtplib.SMTPException:
+            pass
+        self._smtp = None
+
+
+class OutboxSender:
+    """
+    Background thread that drains the email outbox over one reused SMTP
+    connection. Rows are claimed with ``FOR UPDATE SKIP LOCKED`` so several
+    workers can run a sender without sending the same email twice.
+    """
+
+    def __init__(self, db_engine: Engine) -> None:
+        self.engine = db_engine
+        self.connection = SMTPConnection()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="email-outbox", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.connection.close()
+
+    def notify(self) -> None:
+        """Wake the sender up instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Email outbox drain failed")
+            self._wakeup.wait(settings.EMAIL_OUTBOX_POLL_SECONDS)
+            self._wakeup.clear()
+
+    def drain(self) -> int:
+        """Send batches until nothing is due. Returns how many rows were processed."""
+        total = 0
+        while not self._stop.is_set():
+            processed = self.send_batch()
+            if not processed:
+                break
+            total += processed
+        return total
+
+    def send_batch(self) -> int:
+        """
+        Send one batch of due emails. Returns how many rows were processed, or
+        0 if the SMTP server could not be reached, so ``drain()`` backs off
+        until the next poll.
+        """
+        with Session(self.engine) as session:
+            now = datetime.utcnow()
+            statement = (
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending")
+                .where(EmailOutbox.next_attempt_at <= now)
+                .order_by(col(EmailOutbox.next_attempt_at))
+                .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            emails = session.exec(statement).all()
+            processed = len(emails)
+            for email in emails:
+                try:
+                    self.connection.send(
+                        build_message(
+                            email_to=email.email_to,
+                            subject=email.subject,
+                            html_content=email.html_content or "",
+                        )
+                    )
+                except (smtplib.SMTPException, OSError) as e:
+                    self._schedule_retry(email, e, now)
+                    session.add(email)
+                    # SMTPException subclasses OSError: only a dropped connection
+                    # or a socket error means the server is unreachable, so the
+                    # rest is left for later. Anything else failed this message.
+                    if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(
+                        e, smtplib.SMTPException
+                    ):
+                        self.connection.close()
+                        processed = 0
+                        break
+                else:
+                    email.status = "sent"
+                    email.sent_at = datetime.utcnow()
+                    email.html_content = None
+                    session.add(email)
+            session.commit()
+            return processed
+
+    @staticmethod
+    def _schedule_retry(email: EmailOutbox, error: Exception, now: datetime) -> None:
+        email.attempts += 1
+        email.last_error = str(error)[:1024]
+        if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            email.status = "failed"
+            email.html_content = None
+            logger.error(f"Giving up on email {email.id}: {error}")
+            return
+        delay = settings.EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+        email.next_attempt_at = now + timedelta(seconds=delay)
+
+
+outbox_sender = OutboxSender(engine)
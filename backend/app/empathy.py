@@ -0,0 +1,82 @@
+"""Aggregates of the empathy matrices attached to a user's PMOTs."""
+
+import uuid
+
+import numpy as np
+from sqlmodel import Session, col, select
+
+from app.core import empathy_matrix
+from app.models import PMOT, EmpathySummaryPublic, PMOTDetails
+
+
+def load_matrices(
+    session: Session, owner_id: uuid.UUID
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Event days (``datetime64[D]``) and the ``(n, *SHAPE)`` float64 stack of
+    the owner's empathy matrices, in event date order.
+    """
+    statement = (
+        select(
+            col(PMOT.event_date),
+            col(PMOTDetails.empathy_dtype),
+            col(PMOTDetails.empathy_matrix),
+        )
+        .join(PMOT, col(PMOT.id) == col(PMOTDetails.pmot_id))
+        .where(
+            col(PMOT.owner_id) == owner_id,
+            col(PMOTDetails.empathy_matrix).is_not(None),
+        )
+        .order_by(col(PMOT.event_date), col(PMOT.id))
+    )
+    rows = session.connection().execute(statement).all()
+    if not rows:
+        return np.empty(0, dtype="datetime64[D]"), np.empty((0, *empathy_matrix.SHAPE))
+    dates, dtypes, buffers = zip(*rows, strict=True)
+    days = np.array(dates, dtype="datetime64[D]")
+    kinds = set(dtypes)
+    if len(kinds) == 1:
+        matrices = empathy_matrix.decode_many(dtypes[0], buffers)
+        return days, matrices.astype(np.float64)
+    # Matrices written with different dtypes are decoded one dtype at a time
+    matrices = np.empty((len(rows), *empathy_matrix.SHAPE))
+    kind_of_row = np.array(dtypes)
+    for kind in kinds:
+        (indexes,) = np.nonzero(kind_of_row == kind)
+        group = [buffers[i] for i in indexes]
+        matrices[indexes] = empathy_matrix.decode_many(kind, group)
+    return days, matrices
+
+
+def summarize(days: np.ndarray, matrices: np.ndarray) -> EmpathySummaryPublic:
+    """Cell-wise mean, variance and least-squares drift per year."""
+    count = matrices.shape[0]
+    if count == 0:
+        return EmpathySummaryPublic(
+            count=0,
+            first_date=None,
+            last_date=None,
+            mean=None,
+            variance=None,
+            drift_per_year=None,
+        )
+    mean = matrices.mean(axis=0)
+    years = (days - days.min()).astype(np.float64) / 365.25
+    years -= years.mean()
+    spread = float(np.dot(years, years))
+    if spread > 0:
+        drift = np.tensordot(years, matrices - mean, axes=1) / spread
+    else:
+        drift = np.zeros_like(mean)
+    return EmpathySummaryPublic(
+        count=count,
+        first_date=days[0].item(),
+        last_date=days[-1].item(),
+        mean=mean.tolist(),
+        variance=matrices.var(axis=0).tolist(),
+        drift_per_year=drift.tolist(),
+    )
+
+
+def user_empathy_summary(session: Session, owner_id: uuid.UUID) -> EmpathySummaryPublic:
+    return summarize(*load_matrices(session, owner_id))
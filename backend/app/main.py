@@ -1,23 +1,63 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+import sqlalchemy.exc
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
+from app.analytics import track_rollups
+from app.anchor_graph import track_graph
 from app.api.main import api_router
+from app.core import metrics, timing
 from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.slow_query import slow_query_log
+from app.duplicates import track_signatures
+from app.email_outbox import outbox_sender
+from app.related import track_related
+from app.user_purge import start_pending_purges
+from app.utils import preload_email_templates
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+async def pool_timeout_handler(_request: Request, _exc: Exception) -> Response:
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT_SECONDS
+    metrics.DB_POOL_TIMEOUTS.inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, try again"},
+        headers={"Retry-After": "1"},
+    )
+
+
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    preload_email_templates()
+    if settings.emails_enabled:
+        outbox_sender.start()
+    # Finish purges cut short by the previous shutdown
+    start_pending_purges()
+    yield
+    outbox_sender.stop()
+    # Pooled async connections belong to this event loop
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -32,4 +72,21 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+app.add_middleware(
+    timing.ServerTimingMiddleware, sample_rate=settings.SERVER_TIMING_SAMPLE_RATE
+)
+app.add_middleware(metrics.PrometheusMiddleware)
+for db_engine in (engine, async_engine.sync_engine):
+    timing.instrument_engine(db_engine)
+    metrics.instrument_pool(db_engine)
+    slow_query_log.instrument(db_engine)
+
+track_rollups()
+track_graph()
+track_related()
+track_signatures()
+
+app.add_exception_handler(sqlalchemy.exc.TimeoutError, pool_timeout_handler)
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -1,8 +1,14 @@
+import enum
 import uuid
+from datetime import date, datetime
+from typing import Any
 
-from pydantic import EmailStr
-from sqlmodel import Field, Enum, Relationship, SQLModel
-from datetime import datetime
+from pydantic import EmailStr, field_validator
+from sqlalchemy import BigInteger, Column, Index, LargeBinary, UniqueConstraint, extract
+from sqlmodel import Enum, Field, Relationship, SQLModel
+
+from app.core import empathy_matrix
+from app.core.ids import uuid7
 
 
 # Shared properties
@@ -42,10 +48,21 @@ class UpdatePassword(SQLModel):
 
 # Database model, database table inferred from class name
 class User(UserBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Backs keyset paging of read_users by email
+    __table_args__ = (Index("ix_user_email_id", "email", "id"),)
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     hashed_password: str
-    items: list["Item"] = Relationship(back_populates="owner", 
-                                       cascade_delete=True)
+    # Bumped to revoke every access token issued before
+    token_version: int = 0
+    # Bumped whenever the user's PMOT series changes (see app.analytics)
+    pmot_version: int = 0
+    # Set when the account is deleted; its data is purged in the background
+    deleted_at: datetime | None = Field(default=None, index=True)
+    # The database deletes children through owner_id ON DELETE CASCADE
+    items: list["PMOT"] = Relationship(
+        back_populates="owner", cascade_delete=True, passive_deletes=True
+    )
 
 
 # Properties to return via API, id is always required
@@ -56,6 +73,9 @@ class UserPublic(UserBase):
 class UsersPublic(SQLModel):
     data: list[UserPublic]
     count: int
+    count_is_estimate: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
 # Shared properties
@@ -66,44 +86,262 @@ class EmotionImpact(str, enum.Enum):
     happy = "Happy"
     xtreme_happy = "Extremely Happy"
 
+
 class PMOTBase(SQLModel):
     label: str = Field(min_length=1, max_length=255)
     description: str | None = Field(default=None, max_length=255)
-    event_date: date = Field(default_factory=datetime.utcnow,nullable=False)
+    event_date: date = Field(default_factory=datetime.utcnow, nullable=False)
     short_story: str = Field(min_length=1, max_length=5500)
-    emotional_impact: EmotionImpact = Field(sa_column = Column(Enum(EmotionImpact)))
-    #show_on_jl: bool = False
+    emotional_impact: EmotionImpact = Field(sa_column=Column(Enum(EmotionImpact)))
+    # show_on_jl: bool = False
 
-class Anchor(SQLModel):
-    pass
 
-# Properties to receive on item creation
-class ItemCreate(PMOTBase):
-    created_at: date = Field(default_factory=datetime.utcnow,nullable=False)
+# Properties to receive on PMOT creation
+class PMOTCreate(PMOTBase):
+    created_at: date = Field(default_factory=datetime.utcnow, nullable=False)
 
 
-# Properties to receive on item update
-class ItemUpdate(PMOTBase):
-    title: str | None = Field(default=None, min_length=1, max_length=255)  # type: ignore
+# Properties to receive on PMOT update, all optional
+class PMOTUpdate(PMOTBase):
+    label: str | None = Field(default=None, min_length=1, max_length=255)  # type: ignore
+    event_date: date | None = None  # type: ignore
+    short_story: str | None = Field(default=None, min_length=1, max_length=5500)  # type: ignore
+    emotional_impact: EmotionImpact | None = None  # type: ignore
 
 
 # Database model, database table inferred from class name
 class PMOT(PMOTBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    title: str = Field(max_length=255)
+    # Back the keyset sorts of read_items, per owner and across all owners,
+    # and the event date ranges of the timeline
+    __table_args__ = (
+        Index("ix_pmot_owner_id_event_date_id", "owner_id", "event_date", "id"),
+        Index("ix_pmot_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_pmot_owner_id_label_id", "owner_id", "label", "id"),
+        Index("ix_pmot_created_at_id", "created_at", "id"),
+        Index("ix_pmot_label_id", "label", "id"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
+    # Left over from items; moments are named by their label
+    title: str = Field(default="", max_length=255)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
     owner: User | None = Relationship(back_populates="items")
 
-class PMOTDetails(SQLModel, table=True):
-    pmot_id: uuid.UUID = Field(foreign_key="PMOT.id", nullable=False, ondelete="RESTRICT")
+
+# Calendar day of the event as month * 100 + day. The "on this day" job
+# looks up a day of every owner's moments through this expression's index
+PMOT_MONTH_DAY = extract("month", PMOT.event_date) * 100 + extract(
+    "day", PMOT.event_date
+)
+Index(
+    "ix_pmot_month_day_owner_id_event_date",
+    PMOT_MONTH_DAY,
+    PMOT.owner_id,
+    PMOT.event_date,
+)
+
+
+def normalize_tag(name: str) -> str:
+    """Tags match case-insensitively and ignore repeated whitespace."""
+    return " ".join(name.split()).lower()
+
+
+class PMOTDetailsBase(SQLModel):
     det_story: str = Field(min_length=1, max_length=5500)
-    story_arc: StoryArc = # story arc obj 
-    anchors : list[Anchor] = Relationship(back_populates="Anchor", 
-                                          cascade_delete=False)
-    empathy_matrix: EmpathyMatrix = empathy_mat_obj
-    strengths1: list[Strength] = list_of_strength_objs
+
+
+class PMOTDetailsCreate(PMOTDetailsBase):
+    # SHAPE rows of numbers, see app.core.empathy_matrix
+    empathy_matrix: list[list[float]] | None = None
+    strengths: list[str] = Field(default_factory=list, max_length=50)
+    # People, places or habits the moment is anchored to
+    anchors: list[str] = Field(default_factory=list, max_length=50)
+
+    @field_validator("empathy_matrix")
+    @classmethod
+    def check_empathy_matrix(cls, value: list[list[float]] | None) -> Any:
+        if value is not None:
+            empathy_matrix.encode(value)
+        return value
+
+    @field_validator("strengths", "anchors")
+    @classmethod
+    def normalize_tags(cls, value: list[str] | None) -> Any:
+        if value is None:
+            return value
+        names = {normalize_tag(name) for name in value}
+        names.discard("")
+        if any(len(name) > 64 for name in names):
+            raise ValueError("Tags must be at most 64 characters")
+        return sorted(names)
+
+
+# None leaves the strengths or anchors unchanged; [] removes them all
+class PMOTDetailsUpdate(PMOTDetailsCreate):
+    det_story: str | None = Field(default=None, min_length=1, max_length=5500)  # type: ignore
+    strengths: list[str] | None = Field(default=None, max_length=50)  # type: ignore
+    anchors: list[str] | None = Field(default=None, max_length=50)  # type: ignore
+
+
+class PMOTDetails(PMOTDetailsBase, table=True):
+    pmot_id: uuid.UUID = Field(
+        foreign_key="pmot.id", primary_key=True, ondelete="RESTRICT"
+    )
+    # Strengths and anchors are in PMOTStrength and PMOTAnchor (see app.tags)
+    # NumPy dtype string and raw buffer, see app.core.empathy_matrix
+    empathy_dtype: str | None = Field(default=None, max_length=8)
+    empathy_matrix: bytes | None = Field(default=None, sa_column=Column(LargeBinary))
+
+
+class Strength(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
+    name: str = Field(unique=True, max_length=64)
+
+
+class Anchor(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("owner_id", "name"),)
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    name: str = Field(max_length=64)
+
+
+# Posting lists of the inverted index: the primary key serves "moments of
+# an owner with tag X", the second index "tags of an owner's moments"; both
+# are answered from the index alone
+class PMOTStrength(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_pmotstrength_owner_id_pmot_id_strength_id",
+            "owner_id",
+            "pmot_id",
+            "strength_id",
+        ),
+    )
+
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    strength_id: uuid.UUID = Field(
+        foreign_key="strength.id", primary_key=True, ondelete="CASCADE"
+    )
+    pmot_id: uuid.UUID = Field(
+        foreign_key="pmot.id", primary_key=True, ondelete="CASCADE"
+    )
+
+
+class PMOTAnchor(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_pmotanchor_owner_id_pmot_id_anchor_id",
+            "owner_id",
+            "pmot_id",
+            "anchor_id",
+        ),
+    )
+
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    anchor_id: uuid.UUID = Field(
+        foreign_key="anchor.id", primary_key=True, ondelete="CASCADE"
+    )
+    pmot_id: uuid.UUID = Field(
+        foreign_key="pmot.id", primary_key=True, ondelete="CASCADE"
+    )
+
+
+# A user's moment-anchor graph as CSR buffers, patched whenever anchors
+# change (see app.anchor_graph)
+class AnchorGraph(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    moments: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    anchors: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    moment_indptr: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    moment_anchors: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    anchor_indptr: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    anchor_moments: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
+# MinHash signature of a PMOT's short story (see app.core.minhash)
+class PMOTSignature(SQLModel, table=True):
+    pmot_id: uuid.UUID = Field(
+        foreign_key="pmot.id", primary_key=True, ondelete="CASCADE"
+    )
+    owner_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    signature: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
+# LSH buckets of the signatures, one row per band; the primary key finds
+# the moments of an owner sharing a bucket without reading any signature
+class PMOTBand(SQLModel, table=True):
+    __table_args__ = (Index("ix_pmotband_pmot_id", "pmot_id"),)
+
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    band: int = Field(primary_key=True)
+    bucket: int = Field(sa_column=Column(BigInteger, primary_key=True))
+    pmot_id: uuid.UUID = Field(
+        foreign_key="pmot.id", primary_key=True, ondelete="CASCADE"
+    )
+
+
+class EmpathySummaryPublic(SQLModel):
+    count: int
+    first_date: date | None
+    last_date: date | None
+    mean: list[list[float]] | None
+    variance: list[list[float]] | None
+    # Least-squares change per year of each cell over the event dates
+    drift_per_year: list[list[float]] | None
+
+
+# Count of a user's PMOTs per emotional impact and month or year, kept
+# current as PMOTs change (see app.analytics)
+class EmotionRollup(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    bucket: str = Field(primary_key=True, max_length=8)
+    period_start: date = Field(primary_key=True)
+    emotional_impact: EmotionImpact = Field(
+        sa_column=Column(Enum(EmotionImpact), primary_key=True)
+    )
+    count: int = 0
+
+
+class EmotionalImpactBucket(SQLModel):
+    period_start: date
+    total: int
+    counts: dict[EmotionImpact, int]
+
+
+class EmotionalImpactPublic(SQLModel):
+    bucket: str
+    data: list[EmotionalImpactBucket]
+
+
+class ChangePointPublic(SQLModel):
+    event_date: date
+    before: float
+    after: float
+
+
+# Parallel arrays, one entry per sampled PMOT in event date order
+class TrajectoryPublic(SQLModel):
+    count: int
+    dates: list[date]
+    scores: list[float]
+    rolling_mean: list[float]
+    ewma: list[float]
+    change_points: list[ChangePointPublic]
+
 
 # Properties to return via API, id is always required
 class PMOTPublic(PMOTBase):
@@ -111,8 +349,118 @@ class PMOTPublic(PMOTBase):
     owner_id: uuid.UUID
 
 
-class ItemsPublic(SQLModel):
+class PMOTsPublic(SQLModel):
+    data: list[PMOTPublic]
+    count: int
+    count_is_estimate: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+class RelatedPMOTPublic(PMOTPublic):
+    # Cosine similarity of the TF-IDF vectors of the two stories, up to 1
+    score: float
+
+
+class RelatedPMOTsPublic(SQLModel):
+    # Most similar first
+    data: list[RelatedPMOTPublic]
+
+
+class PMOTSearchPublic(SQLModel):
+    data: list[PMOTPublic]
+    count: int
+    # Matching moments per strength or anchor, most common first
+    strength_facets: dict[str, int]
+    anchor_facets: dict[str, int]
+
+
+class GraphMomentPublic(SQLModel):
+    id: uuid.UUID
+    label: str
+    event_date: date
+    # Anchor hops from the start of the traversal
+    hop: int
+
+
+class AnchorGraphPublic(SQLModel):
+    # Nearest first
+    moments: list[GraphMomentPublic]
+    # Anchors of the returned moments
+    anchors: list[str]
+
+
+class DuplicateGroupPublic(SQLModel):
     data: list[PMOTPublic]
+    # Lowest estimated Jaccard similarity between linked stories of the group
+    similarity: float
+
+
+class DuplicateGroupsPublic(SQLModel):
+    data: list[DuplicateGroupPublic]
+
+
+# Emails waiting to be delivered by the outbox sender
+class EmailOutbox(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_emailoutbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    email_to: str = Field(max_length=255)
+    subject: str = Field(max_length=998)
+    # Cleared once the email is sent or given up on, since account and reset
+    # emails carry passwords and tokens
+    html_content: str | None
+    status: str = Field(default="pending", max_length=16)
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: str | None = Field(default=None, max_length=1024)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: datetime | None = None
+
+
+# An "on this day" email queued for a user and day, so a rerun of the job
+# skips them (see app.on_this_day)
+class OnThisDayDelivery(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    day: date = Field(primary_key=True)
+    pmot_count: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class EmailCampaignCreate(SQLModel):
+    subject: str = Field(min_length=1, max_length=998)
+    # HTML fragment placed in the body of the campaign template
+    message: str = Field(min_length=1, max_length=20000)
+
+
+# Bulk notice to every active user, resumable from cursor_user_id
+class EmailCampaign(EmailCampaignCreate, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    status: str = Field(default="pending", max_length=16)
+    cursor_user_id: uuid.UUID | None = None
+    sent_count: int = 0
+    failed_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+
+
+class EmailCampaignPublic(EmailCampaignCreate):
+    id: uuid.UUID
+    status: str
+    sent_count: int
+    failed_count: int
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None
+
+
+class EmailCampaignsPublic(SQLModel):
+    data: list[EmailCampaignPublic]
     count: int
 
 
@@ -121,6 +469,18 @@ class Message(SQLModel):
     message: str
 
 
+class SlowQueryPublic(SQLModel):
+    fingerprint: str
+    statement: str
+    param_shape: str
+    calls: int
+    total_ms: float
+    max_ms: float
+    mean_ms: float
+    routes: dict[str, int]
+    plan: str | None
+
+
 # JSON payload containing access token
 class Token(SQLModel):
     access_token: str
@@ -130,6 +490,7 @@ class Token(SQLModel):
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    ver: int = 0
 
 
 class NewPassword(SQLModel):
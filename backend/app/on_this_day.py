@@ -0,0 +1,144 @@
+"""Daily "on this day" emails of a user's moments from earlier years.
+
+Every matching ``(owner, pmot)`` pair for a day is read in one pass over the
+``PMOT_MONTH_DAY`` expression index, ordered by owner, through a server-side
+cursor, so the job never scans the whole ``pmot`` table. Owners are grouped
+as their rows stream in and queued ``ON_THIS_DAY_BATCH_SIZE`` at a time: one
+transaction inserts the batch's ``OnThisDayDelivery`` rows and, for the
+owners that did not have one yet, their emails into the outbox, which the
+outbox sender then delivers. Rerunning a day queues nothing twice.
+
+Run it once a day with ``python -m app.on_this_day``.
+"""
+
+import calendar
+import itertools
+import logging
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import Engine, Row, Select
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.upsert import upsert_insert
+from app.models import PMOT, PMOT_MONTH_DAY, EmailOutbox, OnThisDayDelivery, User
+from app.utils import render_email_template
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Moment:
+    label: str
+    event_date: date
+    years_ago: int
+
+
+def calendar_days(day: date) -> list[int]:
+    """
+    ``PMOT_MONTH_DAY`` values to remind of on ``day``. Outside leap years,
+    moments of 29 February are shown on 28 February.
+    """
+    days = [day.month * 100 + day.day]
+    if (day.month, day.day) == (2, 28) and not calendar.isleap(day.year):
+        days.append(229)
+    return days
+
+
+def _matches(day: date) -> Select[Any]:
+    return (
+        select(PMOT.owner_id, User.email, User.full_name, PMOT.label, PMOT.event_date)
+        .join(User, col(User.id) == col(PMOT.owner_id))
+        .where(
+            PMOT_MONTH_DAY.in_(calendar_days(day)),
+            col(PMOT.event_date) < day,
+            col(User.is_active).is_(True),
+        )
+        .order_by(col(PMOT.owner_id), col(PMOT.event_date))
+    )
+
+
+def _queue(session: Session, day: date, owners: Sequence[list[Row[Any]]]) -> int:
+    """Queue the emails of owners not yet reminded on ``day``. Returns how many."""
+    connection = session.connection()
+    table = OnThisDayDelivery.__table__  # type: ignore[attr-defined]
+    now = datetime.utcnow()
+    deliveries = [
+        {
+            "owner_id": rows[0].owner_id,
+            "day": day,
+            "pmot_count": len(rows),
+            "created_at": now,
+        }
+        for rows in owners
+    ]
+    created = connection.execute(
+        upsert_insert(connection)(table)
+        .values(deliveries)
+        .on_conflict_do_nothing()
+        .returning(table.c.owner_id)
+    )
+    new = set(created.scalars())
+    subject = f"{settings.PROJECT_NAME} - On this day"
+    emails = [
+        EmailOutbox(
+            email_to=rows[0].email,
+            subject=subject,
+            html_content=render_email_template(
+                template_name="on_this_day.html",
+                context={
+                    "project_name": settings.PROJECT_NAME,
+                    "recipient_name": rows[0].full_name or rows[0].email,
+                    "email": rows[0].email,
+                    "moments": [
+                        Moment(
+                            row.label, row.event_date, day.year - row.event_date.year
+                        )
+                        for row in rows
+                    ],
+                },
+            ),
+        ).model_dump()
+        for rows in owners
+        if rows[0].owner_id in new
+    ]
+    if emails:
+        connection.execute(EmailOutbox.__table__.insert(), emails)  # type: ignore[attr-defined]
+    session.commit()
+    return len(emails)
+
+
+def run(day: date | None = None, db_engine: Engine = engine) -> int:
+    """Queue the "on this day" emails of ``day`` (today by default). Returns how many."""
+    day = day or date.today()
+    start = time.perf_counter()
+    queued = 0
+    with db_engine.connect() as reader, Session(db_engine) as session:
+        rows = reader.execution_options(
+            yield_per=settings.ON_THIS_DAY_BATCH_SIZE
+        ).execute(_matches(day))
+        owners = (
+            list(group)
+            for _, group in itertools.groupby(rows, key=lambda r: r.owner_id)
+        )
+        while batch := list(itertools.islice(owners, settings.ON_THIS_DAY_BATCH_SIZE)):
+            queued += _queue(session, day, batch)
+    logger.info(
+        f"Queued {queued} on this day emails for {day} in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    return queued
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    run()
+
+
+if __name__ == "__main__":
+    main()
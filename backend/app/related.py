@@ -0,0 +1,393 @@
+"""Related moments: TF-IDF similarity between a user's PMOT stories.
+
+Each owner has one segment file in ``RELATED_INDEX_DIR`` holding an
+inverted index of their stories (label and short story): for every word,
+the stories using it with its term frequency and L2-normalized TF-IDF
+weight in each. Words are hashed to 32-bit term ids, so there is no
+vocabulary to keep in sync. The file is a sequence of ``.npy`` arrays that
+are memory-mapped on read; a query tokenizes only its own story and reads
+only the postings of its words.
+
+The listeners installed by ``track_related`` patch a segment after each
+commit that adds, changes or deletes PMOTs: only the changed stories are
+tokenized, and the weights are recomputed from the stored frequencies. The
+segment is written to a temporary file and renamed over the old one under
+a per-owner file lock, so readers always see a whole segment. A PMOT moved
+to another owner is removed from the old owner's segment and added to the
+new one's. A missing segment is built from the database the first time it
+is queried, reading the stories under the same lock, so a commit whose
+patch is applied while the build is in progress is not lost; run
+
+    python -m app.related
+
+to rebuild every segment, e.g. after writes that bypass the ORM.
+"""
+
+import fcntl
+import logging
+import math
+import os
+import re
+import tempfile
+import uuid
+import zlib
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import PMOT, User
+
+logger = logging.getLogger(__name__)
+
+ID = np.dtype("S16")
+TERM = np.dtype("<u4")
+INDEX = np.dtype("<i4")
+POINTER = np.dtype("<i8")
+WEIGHT = np.dtype("<f4")
+
+_WORD = re.compile(r"[^\W\d_]{2,}")
+STOP_WORDS = frozenset(
+    """
+    about after again all also am an and any are as at be been before being
+    but by can could did do does doing down during each few for from had has
+    have having he her here hers him his how if in into is it its just me
+    more most my no nor not now of off on once only or other our out over own
+    same she so some such than that the their them then there these they
+    this those through to too under until up very was we were what when
+    where which while who whom why will with would you your
+    """.split()
+)
+
+_PENDING = "related_changes"
+
+
+def tokenize(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted hashed term ids of the words of ``text`` and their counts."""
+    words = [word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+    ids = np.fromiter(
+        (zlib.crc32(word.encode()) for word in words), dtype=TERM, count=len(words)
+    )
+    ids, counts = np.unique(ids, return_counts=True)
+    return ids, counts.astype(WEIGHT)
+
+
+def story_text(label: str | None, short_story: str | None) -> str:
+    return f"{label or ''}\n{short_story or ''}"
+
+
+def _idf(documents: int, df: np.ndarray) -> np.ndarray:
+    return np.log((1 + documents) / (1 + df.astype(np.float64))) + 1
+
+
+@dataclass
+class Segment:
+    # Story i is the 16-byte id ids[i]. The postings of vocabulary[j] (the
+    # stories using it, 1 + log of its count in each and the L2-normalized
+    # TF-IDF weights) are at
+    # term_ptr[j]:term_ptr[j + 1], so term_ptr also holds the document
+    # frequencies
+    ids: np.ndarray
+    vocabulary: np.ndarray
+    term_ptr: np.ndarray
+    docs: np.ndarray
+    tf: np.ndarray
+    weights: np.ndarray
+
+    @classmethod
+    def assemble(
+        cls, ids: np.ndarray, terms: np.ndarray, docs: np.ndarray, tf: np.ndarray
+    ) -> "Segment":
+        """Weigh postings given in term order, one term per posting."""
+        first = np.ones(terms.size, dtype=bool)
+        first[1:] = terms[1:] != terms[:-1]
+        starts = np.flatnonzero(first)
+        term_ptr = np.append(starts, terms.size).astype(POINTER)
+        df = np.diff(term_ptr)
+        weights = tf * np.repeat(_idf(ids.size, df), df)
+        norms = np.sqrt(np.bincount(docs, weights * weights, minlength=ids.size))
+        if weights.size:
+            weights /= norms[docs]
+        return cls(
+            ids=ids,
+            vocabulary=terms[starts],
+            term_ptr=term_ptr,
+            docs=docs,
+            tf=tf,
+            weights=weights.astype(WEIGHT),
+        )
+
+    @classmethod
+    def from_stories(cls, stories: Iterable[tuple[uuid.UUID, str]]) -> "Segment":
+        return cls.empty().with_changes(dict(stories))
+
+    @classmethod
+    def empty(cls) -> "Segment":
+        return cls.assemble(
+            np.empty(0, dtype=ID),
+            np.empty(0, dtype=TERM),
+            np.empty(0, dtype=INDEX),
+            np.empty(0, dtype=WEIGHT),
+        )
+
+    def with_changes(self, changes: Mapping[uuid.UUID, str | None]) -> "Segment":
+        """
+        The segment with each story in ``changes`` replaced, or removed if None.
+        The postings stay in term order: those of changed stories are masked
+        out and the new ones inserted at their sorted positions, so only the
+        changed stories are tokenized and nothing is re-sorted.
+        """
+        changed = np.array([pmot_id.bytes for pmot_id in changes], dtype=ID)
+        keep = ~np.isin(self.ids, changed)
+        kept = keep[self.docs]
+        renumbered = (np.cumsum(keep) - 1).astype(INDEX)
+        terms = np.repeat(self.vocabulary, np.diff(self.term_ptr))[kept]
+        docs = renumbered[self.docs[kept]]
+        tf = self.tf[kept]
+
+        ids = [self.ids[keep]]
+        added: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        for pmot_id, text in changes.items():
+            if text is None:
+                continue
+            story_terms, story_counts = tokenize(text)
+            doc = np.full(story_terms.size, ids[0].size + len(added), dtype=INDEX)
+            ids.append(np.array([pmot_id.bytes], dtype=ID))
+            added.append((story_terms, doc, (1 + np.log(story_counts)).astype(WEIGHT)))
+        if added:
+            new_terms, new_docs, new_tf = map(np.concatenate, zip(*added, strict=True))
+            order = np.argsort(new_terms, kind="stable")
+            at = np.searchsorted(terms, new_terms[order], side="right")
+            terms = np.insert(terms, at, new_terms[order])
+            docs = np.insert(docs, at, new_docs[order])
+            tf = np.insert(tf, at, new_tf[order])
+        return Segment.assemble(np.concatenate(ids), terms, docs, tf)
+
+    def similar(
+        self, text: str, k: int, exclude: uuid.UUID | None = None
+    ) -> list[tuple[uuid.UUID, float]]:
+        """
+        The ``k`` stories most similar to ``text`` by cosine, best first. Only
+        the postings of the words of ``text`` are read.
+        """
+        query_terms, counts = tokenize(text)
+        rows = np.searchsorted(self.vocabulary, query_terms)
+        known = rows < self.vocabulary.size
+        known[known] = self.vocabulary[rows[known]] == query_terms[known]
+        rows = rows[known]
+        if rows.size == 0:
+            return []
+        starts = self.term_ptr[rows]
+        df = self.term_ptr[rows + 1] - starts
+        query = (1 + np.log(counts[known].astype(np.float64))) * _idf(self.ids.size, df)
+        query /= math.sqrt(float(query @ query))
+
+        # Concatenated postings of every query term, without a Python loop
+        offsets = np.repeat(starts - np.cumsum(df) + df, df) + np.arange(int(df.sum()))
+        scores = np.bincount(
+            self.docs[offsets],
+            self.weights[offsets] * np.repeat(query, df),
+            minlength=self.ids.size,
+        )
+        if exclude is not None:
+            scores[self.ids == exclude.bytes] = 0.0
+        best = np.flatnonzero(scores > 0)
+        if best.size > k:
+            best = best[np.argpartition(-scores[best], k - 1)[:k]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        # Elements of an S16 array drop trailing NUL bytes
+        return [
+            (uuid.UUID(bytes=self.ids[i].ljust(16, b"\0")), float(scores[i]))
+            for i in best
+        ]
+
+    def _arrays(self) -> tuple[np.ndarray, ...]:
+        return (
+            self.ids,
+            self.vocabulary,
+            self.term_ptr,
+            self.docs,
+            self.tf,
+            self.weights,
+        )
+
+
+def write_segment(path: Path, segment: Segment) -> None:
+    """Replace ``path`` with ``segment`` in one rename."""
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        for array in segment._arrays():
+            np.save(f, np.ascontiguousarray(array))
+    os.replace(temporary, path)
+
+
+def _read_array(f: BinaryIO, path: Path) -> np.ndarray:
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    offset = f.tell()
+    count = math.prod(shape)
+    f.seek(offset + count * dtype.itemsize)
+    if count == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def read_segment(path: Path) -> Segment | None:
+    """The segment at ``path`` as read-only memory maps, or None if missing."""
+    try:
+        with open(path, "rb") as f:
+            return Segment(*(_read_array(f, path) for _ in fields(Segment)))
+    except FileNotFoundError:
+        return None
+
+
+class RelatedIndex:
+    """Segment files of every owner in one directory."""
+
+    def __init__(self, directory: str | None) -> None:
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / "pmot-related")
+
+    def _path(self, owner_id: uuid.UUID) -> Path:
+        return self.directory / f"{owner_id}.segment"
+
+    @contextmanager
+    def _locked(self, owner_id: uuid.UUID) -> Iterator[None]:
+        # Serializes writers of one owner across threads and processes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / f"{owner_id}.lock", "wb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def get(self, owner_id: uuid.UUID) -> Segment | None:
+        return read_segment(self._path(owner_id))
+
+    def rebuild(
+        self,
+        owner_id: uuid.UUID,
+        stories: Callable[[], Iterable[tuple[uuid.UUID, str]]],
+    ) -> Segment:
+        """
+        Replace the segment with one of ``stories()``, read under the lock: a
+        commit after the read waits for the segment to be written and patches
+        it, one before it is in the stories.
+        """
+        with self._locked(owner_id):
+            segment = Segment.from_stories(stories())
+            write_segment(self._path(owner_id), segment)
+        return segment
+
+    def update(
+        self, owner_id: uuid.UUID, changes: Mapping[uuid.UUID, str | None]
+    ) -> None:
+        """Apply ``changes`` to an existing segment; a missing one is built when queried."""
+        with self._locked(owner_id):
+            segment = self.get(owner_id)
+            if segment is not None:
+                write_segment(self._path(owner_id), segment.with_changes(changes))
+
+
+related_index = RelatedIndex(settings.RELATED_INDEX_DIR)
+
+
+def build(session: Session, owner_id: uuid.UUID) -> Segment:
+    statement = select(PMOT.id, PMOT.label, PMOT.short_story).where(
+        col(PMOT.owner_id) == owner_id
+    )
+
+    def stories() -> Iterator[tuple[uuid.UUID, str]]:
+        rows = session.connection().execute(statement).all()
+        for pmot_id, label, short_story in rows:
+            yield pmot_id, story_text(label, short_story)
+
+    return related_index.rebuild(owner_id, stories)
+
+
+def related_pmots(
+    session: Session, pmot: PMOT, k: int = 10
+) -> list[tuple[uuid.UUID, float]]:
+    """Ids and cosine similarities of the owner's PMOTs most like ``pmot``."""
+    segment = related_index.get(pmot.owner_id) or build(session, pmot.owner_id)
+    return segment.similar(story_text(pmot.label, pmot.short_story), k, exclude=pmot.id)
+
+
+def _story_changed(pmot: PMOT) -> bool:
+    state = inspect(pmot)
+    return any(
+        state.attrs[name].history.has_changes() for name in ("label", "short_story")
+    )
+
+
+def _keep_value(_target: Any, value: Any, _oldvalue: Any, _initiator: Any) -> Any:
+    return value
+
+
+def _collect_changes(session: OrmSession, _flush_context: Any, _instances: Any) -> None:
+    changes: dict[tuple[Any, Any], str | None] = session.info.setdefault(_PENDING, {})
+    for obj in session.new:
+        if isinstance(obj, PMOT):
+            changes[obj.owner_id, obj.id] = story_text(obj.label, obj.short_story)
+    for obj in session.dirty:
+        if not isinstance(obj, PMOT):
+            continue
+        moved_from = inspect(obj).attrs.owner_id.history.deleted
+        for previous_owner_id in moved_from:
+            changes[previous_owner_id, obj.id] = None
+        if moved_from or _story_changed(obj):
+            changes[obj.owner_id, obj.id] = story_text(obj.label, obj.short_story)
+    for obj in session.deleted:
+        if isinstance(obj, PMOT):
+            changes[obj.owner_id, obj.id] = None
+
+
+def _apply_changes(session: OrmSession) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    by_owner: dict[Any, dict[uuid.UUID, str | None]] = {}
+    for (owner_id, pmot_id), text in pending.items():
+        if owner_id is not None:
+            by_owner.setdefault(owner_id, {})[pmot_id] = text
+    for owner_id, changes in by_owner.items():
+        try:
+            related_index.update(owner_id, changes)
+        except OSError as e:
+            # The database is committed; a stale segment only affects suggestions
+            logger.warning(f"Could not update related index of {owner_id}: {e}")
+
+
+def track_related() -> None:
+    """Keep the related index current with every committed ORM change to a PMOT."""
+    if event.contains(OrmSession, "before_flush", _collect_changes):
+        return
+    # Load the old owner when a committed, so expired, PMOT is moved;
+    # otherwise its history is empty and the old segment keeps the story
+    event.listen(PMOT.owner_id, "set", _keep_value, active_history=True)
+    event.listen(OrmSession, "before_flush", _collect_changes)
+    event.listen(OrmSession, "after_commit", _apply_changes)
+    event.listen(
+        OrmSession, "after_rollback", lambda session: session.info.pop(_PENDING, None)
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    with Session(engine) as session:
+        owners = session.exec(select(User.id)).all()
+        for owner_id in owners:
+            build(session, owner_id)
+    logger.info(f"Rebuilt the related index of {len(owners)} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Strengths and anchors of PMOTs, kept as an inverted index.
+
+Tag names live once in ``Strength`` (shared by everyone) and ``Anchor`` (per
+owner). ``PMOTStrength`` and ``PMOTAnchor`` are the posting lists: one row per
+(owner, tag, moment), with a primary key that starts with the owner and the
+tag. "Moments with strength X" is a range scan of that key, AND and OR
+filters are GROUP BY / DISTINCT over it, and facet counts come from the
+second ``(owner_id, pmot_id, tag)`` index, so none of these read the
+``pmot`` heap.
+"""
+
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from sqlalchemy import Select, intersect
+from sqlmodel import Session, col, func, select
+
+from app.core.ids import uuid7
+from app.core.pagination import fetch_page
+from app.core.upsert import upsert_insert
+from app.models import PMOT, Anchor, PMOTAnchor, PMOTStrength, Strength
+
+Mode = Literal["all", "any"]
+
+
+@dataclass(frozen=True)
+class TagKind:
+    vocabulary: Any
+    link: Any
+    # Column of ``link`` holding the vocabulary id
+    key: str
+    per_owner: bool
+
+
+STRENGTHS = TagKind(Strength, PMOTStrength, "strength_id", per_owner=False)
+ANCHORS = TagKind(Anchor, PMOTAnchor, "anchor_id", per_owner=True)
+
+
+def tag_ids(
+    session: Session,
+    kind: TagKind,
+    owner_id: uuid.UUID,
+    names: Sequence[str],
+    create: bool = False,
+) -> dict[str, uuid.UUID]:
+    """Ids of the named tags, adding the missing ones when ``create`` is set."""
+    if not names:
+        return {}
+    connection = session.connection()
+    table = kind.vocabulary.__table__
+    owner = {"owner_id": owner_id} if kind.per_owner else {}
+    if create:
+        insert = upsert_insert(connection)
+        rows = [{"id": uuid7(), "name": name, **owner} for name in sorted(names)]
+        connection.execute(insert(table).values(rows).on_conflict_do_nothing())
+    statement = select(table.c.name, table.c.id).where(table.c.name.in_(names))
+    if kind.per_owner:
+        statement = statement.where(table.c.owner_id == owner_id)
+    return dict(connection.execute(statement).tuples().all())
+
+
+def replace_tags(
+    session: Session,
+    kind: TagKind,
+    owner_id: uuid.UUID,
+    pmot_id: uuid.UUID,
+    names: Sequence[str],
+) -> dict[str, uuid.UUID]:
+    """Make ``names`` the tags of the moment, without committing; returns their ids."""
+    connection = session.connection()
+    link = kind.link.__table__
+    ids = tag_ids(session, kind, owner_id, names, create=True)
+    stale = link.delete().where(link.c.pmot_id == pmot_id)
+    if ids:
+        stale = stale.where(link.c[kind.key].not_in(list(ids.values())))
+    connection.execute(stale)
+    if ids:
+        insert = upsert_insert(connection)
+        rows = [
+            {"owner_id": owner_id, kind.key: tag_id, "pmot_id": pmot_id}
+            for tag_id in ids.values()
+        ]
+        connection.execute(insert(link).values(rows).on_conflict_do_nothing())
+    return ids
+
+
+def _matching(
+    kind: TagKind, owner_id: uuid.UUID, ids: list[uuid.UUID], mode: Mode
+) -> Select[Any]:
+    """Ids of the owner's moments tagged with all or any of ``ids``."""
+    link = kind.link.__table__
+    statement = select(link.c.pmot_id).where(
+        link.c.owner_id == owner_id, link.c[kind.key].in_(ids)
+    )
+    if mode == "all":
+        return statement.group_by(link.c.pmot_id).having(func.count() == len(ids))
+    # Moments with several of the tags repeat; IN and INTERSECT ignore that
+    return statement
+
+
+def _facets(
+    kind: TagKind, owner_id: uuid.UUID, matched: Any | None, limit: int
+) -> Select[Any]:
+    """Most used tags of ``kind`` among the ``matched`` moments, with counts."""
+    link = kind.link.__table__
+    table = kind.vocabulary.__table__
+    count = func.count().label("count")
+    statement = (
+        select(table.c.name, count)
+        .select_from(link.join(table, table.c.id == link.c[kind.key]))
+        .where(link.c.owner_id == owner_id)
+        .group_by(table.c.name)
+        .order_by(count.desc(), table.c.name)
+        .limit(limit)
+    )
+    if matched is not None:
+        statement = statement.where(link.c.pmot_id.in_(matched))
+    return statement
+
+
+def search(
+    session: Session,
+    owner_id: uuid.UUID,
+    *,
+    strengths: Sequence[str] = (),
+    strength_mode: Mode = "all",
+    anchors: Sequence[str] = (),
+    anchor_mode: Mode = "all",
+    skip: int = 0,
+    limit: int = 100,
+    facet_limit: int = 50,
+) -> tuple[Sequence[PMOT], int, dict[str, int], dict[str, int]]:
+    """
+    The owner's moments matching the strength and anchor filters, newest
+    first, with their total and the strength and anchor counts among all
+    of the matches (not just the page).
+    """
+    filters: list[Select[Any]] = []
+    for kind, names, mode in (
+        (STRENGTHS, strengths, strength_mode),
+        (ANCHORS, anchors, anchor_mode),
+    ):
+        if not names:
+            continue
+        ids = tag_ids(session, kind, owner_id, names)
+        if not ids or (mode == "all" and len(ids) < len(set(names))):
+            # A tag that was never used can match nothing
+            return [], 0, {}, {}
+        filters.append(_matching(kind, owner_id, list(ids.values()), mode))
+
+    matched: Any | None = None
+    if len(filters) == 1:
+        matched = filters[0]
+    elif filters:
+        matched = intersect(*filters)
+    criteria = [col(PMOT.owner_id) == owner_id]
+    if matched is not None:
+        criteria.append(col(PMOT.id).in_(matched))
+    data, count, _ = fetch_page(
+        session,
+        PMOT,
+        *criteria,
+        order_by=[col(PMOT.event_date).desc(), col(PMOT.id).desc()],
+        skip=skip,
+        limit=limit,
+    )
+    connection = session.connection()
+    strength_facets = (
+        connection.execute(_facets(STRENGTHS, owner_id, matched, facet_limit))
+        .tuples()
+        .all()
+    )
+    anchor_facets = (
+        connection.execute(_facets(ANCHORS, owner_id, matched, facet_limit))
+        .tuples()
+        .all()
+    )
+    return data, count, dict(strength_facets), dict(anchor_facets)
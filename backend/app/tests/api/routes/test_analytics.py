@@ -0,0 +1,123 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, col, select
+
+from app import crud
+from app.analytics import rebuild
+from app.core.config import settings
+from app.models import (
+    EmotionImpact,
+    EmotionRollup,
+    PMOTDetailsCreate,
+)
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user_with_headers
+from app.tests.utils.utils import random_lower_string
+
+
+def test_emotional_impact_rollups_follow_pmot_changes(
+    client: TestClient, db: Session
+) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    create_random_pmot(db, user.id, date(2024, 3, 2), EmotionImpact.happy)
+    sad = create_random_pmot(db, user.id, date(2024, 3, 20), EmotionImpact.sad)
+    later = create_random_pmot(db, user.id, date(2024, 5, 1), EmotionImpact.happy)
+
+    sad.emotional_impact = EmotionImpact.meh
+    db.add(sad)
+    db.delete(later)
+    db.commit()
+
+    r = client.get(
+        f"{settings.API_V1_STR}/analytics/emotional-impact",
+        headers=headers,
+        params={"bucket": "month"},
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert content["bucket"] == "month"
+    assert len(content["data"]) == 1
+    march = content["data"][0]
+    assert march["period_start"] == "2024-03-01"
+    assert march["total"] == 2
+    assert march["counts"][EmotionImpact.happy.value] == 1
+    assert march["counts"][EmotionImpact.meh.value] == 1
+    assert march["counts"][EmotionImpact.sad.value] == 0
+
+    r = client.get(
+        f"{settings.API_V1_STR}/analytics/emotional-impact",
+        headers=headers,
+        params={"bucket": "year", "from": "2025-01-01"},
+    )
+    assert r.status_code == 200
+    assert r.json()["data"] == []
+
+    # A rebuild from the pmot table agrees with the incremental counts
+    statement = (
+        select(EmotionRollup)
+        .where(col(EmotionRollup.owner_id) == user.id)
+        .order_by(col(EmotionRollup.bucket), col(EmotionRollup.period_start))
+    )
+    incremental = [r.model_dump() for r in db.exec(statement).all()]
+    rebuild(db)
+    db.expire_all()
+    assert sorted(map(str, incremental)) == sorted(
+        str(r.model_dump()) for r in db.exec(statement).all()
+    )
+
+
+def test_trajectory_is_recomputed_when_pmots_change(
+    client: TestClient, db: Session
+) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    for day in range(1, 11):
+        create_random_pmot(db, user.id, date(2023, 1, day), EmotionImpact.sad)
+    url = f"{settings.API_V1_STR}/analytics/trajectory"
+
+    r = client.get(url, headers=headers, params={"window": 5, "max_points": 4})
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == 10
+    assert content["dates"] == ["2023-01-01", "2023-01-04", "2023-01-07", "2023-01-10"]
+    assert content["scores"] == pytest.approx([-1.0] * 4)
+    assert content["ewma"] == pytest.approx([-1.0] * 4)
+
+    create_random_pmot(db, user.id, date(2023, 2, 1), EmotionImpact.xtreme_happy)
+    r = client.get(url, headers=headers, params={"window": 5})
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == 11
+    assert content["scores"][-1] == 2.0
+    assert content["rolling_mean"][-1] == (4 * -1.0 + 2.0) / 5
+
+
+def test_empathy_summary_aggregates_matrices(client: TestClient, db: Session) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    url = f"{settings.API_V1_STR}/analytics/empathy"
+
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["count"] == 0
+    assert r.json()["mean"] is None
+
+    for year, value in ((2020, 0.0), (2021, 1.0), (2022, 2.0)):
+        pmot = create_random_pmot(db, user.id, date(year, 6, 1))
+        details_in = PMOTDetailsCreate(
+            det_story=random_lower_string(),
+            empathy_matrix=[[value, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+        )
+        crud.create_pmot_details(session=db, details_in=details_in, pmot_id=pmot.id)
+
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == 3
+    assert content["first_date"] == "2020-06-01"
+    assert content["last_date"] == "2022-06-01"
+    assert content["mean"][0] == [1.0, 1.0, 0.0]
+    assert content["variance"][0][0] == pytest.approx(2 / 3)
+    assert content["variance"][0][1] == 0.0
+    assert content["drift_per_year"][0][0] == pytest.approx(1.0, rel=1e-2)
+    assert content["drift_per_year"][1][1] == 0.0
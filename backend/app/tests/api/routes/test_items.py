@@ -1,16 +1,24 @@
 import uuid
+from datetime import date
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, func, select
 
 from app.core.config import settings
-from app.tests.utils.item import create_random_item
+from app.models import PMOT
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user
 
 
 def test_create_item(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
-    data = {"title": "Foo", "description": "Fighters"}
+    data = {
+        "label": "Foo",
+        "short_story": "Fighters",
+        "emotional_impact": "Happy",
+        "event_date": "2024-01-01",
+    }
     response = client.post(
         f"{settings.API_V1_STR}/items/",
         headers=superuser_token_headers,
@@ -18,8 +26,9 @@ def test_create_item(
     )
     assert response.status_code == 200
     content = response.json()
-    assert content["title"] == data["title"]
-    assert content["description"] == data["description"]
+    assert content["label"] == data["label"]
+    assert content["short_story"] == data["short_story"]
+    assert content["emotional_impact"] == data["emotional_impact"]
     assert "id" in content
     assert "owner_id" in content
 
@@ -27,15 +36,15 @@ def test_create_item(
 def test_read_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
     response = client.get(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=superuser_token_headers,
     )
     assert response.status_code == 200
     content = response.json()
-    assert content["title"] == item.title
-    assert content["description"] == item.description
+    assert content["label"] == item.label
+    assert content["short_story"] == item.short_story
     assert content["id"] == str(item.id)
     assert content["owner_id"] == str(item.owner_id)
 
@@ -55,7 +64,7 @@ def test_read_item_not_found(
 def test_read_item_not_enough_permissions(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
     response = client.get(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=normal_user_token_headers,
@@ -68,8 +77,9 @@ def test_read_item_not_enough_permissions(
 def test_read_items(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
-    create_random_item(db)
-    create_random_item(db)
+    owner = create_random_user(db)
+    create_random_pmot(db, owner.id, date(2024, 1, 1))
+    create_random_pmot(db, owner.id, date(2024, 1, 2))
     response = client.get(
         f"{settings.API_V1_STR}/items/",
         headers=superuser_token_headers,
@@ -79,11 +89,82 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_count_covers_all_pages(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    create_random_pmot(db, owner.id, date(2024, 1, 1))
+    create_random_pmot(db, owner.id, date(2024, 1, 2))
+    total = db.exec(select(func.count()).select_from(PMOT)).one()
+    response = client.get(
+        f"{settings.API_V1_STR}/items/?limit=1",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["data"]) == 1
+    assert content["count"] == total
+    assert content["count_is_estimate"] is False
+
+    response = client.get(
+        f"{settings.API_V1_STR}/items/?skip={total + 10}",
+        headers=superuser_token_headers,
+    )
+    content = response.json()
+    assert content["data"] == []
+    assert content["count"] == total
+
+
+def test_read_items_cursor_pages_match_offset_order(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    for day in (1, 2, 3):
+        create_random_pmot(db, owner.id, date(2024, 1, day))
+    url = f"{settings.API_V1_STR}/items/?sort=label"
+    everything = client.get(f"{url}&limit=1000", headers=superuser_token_headers)
+    expected = [item["id"] for item in everything.json()["data"]]
+
+    seen: list[str] = []
+    response = client.get(f"{url}&limit=2", headers=superuser_token_headers)
+    total = response.json()["count"]
+    while True:
+        content = response.json()
+        # Counted on the first page only and carried by the cursors
+        assert content["count"] == total
+        seen.extend(item["id"] for item in content["data"])
+        if content["next_cursor"] is None:
+            break
+        response = client.get(
+            f"{url}&limit=2&cursor={content['next_cursor']}",
+            headers=superuser_token_headers,
+        )
+    assert seen == expected
+
+    response = client.get(
+        f"{url}&limit=2&cursor={content['prev_cursor']}",
+        headers=superuser_token_headers,
+    )
+    previous = [item["id"] for item in response.json()["data"]]
+    assert previous == seen[-len(content["data"]) - 2 : -len(content["data"])]
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/?cursor=not-a-cursor",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
-    data = {"title": "Updated title", "description": "Updated description"}
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
+    data = {"label": "Updated label", "short_story": "Updated story"}
     response = client.put(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=superuser_token_headers,
@@ -91,8 +172,9 @@ def test_update_item(
     )
     assert response.status_code == 200
     content = response.json()
-    assert content["title"] == data["title"]
-    assert content["description"] == data["description"]
+    assert content["label"] == data["label"]
+    assert content["short_story"] == data["short_story"]
+    assert content["emotional_impact"] == item.emotional_impact
     assert content["id"] == str(item.id)
     assert content["owner_id"] == str(item.owner_id)
 
@@ -100,7 +182,7 @@ def test_update_item(
 def test_update_item_not_found(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
-    data = {"title": "Updated title", "description": "Updated description"}
+    data = {"label": "Updated label", "short_story": "Updated story"}
     response = client.put(
         f"{settings.API_V1_STR}/items/{uuid.uuid4()}",
         headers=superuser_token_headers,
@@ -114,8 +196,8 @@ def test_update_item_not_found(
 def test_update_item_not_enough_permissions(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
-    data = {"title": "Updated title", "description": "Updated description"}
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
+    data = {"label": "Updated label", "short_story": "Updated story"}
     response = client.put(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=normal_user_token_headers,
@@ -129,7 +211,7 @@ def test_update_item_not_enough_permissions(
 def test_delete_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
     response = client.delete(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=superuser_token_headers,
@@ -154,7 +236,7 @@ def test_delete_item_not_found(
 def test_delete_item_not_enough_permissions(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
+    item = create_random_pmot(db, create_random_user(db).id, date(2024, 1, 1))
     response = client.delete(
         f"{settings.API_V1_STR}/items/{item.id}",
         headers=normal_user_token_headers,
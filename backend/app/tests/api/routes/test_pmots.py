@@ -0,0 +1,233 @@
+import json
+import uuid
+from datetime import date
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import anchor_graph, crud, related
+from app.core.config import settings
+from app.models import PMOT, PMOTDetailsCreate, PMOTDetailsUpdate
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user, create_random_user_with_headers
+from app.tests.utils.utils import random_lower_string
+
+
+def test_search_pmots_by_strength_and_anchor(client: TestClient, db: Session) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    tagged = {
+        1: (["Courage", "hope"], ["Grandma"]),
+        2: (["courage"], ["Home", "grandma"]),
+        3: (["patience"], ["home"]),
+    }
+    pmots = {}
+    for day, (strengths, anchors) in tagged.items():
+        pmot = create_random_pmot(db, user.id, date(2024, 1, day))
+        details_in = PMOTDetailsCreate(
+            det_story=random_lower_string(), strengths=strengths, anchors=anchors
+        )
+        crud.create_pmot_details(session=db, details_in=details_in, pmot_id=pmot.id)
+        pmots[day] = str(pmot.id)
+    url = f"{settings.API_V1_STR}/pmots/search"
+
+    r = client.get(url, headers=headers, params={"strength": ["courage", "HOPE"]})
+    assert r.status_code == 200
+    content = r.json()
+    assert [p["id"] for p in content["data"]] == [pmots[1]]
+    assert content["strength_facets"] == {"courage": 1, "hope": 1}
+
+    r = client.get(
+        url,
+        headers=headers,
+        params={"strength": ["hope", "patience"], "strength_mode": "any"},
+    )
+    assert [p["id"] for p in r.json()["data"]] == [pmots[3], pmots[1]]
+
+    r = client.get(
+        url, headers=headers, params={"strength": "courage", "anchor": "home"}
+    )
+    content = r.json()
+    assert content["count"] == 1
+    assert [p["id"] for p in content["data"]] == [pmots[2]]
+    assert content["anchor_facets"] == {"grandma": 1, "home": 1}
+
+    r = client.get(url, headers=headers)
+    content = r.json()
+    assert content["count"] == 3
+    assert content["strength_facets"] == {"courage": 2, "hope": 1, "patience": 1}
+    assert content["anchor_facets"] == {"grandma": 2, "home": 2}
+
+    r = client.get(url, headers=headers, params={"strength": "never used"})
+    assert r.json()["count"] == 0
+
+
+def test_pmot_graph_follows_shared_anchors(client: TestClient, db: Session) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    # A chain: 1 -grandma- 2 -home- 3 -school- 4
+    anchored = {
+        1: ["grandma"],
+        2: ["grandma", "home"],
+        3: ["home", "school"],
+        4: ["school"],
+    }
+    pmots = {}
+    details = {}
+    for day, anchors in anchored.items():
+        pmot = create_random_pmot(db, user.id, date(2024, 2, day))
+        details_in = PMOTDetailsCreate(det_story=random_lower_string(), anchors=anchors)
+        details[day] = crud.create_pmot_details(
+            session=db, details_in=details_in, pmot_id=pmot.id
+        )
+        pmots[day] = str(pmot.id)
+    url = f"{settings.API_V1_STR}/pmots/graph"
+
+    r = client.get(url, headers=headers, params={"pmot_id": pmots[1], "hops": 2})
+    assert r.status_code == 200
+    content = r.json()
+    assert [(m["id"], m["hop"]) for m in content["moments"]] == [
+        (pmots[1], 0),
+        (pmots[2], 1),
+        (pmots[3], 2),
+    ]
+    assert content["anchors"] == ["grandma", "home", "school"]
+
+    r = client.get(url, headers=headers, params={"anchor": "School", "hops": 1})
+    assert [(m["id"], m["hop"]) for m in r.json()["moments"]] == [
+        (pmots[3], 1),
+        (pmots[4], 1),
+    ]
+
+    # Cutting the home link splits the chain
+    crud.update_pmot_details(
+        session=db,
+        db_pmot_details=details[3],
+        pmot_details_in=PMOTDetailsUpdate(anchors=["school"]),
+    )
+    r = client.get(url, headers=headers, params={"pmot_id": pmots[1], "hops": 5})
+    assert [m["id"] for m in r.json()["moments"]] == [pmots[1], pmots[2]]
+
+    # Deleting a moment drops it from the stored graph
+    db.delete(details[2])
+    db.delete(db.get(PMOT, uuid.UUID(pmots[2])))
+    db.commit()
+    stored = anchor_graph.load(db, user.id)
+    assert uuid.UUID(pmots[2]) not in anchor_graph.to_uuids(stored.moments)
+    r = client.get(url, headers=headers, params={"anchor": "grandma", "hops": 5})
+    assert [m["id"] for m in r.json()["moments"]] == [pmots[1]]
+
+    r = client.get(url, headers=headers, params={"anchor": "never used"})
+    assert r.status_code == 404
+    r = client.get(url, headers=headers)
+    assert r.status_code == 400
+
+
+def test_timeline_streams_pmots_in_event_date_order(
+    client: TestClient, db: Session
+) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    days = [date(2021, 5, 1), date(2019, 1, 1), date(2020, 7, 4), date(2020, 7, 4)]
+    pmots = [create_random_pmot(db, user.id, day) for day in days]
+    url = f"{settings.API_V1_STR}/pmots/timeline"
+
+    with (
+        patch("app.core.config.settings.TIMELINE_FETCH_SIZE", 2),
+        client.stream("GET", url, headers=headers) as r,
+    ):
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in r.iter_lines()]
+    same_day = sorted(str(p.id) for p in pmots[2:])
+    assert [line["id"] for line in lines] == [
+        str(pmots[1].id),
+        *same_day,
+        str(pmots[0].id),
+    ]
+    assert lines[0]["event_date"] == "2019-01-01"
+
+    r = client.get(
+        url, headers=headers, params={"from": "2020-01-01", "to": "2020-12-31"}
+    )
+    assert [json.loads(line)["id"] for line in r.text.splitlines()] == same_day
+
+    r = client.get(
+        url, headers=headers, params={"from": "2021-01-01", "to": "2020-01-01"}
+    )
+    assert r.status_code == 400
+
+
+def test_related_pmots_are_ranked_by_story_similarity(
+    client: TestClient, db: Session
+) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    pmots = [create_random_pmot(db, user.id, date(2024, 4, day)) for day in (1, 2, 3)]
+    stories = [
+        "Grandma taught me to bake bread in her kitchen",
+        "Baking bread with grandma on a rainy afternoon",
+        "Missed the train to the office again",
+    ]
+    for pmot, story in zip(pmots, stories, strict=True):
+        pmot.short_story = story
+        db.add(pmot)
+    db.commit()
+    url = f"{settings.API_V1_STR}/pmots/{pmots[0].id}/related"
+
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    data = r.json()["data"]
+    assert [p["id"] for p in data] == [str(pmots[1].id)]
+    assert 0 < data[0]["score"] < 1
+
+    # Later edits are patched into the index
+    pmots[2].short_story = "Grandma walked me to the train"
+    db.add(pmots[2])
+    db.commit()
+    r = client.get(url, headers=headers)
+    assert [p["id"] for p in r.json()["data"]] == [str(pmots[1].id), str(pmots[2].id)]
+
+    # A moved PMOT leaves the old owner's segment for the new owner's
+    other = create_random_user(db)
+    related.build(db, other.id)
+    pmots[1].owner_id = other.id
+    db.add(pmots[1])
+    db.commit()
+    r = client.get(url, headers=headers)
+    assert [p["id"] for p in r.json()["data"]] == [str(pmots[2].id)]
+    segment = related.related_index.get(other.id)
+    assert segment is not None
+    assert segment.ids.tolist() == [pmots[1].id.bytes.rstrip(b"\0")]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/pmots/{uuid.uuid4()}/related", headers=headers
+    )
+    assert r.status_code == 404
+
+
+def test_duplicates_groups_copied_stories(client: TestClient, db: Session) -> None:
+    user, headers = create_random_user_with_headers(client=client, db=db)
+    story = (
+        "We drove to the coast before sunrise and watched the fishing boats come "
+        "in, then ate fried fish on the pier while the gulls fought over scraps."
+    )
+    pmots = [create_random_pmot(db, user.id, date(2024, 5, day)) for day in (1, 2, 3)]
+    for pmot, short_story in zip(
+        pmots, [story, story.replace("gulls", "seagulls"), "A quiet day"], strict=True
+    ):
+        pmot.short_story = short_story
+        db.add(pmot)
+    db.commit()
+    url = f"{settings.API_V1_STR}/pmots/duplicates"
+
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    groups = r.json()["data"]
+    assert len(groups) == 1
+    assert {p["id"] for p in groups[0]["data"]} == {str(pmots[0].id), str(pmots[1].id)}
+    assert 0.8 <= groups[0]["similarity"] < 1
+
+    # Editing a copy away removes it from the group
+    pmots[1].short_story = "Something else entirely happened that day"
+    db.add(pmots[1])
+    db.commit()
+    r = client.get(url, headers=headers)
+    assert r.json()["data"] == []
@@ -7,7 +7,7 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
+from app.models import PMOT, PMOTDetails, User
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -17,7 +17,10 @@ def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         init_db(session)
         yield session
-        statement = delete(Item)
+        # pmotdetails restricts deleting its PMOT
+        statement = delete(PMOTDetails)
+        session.execute(statement)
+        statement = delete(PMOT)
         session.execute(statement)
         statement = delete(User)
         session.execute(statement)
@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+from app.core.db import connect_args, engine
+
+
+def test_connect_args_set_prepare_threshold_and_statement_timeout() -> None:
+    with (
+        patch("app.core.config.settings.DB_PREPARE_THRESHOLD", 2),
+        patch("app.core.config.settings.DB_STATEMENT_TIMEOUT_MS", 5000),
+    ):
+        assert connect_args() == {
+            "prepare_threshold": 2,
+            "options": "-c statement_timeout=5000",
+        }
+
+
+def test_connect_args_without_statement_timeout() -> None:
+    with (
+        patch("app.core.config.settings.DB_PREPARE_THRESHOLD", None),
+        patch("app.core.config.settings.DB_STATEMENT_TIMEOUT_MS", 0),
+    ):
+        assert connect_args() == {"prepare_threshold": None}
+
+
+def test_engine_uses_pool_settings() -> None:
+    assert engine.pool.size() == 5  # type: ignore[attr-defined]
+    assert engine.pool._pre_ping  # type: ignore[attr-defined]
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from app.core.empathy_matrix import DTYPE, SHAPE, decode, decode_many, encode
+
+
+def test_encode_round_trips_through_a_view() -> None:
+    matrix = np.arange(np.prod(SHAPE), dtype=np.float64).reshape(SHAPE)
+    dtype, buffer = encode(matrix)
+    assert dtype == DTYPE.str
+    assert len(buffer) == matrix.size * DTYPE.itemsize
+    decoded = decode(dtype, buffer)
+    assert not decoded.flags.owndata
+    np.testing.assert_array_equal(decoded, matrix)
+
+
+def test_decode_many_stacks_matrices() -> None:
+    buffers = [encode(np.full(SHAPE, float(i)))[1] for i in range(3)]
+    stacked = decode_many(DTYPE.str, buffers)
+    assert stacked.shape == (3, *SHAPE)
+    assert stacked[:, 0, 0].tolist() == [0.0, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("matrix", [[[1.0, 2.0]], np.full(SHAPE, np.nan)])
+def test_encode_rejects_bad_matrices(matrix: object) -> None:
+    with pytest.raises(ValueError):
+        encode(matrix)  # type: ignore[arg-type]
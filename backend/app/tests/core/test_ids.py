@@ -0,0 +1,23 @@
+import time
+import uuid
+
+from app.core.ids import uuid7, uuid7_timestamp
+
+
+def test_uuid7_has_version_and_variant() -> None:
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_embeds_the_current_time() -> None:
+    before = time.time()
+    value = uuid7()
+    after = time.time()
+    assert before - 0.001 <= uuid7_timestamp(value) <= after + 0.001
+
+
+def test_uuid7_is_strictly_increasing() -> None:
+    values = [uuid7() for _ in range(20000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from app.core import minhash
+
+STORY = (
+    "We drove to the coast before sunrise and watched the fishing boats come "
+    "in, then ate fried fish on the pier while the gulls fought over scraps."
+)
+
+
+def test_signature_is_stable_and_round_trips() -> None:
+    values = minhash.signature(STORY)
+    assert values.shape == (minhash.PERMUTATIONS,)
+    assert values.dtype == minhash.DTYPE
+    np.testing.assert_array_equal(minhash.signature(STORY.upper()), values)
+    np.testing.assert_array_equal(minhash.decode(minhash.encode(values)), values)
+    assert len(minhash.buckets(values)) == minhash.BANDS
+
+
+def test_near_duplicates_share_buckets_and_others_do_not() -> None:
+    original = minhash.signature(STORY)
+    copy = minhash.signature(STORY.replace("gulls", "seagulls") + " ")
+    other = minhash.signature("A quiet afternoon reading in the library")
+
+    assert minhash.similarity(original, copy) > 0.8
+    assert minhash.similarity(original, other) < 0.2
+    assert set(minhash.buckets(original)) & set(minhash.buckets(copy))
+    assert not set(minhash.buckets(original)) & set(minhash.buckets(other))
+    np.testing.assert_allclose(
+        minhash.similarity(np.stack([original, original]), np.stack([copy, other])),
+        [minhash.similarity(original, copy), minhash.similarity(original, other)],
+    )
+
+
+def test_short_texts_still_have_a_signature() -> None:
+    assert minhash.signature("").shape == (minhash.PERMUTATIONS,)
+    assert minhash.similarity(minhash.signature("hi"), minhash.signature("HI")) == 1.0
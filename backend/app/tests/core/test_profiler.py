@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from app.core.profiler import CpuSampler, MemoryTracer, ProfilerBusyError
+from app.core.timing import endpoint_routes
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_cpu_sampler_attributes_samples_to_routes() -> None:
+    endpoint_routes[_spin.__code__] = "GET /spin"
+    stop = threading.Event()
+    thread = threading.Thread(target=_spin, args=(stop,))
+    thread.start()
+    sampler = CpuSampler(interval=0.002)
+    sampler.start()
+    time.sleep(0.2)
+    profile = sampler.stop()
+    stop.set()
+    thread.join()
+
+    assert any(
+        line.startswith("GET /spin;") for line in profile.collapsed().splitlines()
+    )
+    speedscope = profile.speedscope()
+    assert "GET /spin" in [p["name"] for p in speedscope["profiles"]]
+
+
+def test_only_one_profile_at_a_time() -> None:
+    sampler = CpuSampler(interval=0.01)
+    sampler.start()
+    try:
+        with pytest.raises(ProfilerBusyError):
+            MemoryTracer().start()
+    finally:
+        sampler.stop()
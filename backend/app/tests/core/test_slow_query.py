@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.slow_query import SlowQueryLog, normalize, param_shape
+
+
+def test_normalize_strips_literals_and_bind_values() -> None:
+    statement = """SELECT item.id FROM item
+        WHERE item.owner_id = %(owner_id_1)s AND item.title = 'foo'
+        AND item.id IN (%(id_1)s, %(id_2)s, %(id_3)s) LIMIT 100"""
+    assert normalize(statement) == (
+        "SELECT item.id FROM item WHERE item.owner_id = ? AND item.title = ? "
+        "AND item.id IN (...) LIMIT ?"
+    )
+
+
+def test_normalize_groups_statements_that_differ_only_in_values() -> None:
+    assert normalize("SELECT * FROM user WHERE email = 'a@example.com'") == normalize(
+        "SELECT * FROM user WHERE email = 'b@example.com'"
+    )
+
+
+def test_param_shape() -> None:
+    assert param_shape({"email": "a@example.com", "limit": 1}, False) == (
+        "{email: str, limit: int}"
+    )
+    assert param_shape([(1, "a"), (2, "b")], True) == "2 x (int, str)"
+
+
+def test_top_orders_by_total_time() -> None:
+    log = SlowQueryLog(threshold_ms=0, explain=False, max_fingerprints=2)
+
+    class Conn:
+        class dialect:
+            name = "postgresql"
+
+    log.record(Conn, None, "SELECT 1 FROM a", {}, False, 0.5)
+    log.record(Conn, None, "SELECT 1 FROM b", {}, False, 0.2)
+    log.record(Conn, None, "SELECT 1 FROM b", {}, False, 0.4)
+    log.record(Conn, None, "SELECT 1 FROM c", {}, False, 0.1)
+
+    top = log.top(10)
+    assert [stats.statement for stats in top] == [
+        "SELECT ? FROM b",
+        "SELECT ? FROM c",
+    ]
+    assert top[0].calls == 2
+
+
+def test_slow_query_on_async_engine_is_explained() -> None:
+    log = SlowQueryLog(threshold_ms=0, explain=True, max_fingerprints=10)
+    sync_engine = async_engine.sync_engine
+    log.instrument(sync_engine)
+
+    async def main() -> int:
+        try:
+            async with async_engine.connect() as conn:
+                result = await conn.execute(text("SELECT 42 AS answer"))
+                return result.scalar_one()
+        finally:
+            await async_engine.dispose()
+
+    try:
+        assert asyncio.run(main()) == 42
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", log._before_cursor_execute)
+        event.remove(sync_engine, "after_cursor_execute", log._after_cursor_execute)
+        event.remove(sync_engine, "handle_error", log._handle_error)
+
+    (stats,) = [s for s in log.top(10) if s.statement == "SELECT ? AS answer"]
+    assert stats.plan and "Result" in stats.plan
+
+
+def test_failed_statement_does_not_leave_its_start_behind() -> None:
+    log = SlowQueryLog(threshold_ms=0, explain=False, max_fingerprints=10)
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    log.instrument(engine)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(DBAPIError):
+                conn.execute(text("SELECT missing_column"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert conn.info["slow_query_start"] == []
+    finally:
+        engine.dispose()
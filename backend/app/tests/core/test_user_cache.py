@@ -0,0 +1,43 @@
+import uuid
+from unittest.mock import patch
+
+from app.core.user_cache import UserCache
+from app.models import User
+
+
+def make_user() -> User:
+    return User(id=uuid.uuid4(), email="cache@example.com", hashed_password="x")
+
+
+def test_get_returns_cached_values_until_invalidated() -> None:
+    cache = UserCache(ttl=60, max_size=10)
+    user = make_user()
+    assert cache.get(user.id) is None
+    cache.set(user)
+    values = cache.get(user.id)
+    assert values is not None
+    assert values["email"] == "cache@example.com"
+    assert values["token_version"] == 0
+    cache.invalidate(user.id)
+    assert cache.get(user.id) is None
+
+
+def test_entries_expire_after_ttl() -> None:
+    cache = UserCache(ttl=30, max_size=10)
+    user = make_user()
+    with patch("app.core.user_cache.time.monotonic", return_value=1000.0):
+        cache.set(user)
+    with patch("app.core.user_cache.time.monotonic", return_value=1029.0):
+        assert cache.get(user.id) is not None
+    with patch("app.core.user_cache.time.monotonic", return_value=1030.0):
+        assert cache.get(user.id) is None
+
+
+def test_oldest_entry_is_evicted_when_full() -> None:
+    cache = UserCache(ttl=60, max_size=2)
+    users = [make_user() for _ in range(3)]
+    for user in users:
+        cache.set(user)
+    assert cache.get(users[0].id) is None
+    assert cache.get(users[1].id) is not None
+    assert cache.get(users[2].id) is not None
@@ -0,0 +1,57 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import async_crud
+from app.core.db import async_engine
+from app.models import UserCreate, UserUpdate
+from app.tests.utils.utils import random_email, random_lower_string
+
+T = TypeVar("T")
+
+
+def run(test: Callable[[AsyncSession], Awaitable[T]]) -> T:
+    async def main() -> T:
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                return await test(session)
+        finally:
+            # Pooled connections are bound to this test's event loop
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_create_and_authenticate_user() -> None:
+    email = random_email()
+    password = random_lower_string()
+
+    async def test(session: AsyncSession) -> None:
+        user_in = UserCreate(email=email, password=password)
+        user = await async_crud.create_user(session=session, user_create=user_in)
+        authenticated_user = await async_crud.authenticate(
+            session=session, email=email, password=password
+        )
+        assert authenticated_user
+        assert authenticated_user.id == user.id
+        assert not await async_crud.authenticate(
+            session=session, email=email, password=random_lower_string()
+        )
+
+    run(test)
+
+
+def test_update_user_password_bumps_token_version() -> None:
+    async def test(session: AsyncSession) -> None:
+        user_in = UserCreate(email=random_email(), password=random_lower_string())
+        user = await async_crud.create_user(session=session, user_create=user_in)
+        assert user.token_version == 0
+        user_update = UserUpdate(password=random_lower_string())
+        user = await async_crud.update_user(
+            session=session, db_user=user, user_in=user_update
+        )
+        assert user.token_version == 1
+
+    run(test)
@@ -0,0 +1,34 @@
+from datetime import date
+
+from sqlmodel import Session
+
+from app import crud
+from app.models import PMOTDetailsCreate, PMOTDetailsUpdate, UserCreate
+from app.tags import search
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def test_update_pmot_details_replaces_only_given_tags(db: Session) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    pmot = create_random_pmot(db, user.id, date(2024, 2, 1))
+    details = crud.create_pmot_details(
+        session=db,
+        details_in=PMOTDetailsCreate(
+            det_story=random_lower_string(), strengths=["hope"], anchors=["home"]
+        ),
+        pmot_id=pmot.id,
+    )
+    crud.update_pmot_details(
+        session=db,
+        db_pmot_details=details,
+        pmot_details_in=PMOTDetailsUpdate(strengths=["courage"]),
+    )
+
+    _, count, strengths, anchors = search(db, user.id)
+    assert count == 1
+    assert strengths == {"courage": 1}
+    assert anchors == {"home": 1}
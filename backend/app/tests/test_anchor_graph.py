@@ -0,0 +1,94 @@
+import uuid
+
+import numpy as np
+
+from app.anchor_graph import Adjacency, _ids, to_uuids
+
+
+def _graph(edges: list[tuple[uuid.UUID, uuid.UUID]]) -> Adjacency:
+    return Adjacency.from_edges(_ids(m for m, _ in edges), _ids(a for _, a in edges))
+
+
+def test_ids_round_trip_with_trailing_zero_bytes() -> None:
+    ids = [uuid.UUID(int=1 << 120), uuid.uuid4(), uuid.UUID(int=0)]
+    assert to_uuids(_ids(ids)) == ids
+
+
+def test_neighbourhood_counts_hops_through_shared_anchors() -> None:
+    m = [uuid.uuid4() for _ in range(4)]
+    a = [uuid.uuid4() for _ in range(3)]
+    # A chain: m0 -a0- m1 -a1- m2 -a2- m3
+    graph = _graph(
+        [
+            (m[0], a[0]),
+            (m[1], a[0]),
+            (m[1], a[1]),
+            (m[2], a[1]),
+            (m[2], a[2]),
+            (m[3], a[2]),
+        ]
+    )
+
+    reached, anchors = graph.neighbourhood(pmot_id=m[0], hops=2, max_moments=10)
+    assert dict(reached) == {m[0]: 0, m[1]: 1, m[2]: 2}
+    assert [hop for _, hop in reached] == [0, 1, 2]
+    assert set(anchors) == set(a)
+
+    reached, _ = graph.neighbourhood(anchor_id=a[2], hops=1, max_moments=10)
+    assert dict(reached) == {m[2]: 1, m[3]: 1}
+
+    reached, _ = graph.neighbourhood(pmot_id=m[0], hops=5, max_moments=2)
+    assert len(reached) == 2
+
+    reached, anchors = graph.neighbourhood(pmot_id=uuid.uuid4(), hops=3, max_moments=10)
+    assert reached == [] and anchors == []
+
+
+def test_with_moment_replaces_edges_and_survives_storage() -> None:
+    m = [uuid.uuid4() for _ in range(3)]
+    a = [uuid.uuid4() for _ in range(2)]
+    graph = _graph([(m[0], a[0]), (m[1], a[0]), (m[1], a[1]), (m[2], a[1])])
+
+    graph = graph.with_moment(m[1], [a[1]])
+    stored = Adjacency(
+        **{
+            name: np.frombuffer(buffer, dtype=getattr(graph, name).dtype)
+            for name, buffer in graph.columns().items()
+        }
+    )
+    reached, _ = stored.neighbourhood(pmot_id=m[0], hops=5, max_moments=10)
+    assert dict(reached) == {m[0]: 0}
+    reached, _ = stored.neighbourhood(pmot_id=m[2], hops=5, max_moments=10)
+    assert dict(reached) == {m[1]: 1, m[2]: 0}
+
+    first = _graph([]).with_moment(m[0], [a[0]])
+    reached, _ = first.neighbourhood(anchor_id=a[0], hops=1, max_moments=10)
+    assert reached == [(m[0], 1)]
+
+
+def test_with_moment_patches_rows_like_a_rebuild() -> None:
+    rng = np.random.default_rng(7)
+    m = [uuid.uuid4() for _ in range(12)]
+    a = [uuid.uuid4() for _ in range(6)]
+    edges: dict[uuid.UUID, list[uuid.UUID]] = {}
+    graph = _graph([])
+    for _ in range(200):
+        moment = m[rng.integers(len(m))]
+        edges[moment] = [
+            a[i] for i in rng.choice(len(a), rng.integers(0, 4), replace=False)
+        ]
+        graph = graph.with_moment(moment, edges[moment])
+        rebuilt = _graph(
+            [(pmot, anchor) for pmot, anchors in edges.items() for anchor in anchors]
+        )
+        assert np.array_equal(graph.moments, rebuilt.moments)
+        assert sorted(zip(*map(to_uuids, graph.edges()), strict=True)) == sorted(
+            zip(*map(to_uuids, rebuilt.edges()), strict=True)
+        )
+        degrees = np.diff(graph.moment_indptr)
+        rows = np.repeat(np.arange(graph.moments.size), degrees)
+        order = np.lexsort((rows, graph.moment_anchors))
+        assert np.array_equal(graph.anchor_moments, rows[order])
+
+    deleted = graph.without_moments(list(edges))
+    assert deleted.moments.size == 0 and deleted.anchor_moments.size == 0
@@ -0,0 +1,37 @@
+from datetime import date
+from unittest.mock import patch
+
+from sqlmodel import Session, col, delete, select
+
+from app.core.db import engine
+from app.duplicates import possible_duplicates, run
+from app.models import PMOT, PMOTBand, PMOTSignature
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user
+
+
+def test_run_resigns_every_pmot_in_worker_processes(db: Session) -> None:
+    user = create_random_user(db)
+    story = (
+        "Our first apartment had a leaking roof and a landlord who never called back"
+    )
+    pmots = [create_random_pmot(db, user.id, date(2022, 1, day)) for day in (1, 2, 3)]
+    for pmot in pmots[:2]:
+        pmot.short_story = story
+        db.add(pmot)
+    db.commit()
+    # As if the stories were written before signatures existed
+    ids = [pmot.id for pmot in pmots]
+    db.exec(delete(PMOTBand).where(col(PMOTBand.pmot_id).in_(ids)))  # type: ignore
+    db.exec(delete(PMOTSignature).where(col(PMOTSignature.pmot_id).in_(ids)))  # type: ignore
+    db.commit()
+    assert possible_duplicates(db, user.id, 0.8) == []
+
+    total = len(db.exec(select(PMOT.id)).all())
+    with patch("app.core.config.settings.DUPLICATES_BATCH_SIZE", 2):
+        signed, groups = run(0.8, engine, workers=2)
+
+    assert signed == total
+    assert groups >= 1
+    db.expire_all()
+    assert possible_duplicates(db, user.id, 0.8) == [(sorted(ids[:2]), 1.0)]
@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from sqlmodel import Session, col, select
+
+from app.core.db import engine
+from app.email_campaigns import CampaignTemplate, run_campaign
+from app.models import EmailCampaign, User
+from app.tests.utils.smtp import smtp_sink
+
+
+def test_campaign_template_substitutes_escaped_fields() -> None:
+    template = CampaignTemplate("<p>Scheduled maintenance</p>")
+    html_content = template.render(recipient_name="Ann <3", email="ann@example.com")
+    assert "Hi Ann &lt;3," in html_content
+    assert "ann@example.com" in html_content
+    assert "<p>Scheduled maintenance</p>" in html_content
+    assert "\x00" not in html_content
+
+
+def test_campaign_sends_once_to_every_active_user(db: Session) -> None:
+    campaign = EmailCampaign(subject="News", message="<p>News</p>")
+    db.add(campaign)
+    db.commit()
+    active = db.exec(select(User.email).where(col(User.is_active).is_(True))).all()
+
+    with (
+        smtp_sink() as sink,
+        patch("app.core.config.settings.SMTP_HOST", "127.0.0.1"),
+        patch("app.core.config.settings.SMTP_PORT", sink.port),
+        patch("app.core.config.settings.SMTP_TLS", False),
+        patch("app.core.config.settings.SMTP_USER", None),
+        patch("app.core.config.settings.EMAIL_CAMPAIGN_BATCH_SIZE", 2),
+        patch("app.core.config.settings.EMAIL_CAMPAIGN_RATE_PER_SECOND", 1000),
+    ):
+        assert run_campaign(campaign.id, engine)
+        # A finished campaign is never sent again
+        assert not run_campaign(campaign.id, engine)
+
+    assert sorted(m["To"] for m in sink.messages) == sorted(active)
+    db.refresh(campaign)
+    assert campaign.status == "finished"
+    assert campaign.sent_count == len(active)
+    assert campaign.failed_count == 0
@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+from sqlmodel import Session, delete, select
+
+from app import crud
+from app.core.db import engine
+from app.email_outbox import OutboxSender
+from app.models import EmailOutbox
+from app.tests.utils.smtp import smtp_sink
+from app.tests.utils.utils import random_email
+
+
+def test_outbox_sends_pending_emails_over_one_connection(db: Session) -> None:
+    db.exec(delete(EmailOutbox))  # type: ignore
+    recipients = [random_email() for _ in range(3)]
+    for email_to in recipients:
+        crud.enqueue_email(
+            session=db, email_to=email_to, subject="Hi", html_content="<p>Hi</p>"
+        )
+    db.commit()
+
+    with (
+        smtp_sink() as sink,
+        patch("app.core.config.settings.SMTP_HOST", "127.0.0.1"),
+        patch("app.core.config.settings.SMTP_PORT", sink.port),
+        patch("app.core.config.settings.SMTP_TLS", False),
+        patch("app.core.config.settings.SMTP_USER", None),
+    ):
+        sender = OutboxSender(engine)
+        assert sender.drain() == 3
+        sender.connection.close()
+
+    assert sorted(m["To"] for m in sink.messages) == sorted(recipients)
+    assert sink.connections == 1
+    for email in db.exec(select(EmailOutbox)).all():
+        db.refresh(email)
+        assert email.status == "sent"
+        assert email.sent_at is not None
+        assert email.html_content is None
+
+
+def test_outbox_retries_with_backoff_when_smtp_is_down(db: Session) -> None:
+    db.exec(delete(EmailOutbox))  # type: ignore
+    email = crud.enqueue_email(
+        session=db, email_to=random_email(), subject="Hi", html_content="<p>Hi</p>"
+    )
+    db.commit()
+
+    with (
+        patch("app.core.config.settings.SMTP_HOST", "127.0.0.1"),
+        patch("app.core.config.settings.SMTP_PORT", 1),
+        patch("app.core.config.settings.SMTP_TLS", False),
+    ):
+        assert OutboxSender(engine).drain() == 0
+
+    db.refresh(email)
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.last_error
+    assert email.next_attempt_at > email.created_at
+
+
+def test_outbox_moves_on_after_a_refused_recipient(db: Session) -> None:
+    db.exec(delete(EmailOutbox))  # type: ignore
+    refused, *accepted = [random_email() for _ in range(3)]
+    for email_to in [refused, *accepted]:
+        crud.enqueue_email(
+            session=db, email_to=email_to, subject="Hi", html_content="<p>Hi</p>"
+        )
+    db.commit()
+
+    with (
+        smtp_sink() as sink,
+        patch("app.core.config.settings.SMTP_HOST", "127.0.0.1"),
+        patch("app.core.config.settings.SMTP_PORT", sink.port),
+        patch("app.core.config.settings.SMTP_TLS", False),
+        patch("app.core.config.settings.SMTP_USER", None),
+    ):
+        sink.refused.add(refused)
+        sender = OutboxSender(engine)
+        assert sender.drain() == 3
+        sender.connection.close()
+
+    assert sorted(m["To"] for m in sink.messages) == sorted(accepted)
+    assert sink.connections == 1
+    for email in db.exec(select(EmailOutbox)).all():
+        db.refresh(email)
+        if email.email_to == refused:
+            assert email.status == "pending"
+            assert email.attempts == 1
+            assert email.last_error
+        else:
+            assert email.status == "sent"
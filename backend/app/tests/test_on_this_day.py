@@ -0,0 +1,41 @@
+from datetime import date
+from unittest.mock import patch
+
+from sqlmodel import Session, col, select
+
+from app.core.db import engine
+from app.models import EmailOutbox, OnThisDayDelivery
+from app.on_this_day import calendar_days, run
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user
+
+
+def test_calendar_days_show_leap_days_on_the_28th() -> None:
+    assert calendar_days(date(2025, 11, 17)) == [1117]
+    assert calendar_days(date(2025, 2, 28)) == [228, 229]
+    assert calendar_days(date(2024, 2, 28)) == [228]
+
+
+def test_run_queues_one_email_per_user_and_day(db: Session) -> None:
+    users = [create_random_user(db) for _ in range(3)]
+    old = create_random_pmot(db, users[0].id, date(2015, 11, 17))
+    recent = create_random_pmot(db, users[0].id, date(2024, 11, 17))
+    create_random_pmot(db, users[0].id, date(2024, 11, 18))
+    create_random_pmot(db, users[1].id, date(2023, 11, 17))
+    # Today's own moments are not reminders
+    create_random_pmot(db, users[2].id, date(2025, 11, 17))
+    emails = [user.email for user in users]
+    statement = select(EmailOutbox).where(col(EmailOutbox.email_to).in_(emails))
+
+    with patch("app.core.config.settings.ON_THIS_DAY_BATCH_SIZE", 1):
+        run(date(2025, 11, 17), engine)
+        # A rerun of the same day queues nothing more
+        run(date(2025, 11, 17), engine)
+
+    queued = {email.email_to: email for email in db.exec(statement).all()}
+    assert sorted(queued) == sorted(emails[:2])
+    html_content = queued[users[0].email].html_content
+    assert old.label in html_content and "10 years ago" in html_content
+    assert recent.label in html_content and "1 year ago" in html_content
+    delivery = db.get(OnThisDayDelivery, (users[0].id, date(2025, 11, 17)))
+    assert delivery is not None and delivery.pmot_count == 2
@@ -0,0 +1,79 @@
+import threading
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+
+from app.related import RelatedIndex, Segment, read_segment, tokenize, write_segment
+
+STORIES = {
+    uuid.UUID(int=1 << 120): "Grandma taught me to bake bread in her kitchen",
+    uuid.uuid4(): "Baking bread with grandma on a rainy afternoon",
+    uuid.uuid4(): "First day at the new office, the commute was long",
+    uuid.uuid4(): "Missed the train to the office again",
+}
+
+
+def test_tokenize_ignore_case_digits_and_stop_words() -> None:
+    ids, counts = tokenize("The bread, THE Bread and 42 rolls")
+    assert ids.size == 2
+    assert sorted(counts.tolist()) == [1.0, 2.0]
+
+
+def test_similar_ranks_stories_sharing_rare_words() -> None:
+    segment = Segment.from_stories(STORIES.items())
+    ids = list(STORIES)
+
+    similar = segment.similar(STORIES[ids[0]], k=2, exclude=ids[0])
+    assert [pmot_id for pmot_id, _ in similar] == [ids[1]]
+    assert 0 < similar[0][1] < 1
+    assert {pmot_id for pmot_id, _ in segment.similar("office", k=5)} == set(ids[2:])
+    assert segment.similar("nothing in common", k=5) == []
+
+
+def test_changes_match_a_rebuild_and_survive_storage(tmp_path: Path) -> None:
+    ids = list(STORIES)
+    segment = Segment.from_stories(STORIES.items())
+    changes = {ids[1]: None, ids[2]: "Grandma visited the office"}
+    changed = segment.with_changes(changes)
+
+    path = tmp_path / "owner.segment"
+    write_segment(path, changed)
+    stored = read_segment(path)
+    assert stored is not None
+    expected = {**STORIES, **changes}
+    rebuilt = Segment.from_stories(
+        (pmot_id, text) for pmot_id, text in expected.items() if text is not None
+    )
+    assert dict(stored.similar("grandma bread", k=5)) == dict(
+        rebuilt.similar("grandma bread", k=5)
+    )
+    assert [pmot_id for pmot_id, _ in stored.similar("grandma", k=5)] == [
+        ids[2],
+        ids[0],
+    ]
+
+    write_segment(path, Segment.empty())
+    empty = read_segment(path)
+    assert empty is not None and empty.similar("grandma", k=5) == []
+    assert read_segment(tmp_path / "missing.segment") is None
+
+
+def test_update_during_a_rebuild_waits_for_it(tmp_path: Path) -> None:
+    index = RelatedIndex(str(tmp_path))
+    owner_id = uuid.uuid4()
+    ids = list(STORIES)
+    updater = threading.Thread(target=index.update, args=(owner_id, {ids[0]: None}))
+
+    def stories() -> Iterable[tuple[uuid.UUID, str]]:
+        # Committed after the read, so the rebuild misses the deletion
+        updater.start()
+        updater.join(timeout=0.2)
+        assert updater.is_alive()
+        return STORIES.items()
+
+    index.rebuild(owner_id, stories)
+    updater.join()
+    segment = index.get(owner_id)
+    assert segment is not None
+    assert ids[0].bytes not in segment.ids.tolist()
+    assert segment.ids.size == len(STORIES) - 1
@@ -0,0 +1,65 @@
+import numpy as np
+
+from app.trajectory import (
+    Trajectory,
+    TrajectoryCache,
+    change_points,
+    compute,
+    ewma,
+    rolling_mean,
+)
+
+
+def test_rolling_mean_uses_partial_windows_at_the_start() -> None:
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    assert rolling_mean(values, 3).tolist() == [1.0, 1.5, 2.0, 3.0, 4.0]
+
+
+def test_ewma_matches_the_recurrence_across_blocks() -> None:
+    values = np.random.default_rng(0).integers(-2, 3, 5000).astype(float)
+    alpha = 0.9
+    expected = np.empty_like(values)
+    expected[0] = values[0]
+    for i in range(1, values.size):
+        expected[i] = (1 - alpha) * expected[i - 1] + alpha * values[i]
+    np.testing.assert_allclose(ewma(values, alpha), expected, atol=1e-9)
+
+
+def test_change_points_finds_mean_shifts() -> None:
+    rng = np.random.default_rng(1)
+    values = np.concatenate(
+        [rng.normal(-1, 0.3, 400), rng.normal(1, 0.3, 300), rng.normal(0, 0.3, 300)]
+    )
+    points = change_points(values, min_size=10, penalty=3.0, max_points=10)
+    assert [p.index for p in points] == [400, 700]
+    assert points[0].before < 0 < points[0].after
+
+
+def test_change_points_ignores_a_flat_series() -> None:
+    assert change_points(np.zeros(100), min_size=10, penalty=3.0, max_points=10) == []
+
+
+def test_cache_evicts_by_bytes() -> None:
+    def trajectory(size: int) -> Trajectory:
+        return compute(
+            np.arange(size),
+            np.zeros(size),
+            window=3,
+            alpha=0.5,
+            min_segment=10,
+            penalty=3.0,
+            max_change_points=0,
+        )
+
+    small, large = trajectory(10), trajectory(100)
+    cache = TrajectoryCache(max_bytes=large.nbytes + small.nbytes)
+    cache.set(("a",), small)
+    cache.set(("b",), small)
+    cache.set(("c",), large)
+    assert cache.get(("a",)) is None
+    assert cache.get(("b",)) is small
+    assert cache.nbytes == large.nbytes + small.nbytes
+
+    cache.set(("d",), trajectory(1000))
+    assert cache.get(("d",)) is None
+    assert cache.get(("c",)) is large
@@ -0,0 +1,67 @@
+from datetime import date
+from unittest.mock import patch
+
+from sqlmodel import Session, col, func, select
+
+from app import crud
+from app.core.db import engine
+from app.models import PMOT, PMOTDetails, PMOTDetailsCreate, User
+from app.tests.utils.pmot import create_random_pmot
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+from app.user_purge import mark_deleted, purge_deleted_users, purge_user
+
+
+def test_purge_user_removes_owned_rows_in_chunks(db: Session) -> None:
+    user = create_random_user(db)
+    pmots = [create_random_pmot(db, user.id, date(2024, 1, day)) for day in range(1, 6)]
+    # Details restrict the deletion of their PMOT, so they must go first
+    for pmot in pmots[:2]:
+        crud.create_pmot_details(
+            session=db,
+            details_in=PMOTDetailsCreate(
+                det_story=random_lower_string(), anchors=["home"]
+            ),
+            pmot_id=pmot.id,
+        )
+    mark_deleted(user)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    pmot_ids = [pmot.id for pmot in pmots]
+
+    with (
+        patch("app.core.config.settings.USER_PURGE_CHUNK_SIZE", 2),
+        patch("app.core.config.settings.USER_PURGE_PAUSE_SECONDS", 0),
+    ):
+        assert purge_user(user_id, engine) == 7
+
+    db.expire_all()
+    assert db.get(User, user_id) is None
+    count = select(func.count()).select_from(PMOT).where(col(PMOT.owner_id) == user_id)
+    assert db.exec(count).one() == 0
+    count = (
+        select(func.count())
+        .select_from(PMOTDetails)
+        .where(col(PMOTDetails.pmot_id).in_(pmot_ids))
+    )
+    assert db.exec(count).one() == 0
+
+
+def test_purge_user_skips_users_not_marked_deleted(db: Session) -> None:
+    user = create_random_user(db)
+    assert purge_user(user.id, engine) == 0
+    db.expire_all()
+    assert db.get(User, user.id) is not None
+
+
+def test_purge_deleted_users_resumes_pending_purges(db: Session) -> None:
+    user = create_random_user(db)
+    mark_deleted(user)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    assert purge_deleted_users(engine) >= 1
+    db.expire_all()
+    assert db.get(User, user_id) is None
@@ -0,0 +1,26 @@
+import uuid
+from datetime import date
+
+from sqlmodel import Session
+
+from app.models import PMOT, EmotionImpact
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_pmot(
+    db: Session,
+    owner_id: uuid.UUID,
+    event_date: date,
+    emotional_impact: EmotionImpact = EmotionImpact.meh,
+) -> PMOT:
+    pmot = PMOT(
+        label=random_lower_string(),
+        short_story=random_lower_string(),
+        event_date=event_date,
+        emotional_impact=emotional_impact,
+        owner_id=owner_id,
+    )
+    db.add(pmot)
+    db.commit()
+    db.refresh(pmot)
+    return pmot
@@ -0,0 +1,68 @@
+import socketserver
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from email import message_from_bytes
+from email.message import Message
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib to deliver messages."""
+
+    server: "SMTPSink"
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        self.reply("220 sink ESMTP")
+        while line := self.rfile.readline():
+            command = line.decode().strip().split(" ", 1)[0].upper()
+            if command == "EHLO":
+                self.reply("250 sink")
+            elif command == "RCPT" and any(
+                address.encode() in line for address in self.server.refused
+            ):
+                self.reply("550 no such user")
+            elif command == "DATA":
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                data = bytearray()
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data += chunk[1:] if chunk.startswith(b"..") else chunk
+                self.server.messages.append(message_from_bytes(bytes(data)))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _SMTPSinkHandler)
+        self.messages: list[Message] = []
+        self.connections = 0
+        # Recipients whose RCPT TO is answered with a permanent failure
+        self.refused: set[str] = set()
+
+    @property
+    def port(self) -> int:
+        return int(self.server_address[1])
+
+
+@contextmanager
+def smtp_sink() -> Generator[SMTPSink, None, None]:
+    """Run a local SMTP server that keeps every message it receives."""
+    sink = SMTPSink()
+    thread = threading.Thread(target=sink.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield sink
+    finally:
+        sink.shutdown()
+        sink.server_close()
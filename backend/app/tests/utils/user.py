@@ -27,6 +27,18 @@ def create_random_user(db: Session) -> User:
     return user
 
 
+def create_random_user_with_headers(
+    *, client: TestClient, db: Session
+) -> tuple[User, dict[str, str]]:
+    """Create a user and log them in, returning the user and their auth headers."""
+    email = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=email, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    return user, headers
+
+
 def authentication_token_from_email(
     *, client: TestClient, email: str, db: Session
 ) -> dict[str, str]:
@@ -0,0 +1,270 @@
+"""Emotional trajectory of a user's PMOTs over time.
+
+A user's ``(event_date, emotional_impact)`` series is read as two numeric
+columns (days since the epoch and a score from -2 to 2) straight into NumPy
+arrays, without building ORM objects. Smoothing and change-point detection
+are whole-array operations, so a history of 100k events takes milliseconds.
+
+Results are cached per worker, keyed on ``User.pmot_version``, which the
+flush listeners in ``app.analytics`` bump whenever the series changes, and
+bounded by the bytes of their arrays. ``user_trajectory`` reads the series
+on the request's session and runs the computation, tens of milliseconds for
+the longest histories, on a worker thread so it never blocks the event loop.
+"""
+
+import math
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+from sqlalchemy import Float, Integer, cast
+from sqlmodel import Session, case, col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.db import run_sync
+from app.core.metrics import record_cache
+from app.models import PMOT, EmotionImpact, User
+
+SCORES = {
+    EmotionImpact.xtreme_sad: -2.0,
+    EmotionImpact.sad: -1.0,
+    EmotionImpact.meh: 0.0,
+    EmotionImpact.happy: 1.0,
+    EmotionImpact.xtreme_happy: 2.0,
+}
+
+_EPOCH = date(1970, 1, 1)
+
+
+@dataclass
+class ChangePoint:
+    index: int
+    before: float
+    after: float
+
+
+@dataclass
+class Trajectory:
+    days: np.ndarray
+    scores: np.ndarray
+    rolling_mean: np.ndarray
+    ewma: np.ndarray
+    change_points: list[ChangePoint] = field(default_factory=list)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.days, self.scores, self.rolling_mean, self.ewma)
+        return sum(array.nbytes for array in arrays)
+
+
+def load_series(session: Session, owner_id: uuid.UUID) -> tuple[np.ndarray, np.ndarray]:
+    """Event days (int64, days since 1970-01-01) and scores (float64) in date order."""
+    # Plain integer and float columns come back from the driver as is
+    day = cast(func.floor(func.extract("epoch", col(PMOT.event_date)) / 86400), Integer)
+    score = cast(
+        case(*((col(PMOT.emotional_impact) == k, v) for k, v in SCORES.items())), Float
+    )
+    statement = (
+        select(day, score)
+        .where(col(PMOT.owner_id) == owner_id, col(PMOT.emotional_impact).is_not(None))
+        .order_by(col(PMOT.event_date), col(PMOT.id))
+    )
+    rows = session.connection().execute(statement).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    columns = np.array(rows, dtype=np.float64)
+    return columns[:, 0].astype(np.int64), columns[:, 1]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each value and up to ``window - 1`` values before it."""
+    if values.size == 0:
+        return values.copy()
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    ends = np.arange(1, values.size + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Exponentially weighted moving average ``y[t] = (1 - alpha) * y[t-1] +
+    alpha * x[t]`` with ``y[0] = x[0]``, evaluated in closed form over blocks
+    short enough that the decay factors stay within float64 range.
+    """
+    if values.size == 0 or alpha >= 1:
+        return values.astype(np.float64, copy=True)
+    decay = 1.0 - alpha
+    block = max(1, int(200 * math.log(10) / -math.log(decay)))
+    out = np.empty(values.size, dtype=np.float64)
+    previous = values[0]
+    for start in range(0, values.size, block):
+        x = values[start : start + block]
+        powers = decay ** np.arange(1, x.size + 1)
+        # y[k] = decay^(k+1) * previous + alpha * sum_j decay^(k-j) * x[j]
+        weighted = np.cumsum(x / powers)
+        out[start : start + x.size] = powers * (previous + alpha * weighted)
+        previous = out[start + x.size - 1]
+    return out
+
+
+def change_points(
+    values: np.ndarray, min_size: int, penalty: float, max_points: int
+) -> list[ChangePoint]:
+    """
+    Shifts in the mean found by binary segmentation: split the segment where
+    the between-halves sum of squares is largest, if it beats ``penalty``
+    times the noise variance times ``log n``, and recurse into both halves.
+    """
+    n = values.size
+    if n < 2 * min_size:
+        return []
+    noise = np.median(np.abs(np.diff(values))) / (0.6745 * math.sqrt(2))
+    variance = noise**2 if noise > 0 else float(np.var(values))
+    if variance == 0:
+        return []
+    threshold = penalty * variance * math.log(n)
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+
+    def best_split(start: int, end: int) -> tuple[float, int]:
+        if end - start < 2 * min_size:
+            return 0.0, -1
+        splits = np.arange(start + min_size, end - min_size + 1)
+        left = splits - start
+        right = end - splits
+        left_mean = (sums[splits] - sums[start]) / left
+        right_mean = (sums[end] - sums[splits]) / right
+        gain = left * right / (end - start) * (left_mean - right_mean) ** 2
+        i = int(np.argmax(gain))
+        return float(gain[i]), int(splits[i])
+
+    # Each segment is scanned once, when it is created
+    candidates = {(0, n): best_split(0, n)}
+    found: list[int] = []
+    while candidates and len(found) < max_points:
+        (start, end), (gain, split) = max(candidates.items(), key=lambda c: c[1][0])
+        if gain <= threshold:
+            break
+        found.append(split)
+        del candidates[(start, end)]
+        candidates[(start, split)] = best_split(start, split)
+        candidates[(split, end)] = best_split(split, end)
+
+    bounds = [0, *sorted(found), n]
+    means = [
+        (sums[b] - sums[a]) / (b - a)
+        for a, b in zip(bounds[:-1], bounds[1:], strict=True)
+    ]
+    return [
+        ChangePoint(index=split, before=float(means[i]), after=float(means[i + 1]))
+        for i, split in enumerate(bounds[1:-1])
+    ]
+
+
+def compute(
+    days: np.ndarray,
+    scores: np.ndarray,
+    *,
+    window: int,
+    alpha: float,
+    min_segment: int,
+    penalty: float,
+    max_change_points: int,
+) -> Trajectory:
+    return Trajectory(
+        days=days,
+        scores=scores,
+        rolling_mean=rolling_mean(scores, window),
+        ewma=ewma(scores, alpha),
+        change_points=change_points(scores, min_segment, penalty, max_change_points),
+    )
+
+
+def to_date(day: int) -> date:
+    return date.fromordinal(_EPOCH.toordinal() + int(day))
+
+
+class TrajectoryCache:
+    """
+    Least recently used trajectories, keyed on user, PMOT version and
+    parameters, holding at most ``max_bytes`` of arrays. A trajectory larger
+    than that on its own is not cached.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: OrderedDict[tuple[object, ...], Trajectory] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[object, ...]) -> Trajectory | None:
+        with self._lock:
+            trajectory = self._entries.get(key)
+            if trajectory is not None:
+                self._entries.move_to_end(key)
+        record_cache("trajectory", trajectory is not None)
+        return trajectory
+
+    def set(self, key: tuple[object, ...], trajectory: Trajectory) -> None:
+        if trajectory.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[key] = trajectory
+            self.nbytes += trajectory.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+trajectory_cache = TrajectoryCache(max_bytes=settings.TRAJECTORY_CACHE_MAX_BYTES)
+
+
+def _pmot_version(session: Session, owner_id: uuid.UUID) -> int:
+    return session.exec(select(User.pmot_version).where(User.id == owner_id)).one()
+
+
+async def user_trajectory(
+    session: AsyncSession,
+    owner_id: uuid.UUID,
+    *,
+    window: int = 30,
+    alpha: float = 0.1,
+    min_segment: int = 10,
+    penalty: float = 3.0,
+    max_change_points: int = 10,
+) -> Trajectory:
+    version = await run_sync(
+        session, lambda sync_session: _pmot_version(sync_session, owner_id)
+    )
+    parameters = (window, alpha, min_segment, penalty, max_change_points)
+    key = (owner_id, version, *parameters)
+    trajectory = trajectory_cache.get(key)
+    if trajectory is None:
+        days, scores = await run_sync(
+            session, lambda sync_session: load_series(sync_session, owner_id)
+        )
+        trajectory = await run_in_threadpool(
+            compute,
+            days,
+            scores,
+            window=window,
+            alpha=alpha,
+            min_segment=min_segment,
+            penalty=penalty,
+            max_change_points=max_change_points,
+        )
+        trajectory_cache.set(key, trajectory)
+    return trajectory
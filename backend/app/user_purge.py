@@ -0,0 +1,120 @@
+"""Background removal of deleted accounts.
+
+Deleting an account only marks the user inactive and sets ``deleted_at``, so
+the request commits at once. ``purge_user`` then removes the user's rows in
+chunks of ``USER_PURGE_CHUNK_SIZE``, one short transaction each, and deletes
+the user row last. Each PMOT chunk takes its tags, signatures and other
+per-moment rows with it through ``ON DELETE CASCADE``; details are purged
+first, since their foreign key is ``ON DELETE RESTRICT``. Anything else still
+referencing the user goes with the user row, without being loaded into the
+ORM.
+
+Purges interrupted by a restart are picked up again by
+``purge_deleted_users``, which the app runs in a thread on startup.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Engine
+from sqlmodel import Session, col, delete, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import PMOT, PMOTDetails, User
+
+logger = logging.getLogger(__name__)
+
+
+def _user_pmot_ids(user_id: uuid.UUID) -> Any:
+    return select(PMOT.id).where(col(PMOT.owner_id) == user_id)
+
+
+# Tables purged chunk by chunk before the user row, children first, each
+# with the criterion selecting the user's rows
+OWNED_TABLES: list[tuple[Any, Callable[[uuid.UUID], Any]]] = [
+    (
+        PMOTDetails,
+        lambda user_id: col(PMOTDetails.pmot_id).in_(_user_pmot_ids(user_id)),
+    ),
+    (PMOT, lambda user_id: col(PMOT.owner_id) == user_id),
+]
+
+
+def _delete_chunk(
+    session: Session, model: Any, owned: Callable[[uuid.UUID], Any], user_id: uuid.UUID
+) -> int:
+    pk = col(model.__table__.primary_key.columns.values()[0])
+    chunk = select(pk).where(owned(user_id)).limit(settings.USER_PURGE_CHUNK_SIZE)
+    statement = (
+        delete(model).where(pk.in_(chunk)).execution_options(synchronize_session=False)
+    )
+    deleted = session.exec(statement).rowcount  # type: ignore
+    session.commit()
+    return deleted
+
+
+def purge_user(user_id: uuid.UUID, db_engine: Engine = engine) -> int:
+    """
+    Remove a user marked deleted and everything they own. Returns the number
+    of owned rows removed; a user that is not marked deleted is left alone.
+    """
+    removed = 0
+    with Session(db_engine) as session:
+        user = session.get(User, user_id)
+        if user is None or user.deleted_at is None:
+            return 0
+        for model, owned in OWNED_TABLES:
+            while True:
+                deleted = _delete_chunk(session, model, owned, user_id)
+                removed += deleted
+                if deleted < settings.USER_PURGE_CHUNK_SIZE:
+                    break
+                # Leave room for other writers between chunks
+                time.sleep(settings.USER_PURGE_PAUSE_SECONDS)
+        statement = (
+            delete(User)
+            .where(col(User.id) == user_id, col(User.deleted_at).is_not(None))
+            .execution_options(synchronize_session=False)
+        )
+        session.exec(statement)  # type: ignore
+        session.commit()
+    logger.info(f"Purged user {user_id} and {removed} owned rows")
+    return removed
+
+
+def purge_deleted_users(db_engine: Engine = engine) -> int:
+    """Finish the purge of every user marked deleted, oldest first."""
+    with Session(db_engine) as session:
+        statement = (
+            select(User.id)
+            .where(col(User.deleted_at).is_not(None))
+            .order_by(col(User.deleted_at))
+        )
+        user_ids = session.exec(statement).all()
+    for user_id in user_ids:
+        try:
+            purge_user(user_id, db_engine)
+        except Exception:
+            logger.exception(f"Purge of user {user_id} failed")
+    return len(user_ids)
+
+
+def start_pending_purges(db_engine: Engine = engine) -> threading.Thread:
+    thread = threading.Thread(
+        target=purge_deleted_users, args=(db_engine,), name="user-purge", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def mark_deleted(user: User) -> None:
+    """Deactivate ``user`` and revoke their tokens until the purge removes them."""
+    user.is_active = False
+    user.deleted_at = datetime.utcnow()
+    user.token_version += 1
@@ -6,7 +6,7 @@ from typing import Any
 
 import emails  # type: ignore
 import jwt
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from jwt.exceptions import InvalidTokenError
 
 from app.core.config import settings
@@ -18,11 +18,26 @@ class EmailData:
     subject: str
 
 
+EMAIL_TEMPLATES_DIR = Path(__file__).parent / "email-templates" / "build"
+
+# Compiled templates are kept for the life of the process (cache_size=-1) and
+# their bytecode is shared between workers and restarts through the cache dir.
+# With auto_reload on, a template is recompiled when its file changes.
+email_templates = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(settings.EMAIL_TEMPLATES_CACHE_DIR),
+    auto_reload=settings.EMAIL_TEMPLATES_AUTO_RELOAD,
+    cache_size=-1,
+)
+
+
+def preload_email_templates() -> None:
+    for template_name in email_templates.list_templates(extensions=["html"]):
+        email_templates.get_template(template_name)
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
+    html_content = email_templates.get_template(template_name).render(context)
     return html_content
 
 
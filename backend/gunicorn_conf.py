@@ -0,0 +1,27 @@
+"""Gunicorn settings: the base image's defaults plus the metrics hooks.
+
+The ``uvicorn-gunicorn`` image starts gunicorn with ``/app/gunicorn_conf.py``
+when it exists, so this file loads the image's own ``/gunicorn_conf.py``
+(workers, bind address and logging from its environment variables) first.
+"""
+
+import os
+import runpy
+from typing import Any
+
+_IMAGE_CONF = "/gunicorn_conf.py"
+
+if os.path.exists(_IMAGE_CONF):
+    globals().update(
+        (name, value)
+        for name, value in runpy.run_path(_IMAGE_CONF).items()
+        if not name.startswith("__")
+    )
+
+
+def child_exit(_server: Any, worker: Any) -> None:
+    # A crashed or recycled worker's livesum gauge files would otherwise keep
+    # adding its last in-flight, pool and bcrypt values to every scrape
+    from app.core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
@@ -13,6 +13,7 @@ import { useMutation } from "@tanstack/react-query"
 import { type SubmitHandler, useForm } from "react-hook-form"
 
 import { type ApiError, type UpdatePassword, UsersService } from "../../client"
+import useAuth from "../../hooks/useAuth"
 import useCustomToast from "../../hooks/useCustomToast"
 import { confirmPasswordRules, handleError, passwordRules } from "../../utils"
 
@@ -23,6 +24,7 @@ interface UpdatePasswordForm extends UpdatePassword {
 const ChangePassword = () => {
   const color = useColorModeValue("inherit", "ui.light")
   const showToast = useCustomToast()
+  const { logout } = useAuth()
   const {
     register,
     handleSubmit,
@@ -38,8 +40,14 @@ const ChangePassword = () => {
     mutationFn: (data: UpdatePassword) =>
       UsersService.updatePasswordMe({ requestBody: data }),
     onSuccess: () => {
-      showToast("Success!", "Password updated successfully.", "success")
+      showToast(
+        "Success!",
+        "Password updated successfully. Please log in again.",
+        "success",
+      )
       reset()
+      // The change revokes every token issued before, this one included
+      logout()
     },
     onError: (err: ApiError) => {
       handleError(err, showToast)
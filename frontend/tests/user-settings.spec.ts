@@ -166,7 +166,8 @@ test.describe("Change password successfully", () => {
     await page.getByRole("button", { name: "Save" }).click()
     await expect(page.getByText("Password updated successfully.")).toBeVisible()
 
-    await logOutUser(page)
+    // The change logs the user out
+    await page.waitForURL("/login")
 
     // Check if the user can log in with the new password
     await logInUser(page, email, NewPassword)
@@ -4,6 +4,14 @@ export interface MediaLink {
   url: string;
 }
 
+export interface StorySentiment {
+  takeoff: number;
+  turbulence: number;
+  touchdown: number;
+  overall: number;
+  emotional_impact: string;
+}
+
 export interface Story {
   id?: number;
   title: string;
@@ -11,4 +19,5 @@ export interface Story {
   turbulence: string;
   touchdown: string;
   media_links: MediaLink[];
+  sentiment?: StorySentiment;
 }
\ No newline at end of file